@@ -1,9 +1,128 @@
 from django.contrib import admin
-from .models import Customer, Product, Order, OrderItem, ProductProperty, CustomerProductProperty
-
-admin.site.register(Customer)
-admin.site.register(Product)
-admin.site.register(Order)
-admin.site.register(OrderItem)
-admin.site.register(ProductProperty)
-admin.site.register(CustomerProductProperty)
\ No newline at end of file
+from django.core.paginator import Paginator
+from django.db.models import Max
+from django.utils.functional import cached_property
+
+from .models import (
+    Customer, Product, Order, OrderItem, ProductProperty, CustomerProductProperty, Job, ArchivedOrder,
+    AuditEntry, Tenant, TenantMembership,
+)
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Skip ``COUNT(*)`` on large unfiltered changelists.
+
+    Without a WHERE clause the highest primary key is used as the row count;
+    it is an index lookup instead of a table scan and only overestimates by
+    the number of deleted rows. Filtered or small lists get an exact count.
+    """
+    exact_below = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = queryset.order_by().aggregate(max_pk=Max("pk"))["max_pk"] or 0
+            if estimate >= self.exact_below:
+                return estimate
+        return super().count
+
+
+class ScalableAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_per_page = 50
+
+
+@admin.register(Customer)
+class CustomerAdmin(ScalableAdmin):
+    list_display = ("id", "first_name", "last_name", "phone", "created_at")
+    search_fields = ("first_name", "last_name", "phone")
+
+
+@admin.register(Product)
+class ProductAdmin(ScalableAdmin):
+    list_display = ("id", "name", "created_at", "updated_at")
+    search_fields = ("name",)
+
+
+@admin.register(ProductProperty)
+class ProductPropertyAdmin(ScalableAdmin):
+    list_display = ("id", "name", "product", "value_type", "is_customer_specific")
+    list_select_related = ("product",)
+    list_filter = ("value_type", "is_customer_specific")
+    search_fields = ("name", "product__name")
+    autocomplete_fields = ("product",)
+
+
+@admin.register(CustomerProductProperty)
+class CustomerProductPropertyAdmin(ScalableAdmin):
+    list_display = ("id", "customer", "property", "value")
+    list_select_related = ("customer", "property__product")
+    search_fields = ("customer__first_name", "customer__last_name", "customer__phone")
+    autocomplete_fields = ("customer", "property")
+
+
+@admin.register(Order)
+class OrderAdmin(ScalableAdmin):
+    list_display = ("id", "placed_by", "status", "price", "payed", "created_at")
+    list_select_related = ("placed_by",)
+    list_filter = ("status",)  # backed by order_status_created_idx
+    search_fields = ("=id", "placed_by__first_name", "placed_by__last_name")
+    autocomplete_fields = ("placed_by",)
+
+
+@admin.register(OrderItem)
+class OrderItemAdmin(ScalableAdmin):
+    list_display = ("id", "order", "product", "customer", "quantity")
+    list_select_related = ("order__placed_by", "product", "customer")
+    search_fields = ("=order__id", "customer__first_name", "customer__last_name", "product__name")
+    autocomplete_fields = ("customer", "product")
+    raw_id_fields = ("order",)
+
+
+@admin.register(Job)
+class JobAdmin(ScalableAdmin):
+    list_display = ("id", "task", "status", "priority", "attempts", "created_at", "finished_at")
+    list_filter = ("status",)  # leads job_claim_idx
+
+
+@admin.register(ArchivedOrder)
+class ArchivedOrderAdmin(ScalableAdmin):
+    list_display = ("id", "placed_by", "price", "payed", "created_at", "archived_at")
+    list_select_related = ("placed_by",)
+    search_fields = ("=id", "placed_by__first_name", "placed_by__last_name")
+    raw_id_fields = ("placed_by",)
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(AuditEntry)
+class AuditEntryAdmin(ScalableAdmin):
+    list_display = ("id", "model", "object_id", "action", "username", "created_at")
+    list_filter = ("model", "action")
+    search_fields = ("=object_id", "username")
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+class TenantMembershipInline(admin.TabularInline):
+    model = TenantMembership
+    autocomplete_fields = ("user",)
+    extra = 0
+
+
+@admin.register(Tenant)
+class TenantAdmin(ScalableAdmin):
+    list_display = ("slug", "name", "created_at")
+    search_fields = ("slug", "name")
+    inlines = [TenantMembershipInline]
+
+    def has_add_permission(self, request):
+        return False  # manage.py create_tenant also creates and migrates the database
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class DressappConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'dressapp'
+
+    def ready(self):
+        from dressapp import receivers, tasks  # noqa: F401 (register signal handlers and job tasks)
@@ -0,0 +1,89 @@
+"""
+Hot/cold split for orders.
+
+Completed orders past a cutoff are moved, with their items, to
+``ArchivedOrder``/``ArchivedOrderItem``. Day-to-day queries only see the hot
+tables; ``with_archive()`` unions the archive back in when a client asks.
+
+While the moved hot rows are deleted ``moving()`` is true, so the delete
+receivers log them as ``"archived"`` rather than ``"deleted"``.
+"""
+from contextvars import ContextVar
+
+from django.db import router, transaction
+from django.db.models import BooleanField, F, Value
+
+from dressapp.models import ArchivedOrder, ArchivedOrderItem, Attachment, Order, OrderItem
+
+ORDER_COLUMNS = [field.attname for field in Order._meta.concrete_fields]
+ITEM_COLUMNS = [field.attname for field in OrderItem._meta.concrete_fields]
+
+_moving = ContextVar("dressapp_archive_move", default=False)
+
+
+def moving():
+    """True while ``archive_orders`` deletes hot rows it has just copied to the archive."""
+    return _moving.get()
+
+
+def archive_orders(cutoff, batch_size=500, progress=None, using=None):
+    """
+    Move completed orders created before ``cutoff`` to the archive, one
+    transaction per batch. ``progress(done, total)`` is called per batch.
+    """
+    using = using or router.db_for_write(Order)
+    candidates = Order.objects.using(using).filter(status="completed", created_at__lt=cutoff).order_by("id")
+    total = candidates.count()
+    orders = items = 0
+    while True:
+        with transaction.atomic(using=using):
+            ids = list(candidates.select_for_update().values_list("id", flat=True)[:batch_size])
+            if not ids:
+                break
+            order_rows = Order.objects.using(using).filter(pk__in=ids).values(*ORDER_COLUMNS)
+            item_rows = OrderItem.objects.using(using).filter(order_id__in=ids).values(*ITEM_COLUMNS)
+            ArchivedOrder.objects.using(using).bulk_create(ArchivedOrder(**row) for row in order_rows)
+            items += len(ArchivedOrderItem.objects.using(using).bulk_create(ArchivedOrderItem(**row) for row in item_rows))
+            Attachment.objects.using(using).filter(order_id__in=ids).update(
+                archived_order_id=F("order_id"), archived_order_item_id=F("order_item_id"), order=None, order_item=None,
+            )
+            token = _moving.set(True)
+            try:
+                Order.objects.using(using).filter(pk__in=ids).delete()  # cascades to items and their index rows
+            finally:
+                _moving.reset(token)
+        orders += len(ids)
+        if progress:
+            progress(orders, total)
+    return {"orders": orders, "items": items}
+
+
+def _related_paths(tree, prefix=""):
+    for name, nested in tree.items():
+        yield prefix + name
+        yield from _related_paths(nested, f"{prefix}{name}__")
+
+
+def with_archive(hot, cold):
+    """
+    ``hot UNION ALL cold`` with the hot queryset's ordering; rows carry an
+    ``archived`` flag. Each side must already be filtered: a combined query
+    only allows ordering, slicing and counting.
+
+    ``select_related`` is not allowed inside a UNION, so joins become
+    prefetches. Reverse relations are prefetched from the hot tables only.
+    """
+    ordering = hot.query.order_by or hot.model._meta.ordering
+    prefetch = list(hot._prefetch_related_lookups)
+    if isinstance(hot.query.select_related, dict):
+        prefetch += _related_paths(hot.query.select_related)
+
+    def flatten(queryset, archived):
+        queryset = queryset.select_related(None).prefetch_related(None).defer(None).order_by()
+        if archived:
+            queryset = queryset.defer("archived_at")
+        return queryset.annotate(archived=Value(archived, output_field=BooleanField()))
+
+    # prefetch_related() can't be called on the union itself, but it is inherited from the first part
+    hot = flatten(hot, False).prefetch_related(*prefetch)
+    return hot.union(flatten(cold, True), all=True).order_by(*ordering)
@@ -0,0 +1,200 @@
+"""
+Order attachments: streamed uploads, thumbnails in a process pool, file paths.
+
+``AttachmentUploadHandler`` writes the multipart ``file`` field straight to
+its final place under ``settings.ATTACHMENTS_DIR`` chunk by chunk, hashing
+and sniffing the image type as it goes, so a multi-MB photo is never held in
+memory or copied from a temporary file. Thumbnails are rendered by the
+``attachment_thumbnail`` job in a ``ProcessPoolExecutor`` (Pillow is
+optional; without it attachments stay ``unavailable`` and only originals are
+served).
+"""
+import hashlib
+import logging
+import os
+import uuid
+from concurrent.futures import BrokenExecutor
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, StopFutureHandlers, StopUpload
+from django.utils import timezone
+
+from dressapp import tenancy, thumbnails
+
+logger = logging.getLogger(__name__)
+
+FIELD_NAME = "file"
+
+# (magic-byte test, content type, extension); the client's filename and Content-Type are not trusted
+IMAGE_TYPES = [
+    (lambda head: head.startswith(b"\xff\xd8\xff"), "image/jpeg", ".jpg"),
+    (lambda head: head.startswith(b"\x89PNG\r\n\x1a\n"), "image/png", ".png"),
+    (lambda head: head[:4] == b"RIFF" and head[8:12] == b"WEBP", "image/webp", ".webp"),
+    (lambda head: head[4:12] in (b"ftypheic", b"ftypheix", b"ftypmif1", b"ftyphevc"), "image/heic", ".heic"),
+    (lambda head: head.startswith((b"GIF87a", b"GIF89a")), "image/gif", ".gif"),
+]
+
+
+def sniff(head):
+    """``(content type, extension)`` of an image from its first bytes, or None."""
+    for matches, content_type, extension in IMAGE_TYPES:
+        if matches(head):
+            return content_type, extension
+    return None
+
+
+def full_path(relative):
+    return Path(settings.ATTACHMENTS_DIR) / relative
+
+
+def new_relative_path(extension):
+    """``<tenant>/<yyyy>/<mm>/<random><ext>``; each workshop's files stay apart like its database."""
+    now = timezone.now()
+    return f"{tenancy.current_tenant() or 'default'}/{now:%Y/%m}/{uuid.uuid4().hex}{extension}"
+
+
+class StoredUpload(UploadedFile):
+    """An upload already written to ``ATTACHMENTS_DIR``; ``relative_path`` and ``sha256`` describe it."""
+
+    def __init__(self, relative_path, name, content_type, size, sha256):
+        super().__init__(file=None, name=name, content_type=content_type, size=size)
+        self.relative_path, self.sha256 = relative_path, sha256
+
+    def open(self, mode="rb"):
+        self.file = full_path(self.relative_path).open(mode)
+        return self
+
+
+class AttachmentUploadHandler(FileUploadHandler):
+    """
+    Stream the ``file`` field to disk. ``error`` is set (and the file
+    dropped) when it is not an image or exceeds ``ATTACHMENT_MAX_MB``.
+    """
+    chunk_size = 64 * 1024
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.max_bytes = settings.ATTACHMENT_MAX_MB * 1024 * 1024
+        self.error = None
+        self.stored = []  # relative paths written by this request, see discard()
+        self.handle = None
+
+    def new_file(self, field_name, file_name, content_type, content_length, charset=None, content_type_extra=None):
+        super().new_file(field_name, file_name, content_type, content_length, charset, content_type_extra)
+        self.handle = None
+        if field_name != FIELD_NAME:
+            raise StopFutureHandlers()  # other file fields are ignored
+        if content_length and content_length > self.max_bytes:
+            self.reject("too_large")
+        self.size, self.digest, self.head = 0, hashlib.sha256(), b""
+        raise StopFutureHandlers()
+
+    def receive_data_chunk(self, raw_data, start):
+        if self.field_name != FIELD_NAME or self.error:
+            return None
+        if self.handle is None:
+            self.head += raw_data
+            if len(self.head) < 12:
+                return None
+            detected = sniff(self.head)
+            if detected is None:
+                self.reject("not_an_image")
+            self.detected_type, extension = detected
+            relative = new_relative_path(extension)
+            target = full_path(relative)
+            target.parent.mkdir(parents=True, exist_ok=True)
+            self.stored.append(relative)
+            self.handle = open(f"{target}.partial", "wb")
+            raw_data, self.head = self.head, b""
+        self.size += len(raw_data)
+        if self.size > self.max_bytes:
+            self.reject("too_large")
+        self.handle.write(raw_data)
+        self.digest.update(raw_data)
+        return None
+
+    def file_complete(self, file_size):
+        if self.field_name != FIELD_NAME or self.error:
+            return None
+        if self.handle is None:  # fewer than 12 bytes: not an image we know
+            self.reject("not_an_image")
+        self.handle.close()
+        relative = self.stored[-1]
+        os.replace(f"{full_path(relative)}.partial", full_path(relative))
+        return StoredUpload(relative, self.file_name, self.detected_type, self.size, self.digest.hexdigest())
+
+    def upload_interrupted(self):
+        self.discard()
+
+    def reject(self, reason):
+        self.error = reason
+        self.discard()
+        raise StopUpload()  # the parser reads past the rest of the body, so keep-alive still works
+
+    def discard(self):
+        """Remove whatever this request wrote (rejected, invalid or replayed uploads)."""
+        if self.handle is not None:
+            self.handle.close()
+            self.handle = None
+        for relative in self.stored:
+            for path in (full_path(relative), Path(f"{full_path(relative)}.partial")):
+                path.unlink(missing_ok=True)
+        self.stored = []
+
+
+# --- Thumbnails ---
+
+_pool = None
+
+
+def pool():
+    """Process pool for thumbnails; ``spawn`` so children don't inherit the worker's threads and connections."""
+    global _pool
+    if _pool is None:
+        import multiprocessing  # only job workers render thumbnails; web workers never load these
+        from concurrent.futures import ProcessPoolExecutor
+
+        _pool = ProcessPoolExecutor(max_workers=settings.THUMBNAIL_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+def render_thumbnail(source, destination):
+    """Render in the pool; returns the original's (width, height)."""
+    global _pool
+    try:
+        return pool().submit(thumbnails.make_thumbnail, str(source), str(destination), settings.THUMBNAIL_SIZE) \
+            .result(timeout=settings.THUMBNAIL_TIMEOUT_SECONDS)
+    except BrokenExecutor:  # BrokenProcessPool: a child died (e.g. out of memory)
+        _pool = None  # start a fresh pool on the job's retry
+        raise
+
+
+def create_thumbnail(attachment):
+    """Render ``attachment``'s thumbnail and record the outcome on it."""
+    if not thumbnails.available():
+        attachment.thumbnail_status = "unavailable"
+        attachment.save(update_fields=["thumbnail_status"])
+        return {"status": "unavailable"}
+
+    relative = str(Path(attachment.path).with_suffix(".thumb.jpg"))
+    try:
+        width, height = render_thumbnail(full_path(attachment.path), full_path(relative))
+    except BrokenExecutor:
+        raise  # retried by the job queue
+    except Exception as exc:  # undecodable image: retrying won't help
+        logger.warning("Thumbnail for attachment %s failed: %r", attachment.pk, exc)
+        attachment.thumbnail_status = "failed"
+        attachment.save(update_fields=["thumbnail_status"])
+        return {"status": "failed", "error": repr(exc)}
+
+    attachment.thumbnail_path, attachment.width, attachment.height = relative, width, height
+    attachment.thumbnail_status = "ready"
+    attachment.save(update_fields=["thumbnail_path", "width", "height", "thumbnail_status"])
+    return {"status": "ready", "width": width, "height": height}
+
+
+def delete_files(*relative_paths):
+    for relative in filter(None, relative_paths):
+        full_path(relative).unlink(missing_ok=True)
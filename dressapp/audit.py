@@ -0,0 +1,172 @@
+"""
+Audit log of who changed what, written behind the request.
+
+Before an existing instance of ``AUDITED_MODELS`` is saved, ``pre_save``
+reads the stored values of the fields being written (one small query, on
+the write path only); ``post_save``/``post_delete`` turn the difference into
+one compact ``AuditEntry``. Entries are queued once the surrounding transaction
+commits and a background thread ``bulk_create``s them every
+``settings.AUDIT_FLUSH_MS`` milliseconds, so a save costs no extra write.
+The queue is drained at interpreter exit (``atexit``) and by ``manage.py serve``
+workers before they exit.
+
+With ``settings.AUDIT_WRITE_BEHIND`` off (the default under ``manage.py test``)
+entries are written synchronously, inside the same transaction as the change.
+
+Entries go to the database the change went to, so each workshop keeps its
+own history.
+"""
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from collections import defaultdict
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from dressapp.models import AuditEntry, Customer, CustomerProductProperty, Order, OrderItem, Product, ProductProperty
+
+logger = logging.getLogger(__name__)
+
+AUDITED_MODELS = {Customer, Product, ProductProperty, CustomerProductProperty, Order, OrderItem}
+SKIP_FIELDS = {"created_at", "updated_at"}  # set by Django on every save, not by anyone
+
+_request = ContextVar("dressapp_audit_request", default=None)
+
+
+def audited_fields(model):
+    return [field.attname for field in model._meta.concrete_fields if field.attname not in SKIP_FIELDS]
+
+
+def snapshot(instance, update_fields=None):
+    """
+    Current values of the audited fields that are loaded (deferred ones are left
+    out), limited to ``update_fields`` when the save names them.
+    """
+    model = type(instance)
+    loaded = instance.__dict__
+    names = audited_fields(model)
+    if update_fields is not None:
+        written = {model._meta.get_field(name).attname for name in update_fields}
+        names = [name for name in names if name in written]
+    return {name: loaded[name] for name in names if name in loaded}
+
+
+def stored(instance, using, update_fields=None):
+    """What the database holds for the audited fields ``instance`` is about to write."""
+    names = list(snapshot(instance, update_fields))
+    if instance._state.adding or instance.pk is None or not names:
+        return {}
+    return type(instance)._base_manager.using(using).filter(pk=instance.pk).values(*names).first() or {}
+
+
+def diff(before, after):
+    """``{field: {"old": ..., "new": ...}}`` for fields whose value changed."""
+    return {
+        name: {"old": before.get(name), "new": value}
+        for name, value in after.items()
+        if name not in before or before[name] != value
+    }
+
+
+def current_actor():
+    """``(user id, username)`` of the request being handled, or ``(None, "")`` outside requests."""
+    request = _request.get()
+    user = getattr(request, "user", None)  # DRF copies the JWT user onto the Django request
+    if user is None or not user.is_authenticated:
+        return None, ""
+    return user.pk, user.get_username()
+
+
+def record(sender, object_id, action, changes, using):
+    """
+    Log one change. ``changes`` holds the field values for "created" and
+    "deleted" and ``{field: {"old", "new"}}`` for "updated" ("old" is missing
+    after a set-based ``update()``); "archived" rows (moved by
+    ``archive_orders``) carry none.
+    """
+    user_id, username = current_actor()
+    entry = AuditEntry(
+        model=sender._meta.model_name,
+        object_id=object_id,
+        action=action,
+        changes=changes,
+        user_id=user_id,
+        username=username,
+        created_at=timezone.now(),
+    )
+    if not settings.AUDIT_WRITE_BEHIND:
+        entry.save(using=using)
+        return
+    # queued only if the change commits; a rolled-back batch leaves no history
+    transaction.on_commit(lambda: entries.put(using, entry), using=using)
+
+
+class WriteBehindQueue:
+    """Entries waiting to be written, and the thread that writes them."""
+
+    def __init__(self):
+        self._queue = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def put(self, alias, entry):
+        self._queue.put((alias, entry))
+        self.ensure_flusher()
+
+    def ensure_flusher(self):
+        """Start the flusher thread on first use (and again in forked children, which don't inherit it)."""
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name="audit-flusher", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(settings.AUDIT_FLUSH_MS / 1000)
+            try:
+                self.flush()
+            except Exception:  # never let the flusher die; the entries of this round are lost
+                logger.exception("Writing audit entries failed")
+
+    def flush(self):
+        """Write everything queued so far; returns the number of entries written."""
+        pending = defaultdict(list)
+        while True:
+            try:
+                alias, entry = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            pending[alias].append(entry)
+        written = 0
+        for alias, batch in pending.items():
+            AuditEntry.objects.using(alias).bulk_create(batch, batch_size=settings.AUDIT_BATCH_SIZE)
+            written += len(batch)
+        return written
+
+
+entries = WriteBehindQueue()
+atexit.register(entries.flush)
+
+
+class AuditMiddleware:
+    """Make the request's user available to the audit receivers."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = _request.set(request)
+        try:
+            return self.get_response(request)
+        finally:
+            _request.reset(token)
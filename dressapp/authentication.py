@@ -0,0 +1,52 @@
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from dressapp import tenancy
+from dressapp.models import TenantMembership
+
+
+class TenantJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication that also activates the tenant named in the token's
+    ``tenant`` claim (see ``TenantTokenObtainPairSerializer``). Tokens
+    without the claim work against the default database.
+    """
+
+    def authenticate(self, request):
+        authenticated = super().authenticate(request)
+        if authenticated is not None:
+            self.activate_tenant(*authenticated)
+        return authenticated
+
+    @staticmethod
+    def activate_tenant(user, validated_token):
+        slug = validated_token.get("tenant")
+        if slug is None:
+            return None
+        # Checked on every request so removing a membership takes effect before the token expires
+        if not TenantMembership.objects.filter(user=user, tenant__slug=slug).exists():
+            raise AuthenticationFailed("Not a member of this workshop.", code="not_a_member")
+        tenancy.activate(slug)
+        return slug
+
+
+class QueryParamJWTAuthentication(TenantJWTAuthentication):
+    """
+    JWT from the Authorization header or, failing that, ``?token=``.
+
+    For clients that cannot set headers: ``EventSource`` and ``<img src>``.
+    Only use it on read-only endpoints, since URLs end up in logs.
+    """
+    query_param = "token"
+
+    def authenticate(self, request):
+        if self.get_header(request) is not None:
+            return super().authenticate(request)
+        raw_token = request.query_params.get(self.query_param) if hasattr(request, "query_params") \
+            else request.GET.get(self.query_param)
+        if not raw_token:
+            return None
+        validated_token = self.get_validated_token(raw_token.encode())
+        user = self.get_user(validated_token)
+        self.activate_tenant(user, validated_token)
+        return user, validated_token
@@ -0,0 +1,126 @@
+"""
+Online backups of the SQLite database.
+
+``sqlite3.Connection.backup`` copies ``pages`` pages per step and sleeps in
+between, so the server keeps reading and writing while a backup runs; a
+write from another process restarts the copy, it never waits for it. After
+``settings.BACKUP_MAX_RESTARTS`` restarts the paged copy is abandoned for
+``VACUUM INTO``, which writes one consistent snapshot in a single pass.
+The copy is checked with ``PRAGMA integrity_check`` before it replaces
+anything, and only the newest ``keep`` backups are kept.
+
+``backup_workshops`` runs it for several workshops (see ``tenancy.tenant_slugs``),
+each with its tenant active so its database alias is registered.
+"""
+import re
+import sqlite3
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections
+from django.utils import timezone
+
+from dressapp import tenancy
+
+
+class BackupError(Exception):
+    pass
+
+
+class _TooManyRestarts(Exception):
+    pass
+
+
+def _regexp(pattern, value):
+    # Same semantics as the REGEXP function Django registers; needed to evaluate customer_phone_format
+    if pattern is None or value is None:
+        return None
+    return re.search(pattern, str(value)) is not None
+
+
+def backup_database(destination=None, pages=None, sleep=None, keep=None, progress=None, using="default"):
+    """
+    Copy database ``using`` to ``destination`` (default ``settings.BACKUP_DIR``).
+    ``progress(copied_pages, total_pages)`` is called after every step.
+    Returns a summary dict; raises ``BackupError`` if the copy fails its integrity check.
+    """
+    connection = connections[using]
+    if connection.vendor != "sqlite":
+        raise ImproperlyConfigured(f"backup only supports SQLite, database '{using}' is {connection.vendor}")
+    pages = pages or settings.BACKUP_PAGES
+    sleep = settings.BACKUP_SLEEP_SECONDS if sleep is None else sleep
+    keep = keep or settings.BACKUP_KEEP
+
+    directory = Path(destination or settings.BACKUP_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    target = directory / f"{using}-{timezone.localtime():%Y%m%d-%H%M%S-%f}.sqlite3"
+    partial = target.with_name(target.name + ".partial")
+
+    restarts, previous = 0, None
+
+    def step(status, remaining, total):
+        nonlocal restarts, previous
+        if previous is not None and remaining >= previous:  # another connection wrote: back to page 0
+            restarts += 1
+            if restarts > settings.BACKUP_MAX_RESTARTS:
+                raise _TooManyRestarts()  # aborts Connection.backup()
+        previous = remaining
+        if progress:
+            progress(total - remaining, total)
+
+    if connection.in_atomic_block:
+        # sqlite3 would spin forever: the source keeps changing under its own open write transaction
+        raise BackupError("can't back up from inside a transaction")
+    connection.ensure_connection()
+    started = time.perf_counter()
+    method = "backup"
+    copy = sqlite3.connect(partial)
+    try:
+        try:
+            connection.connection.backup(copy, pages=pages, progress=step, sleep=sleep)
+        except _TooManyRestarts:
+            copy.close()
+            partial.unlink(missing_ok=True)
+            connection.connection.execute("VACUUM INTO ?", [str(partial)])
+            method = "vacuum"
+            copy = sqlite3.connect(partial)
+        elapsed = time.perf_counter() - started
+        copy.create_function("REGEXP", 2, _regexp, deterministic=True)
+        check = [row[0] for row in copy.execute("PRAGMA integrity_check")]
+    finally:
+        copy.close()
+
+    if check != ["ok"]:
+        partial.unlink(missing_ok=True)
+        raise BackupError("integrity_check failed: " + "; ".join(check[:10]))
+    partial.replace(target)
+
+    size = target.stat().st_size
+    return {
+        "path": str(target),
+        "bytes": size,
+        "method": method,
+        "restarts": restarts,
+        "seconds": round(elapsed, 3),
+        "mb_per_s": round(size / 1024 / 1024 / elapsed, 2) if elapsed else None,
+        "removed": [str(path) for path in rotate(directory, using, keep)],
+    }
+
+
+def backup_workshops(slugs, database="default", **options):
+    """``backup_database`` for each workshop slug (None: ``database``); returns their summaries."""
+    results = []
+    for slug in slugs:
+        with tenancy.use_tenant(slug):
+            results.append(backup_database(using=tenancy.alias_for(slug) if slug else database, **options))
+    return results
+
+
+def rotate(directory, alias, keep):
+    """Delete all but the newest ``keep`` backups of ``alias`` in ``directory``; returns the deleted paths."""
+    backups = sorted(Path(directory).glob(f"{alias}-*.sqlite3"), key=lambda path: path.name, reverse=True)
+    for old in backups[keep:]:
+        old.unlink()
+    return backups[keep:]
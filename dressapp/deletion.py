@@ -0,0 +1,129 @@
+"""
+Chunked deletion for rows with large cascades.
+
+Deleting a customer or product cascades through orders, items, measurements
+and properties. ``Model.delete()`` collects all of that in memory and removes
+it in one write transaction, which locks SQLite for everyone. Here the cascade
+is walked leaves first and deleted ``batch_size`` rows at a time, each batch
+in its own short transaction; only a batch of ids is ever held in memory.
+
+``ChunkedDestroyMixin`` sends viewset DELETEs above
+``settings.CHUNKED_DELETE_THRESHOLD`` rows to the ``chunked_delete`` job and
+answers 202 with the job resource.
+"""
+from collections import Counter
+
+from django.conf import settings
+from django.db import models, router, transaction
+from django.db.models.deletion import get_candidate_relations_to_delete
+from rest_framework import status
+from rest_framework.response import Response
+
+from dressapp import jobs, tenancy
+from dressapp.models import Job
+
+
+def cascade_relations(model):
+    """``(related model, FK name)`` for every relation deleted along with ``model`` rows."""
+    return [
+        (relation.related_model, relation.field.name)
+        for relation in get_candidate_relations_to_delete(model._meta)
+        if relation.on_delete is models.CASCADE
+    ]
+
+
+def cascade_plan(model):
+    """
+    Models deleted along with ``model`` rows, parents before children, each
+    with the ``(parent model, FK name)`` pairs that lead to it.
+    """
+    parents = {model: []}
+
+    def visit(current, path):
+        for child, field_name in cascade_relations(current):
+            if child in path:  # self-referential chains are left to the final delete()
+                continue
+            edges = parents.setdefault(child, [])
+            if (current, field_name) not in edges:
+                edges.append((current, field_name))
+            visit(child, path + (child,))
+
+    visit(model, (model,))
+    order = []
+    while len(order) < len(parents):
+        ready = [m for m in parents if m not in order and all(parent in order for parent, _ in parents[m])]
+        order.extend(ready or [next(m for m in parents if m not in order)])
+    return [(m, parents[m]) for m in order]
+
+
+def cascade_querysets(instance, using):
+    """``(model, rows)`` for every model in ``instance``'s cascade, parents first; a row reachable by two paths appears once."""
+    querysets = {}
+    for model, parents in cascade_plan(type(instance)):
+        if not parents:
+            rows = model._base_manager.using(using).filter(pk=instance.pk)
+        else:
+            condition = models.Q()
+            for parent, field_name in parents:
+                condition |= models.Q(**{f"{field_name}__in": querysets[parent].values("pk")})
+            rows = model._base_manager.using(using).filter(condition)
+        querysets[model] = rows
+    return list(querysets.items())
+
+
+def cascade_size(instance, limit=None, using=None):
+    """
+    Rows deleting ``instance`` would remove, itself included. Counting stops
+    once ``limit`` is exceeded.
+    """
+    using = using or router.db_for_write(type(instance))
+    total = 0
+    for _, rows in cascade_querysets(instance, using):
+        total += rows.count()
+        if limit is not None and total > limit:
+            break
+    return total
+
+
+def chunked_delete(instance, batch_size=500, progress=None, using=None):
+    """
+    Delete ``instance`` and its cascade in batches of at most ``batch_size``
+    rows, leaves first. ``progress(done, total)`` is called after each batch.
+    Returns rows deleted per model label.
+    """
+    using = using or router.db_for_write(type(instance))
+    cascade = cascade_querysets(instance, using)
+    total = sum(rows.count() for _, rows in cascade)
+    deleted = Counter()
+
+    for model, rows in reversed(cascade):  # children first, while the rows that select them still exist
+        while True:
+            with transaction.atomic(using=using):
+                ids = list(rows.values_list("pk", flat=True)[:batch_size])
+                if not ids:
+                    break
+                _, per_model = model._base_manager.using(using).filter(pk__in=ids).delete()
+            deleted.update(per_model)
+            if progress:
+                progress(min(sum(deleted.values()), total), total)
+    return dict(deleted)
+
+
+class ChunkedDestroyMixin:
+    """DELETE runs in the background, chunked, when the cascade is larger than the threshold."""
+
+    def perform_destroy_later(self, instance):
+        """The queued or running job deleting ``instance``, or a new one."""
+        label = instance._meta.label_lower
+        pending = Job.objects.filter(task="chunked_delete", status__in=["queued", "running"],
+                                     payload__model=label, payload__pk=instance.pk)
+        job = next((job for job in pending if job.payload.get("tenant") == tenancy.current_tenant()), None)
+        return job or jobs.enqueue("chunked_delete", {"model": label, "pk": instance.pk}, priority=5)
+
+    def destroy(self, request, *args, **kwargs):
+        instance = self.get_object()
+        if cascade_size(instance, limit=settings.CHUNKED_DELETE_THRESHOLD) <= settings.CHUNKED_DELETE_THRESHOLD:
+            self.perform_destroy(instance)
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        return jobs.accepted(request, self.perform_destroy_later(instance))
+
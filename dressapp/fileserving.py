@@ -0,0 +1,138 @@
+"""
+Efficient file responses: precompressed variants, conditional GET, byte ranges.
+
+Whole-file responses are ``FileResponse`` objects, so WSGI servers that
+provide ``wsgi.file_wrapper`` send them with ``sendfile()`` (zero-copy).
+"""
+import mimetypes
+import re
+from pathlib import Path
+
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.middleware.gzip import GZipMiddleware as DjangoGZipMiddleware
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+
+# (Accept-Encoding token, file suffix) in order of preference
+PRECOMPRESSED = [("br", ".br"), ("gzip", ".gz")]
+
+CHUNK_SIZE = 64 * 1024
+
+_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def accepted_encodings(request):
+    header = request.META.get("HTTP_ACCEPT_ENCODING", "")
+    return {token.split(";")[0].strip().lower() for token in header.split(",") if token.strip()}
+
+
+def range_spec(header):
+    """
+    ``(first, last)`` of a single ``bytes=`` range (either may be None), or None
+    when there is no header or it can't be used: malformed or several ranges
+    are ignored and answered with the whole file (RFC 9110, 14.2).
+    """
+    match = _RANGE.match(header.strip()) if header else None
+    if not match or match.groups() == ("", ""):
+        return None
+    first, last = (int(value) if value else None for value in match.groups())
+    if first is not None and last is not None and last < first:
+        return None
+    return first, last
+
+
+def parse_range(spec, size):
+    """Return ``(start, end)`` (inclusive) of ``spec`` in a file of ``size`` bytes, or None if unsatisfiable."""
+    first, last = spec
+    if first is None:  # suffix range: last N bytes
+        if last == 0 or size == 0:
+            return None
+        return max(size - last, 0), size - 1
+    if first >= size:
+        return None
+    return first, min(last, size - 1) if last is not None else size - 1
+
+
+def _read_range(path, start, length):
+    with open(path, "rb") as handle:
+        handle.seek(start)
+        while length > 0:
+            chunk = handle.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def serve_file(request, path, cache_control="no-cache", content_type=None, precompressed=True):
+    """
+    Serve ``path`` with validators, optional Range support and, if present,
+    a ``.br``/``.gz`` sibling matching the client's Accept-Encoding.
+    """
+    path = Path(path)
+    content_type = content_type or mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+    spec = range_spec(request.META.get("HTTP_RANGE"))
+
+    encoding, served = None, path
+    if precompressed and spec is None:
+        accepted = accepted_encodings(request)
+        for token, suffix in PRECOMPRESSED:
+            candidate = path.with_name(path.name + suffix)
+            if token in accepted and candidate.is_file():
+                encoding, served = token, candidate
+                break
+
+    stat = served.stat()
+    etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}{"-" + encoding if encoding else ""}"'
+    not_modified = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+    if not_modified is not None:
+        response = not_modified
+    elif spec is not None:
+        response = _range_response(request, served, stat.st_size, spec, content_type, etag)
+    else:
+        response = FileResponse(served.open("rb"), content_type=content_type)
+        response["Content-Length"] = str(stat.st_size)
+        response["Accept-Ranges"] = "bytes"
+
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(stat.st_mtime)
+    response["Cache-Control"] = cache_control
+    if encoding:
+        response["Content-Encoding"] = encoding
+    if precompressed:
+        patch_vary_headers(response, ("Accept-Encoding",))
+    response.skip_compression = True
+    return response
+
+
+def _range_response(request, path, size, spec, content_type, etag):
+    # If-Range: only honour the range when the client's copy is still current
+    if_range = request.META.get("HTTP_IF_RANGE")
+    if if_range and if_range != etag:
+        response = FileResponse(path.open("rb"), content_type=content_type)
+        response["Content-Length"] = str(size)
+        response["Accept-Ranges"] = "bytes"
+        return response
+
+    byte_range = parse_range(spec, size)
+    if byte_range is None:  # a valid single range past the end
+        response = HttpResponse(status=416)
+        response["Content-Range"] = f"bytes */{size}"
+        return response
+
+    start, end = byte_range
+    length = end - start + 1
+    response = StreamingHttpResponse(_read_range(path, start, length), status=206, content_type=content_type)
+    response["Content-Range"] = f"bytes {start}-{end}/{size}"
+    response["Content-Length"] = str(length)
+    response["Accept-Ranges"] = "bytes"
+    return response
+
+
+class GZipMiddleware(DjangoGZipMiddleware):
+    """Django's GZipMiddleware, minus files we already serve optimally (precompressed, ranged, sendfile)."""
+
+    def process_response(self, request, response):
+        if getattr(response, "skip_compression", False) or response.status_code == 206:
+            return response
+        return super().process_response(request, response)
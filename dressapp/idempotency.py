@@ -0,0 +1,109 @@
+"""
+``Idempotency-Key`` support for write endpoints.
+
+A POST/PUT/PATCH carrying the header is recorded as ``pending`` before the
+view runs. The view's response is stored and replayed, with
+``Idempotent-Replayed: true``, for every later request with the same key
+from the same user until ``settings.IDEMPOTENCY_TTL_HOURS`` pass. If the view
+raises (validation errors included) or answers 5xx, the key is released so a
+corrected retry can use it. A repeat that arrives while the first is still
+running gets a 409 with ``Retry-After`` at once rather than holding a worker
+thread. Reusing a key for a different request is a 422. Expired records are
+purged by the worker's ``housekeeping`` job.
+"""
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, router, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+from dressapp.models import IdempotencyRecord
+
+HEADER = "Idempotency-Key"
+METHODS = ("POST", "PUT", "PATCH")
+REPLAYED_HEADERS = ("Location", "Content-Location")
+
+
+def fingerprint(request):
+    body = json.dumps(request.data, sort_keys=True, default=str)
+    return hashlib.sha256(f"{request.method} {request.path}\n{body}".encode()).hexdigest()
+
+
+def replay(record):
+    response = Response(record.response_body, status=record.response_status, headers=record.response_headers or {})
+    response["Idempotent-Replayed"] = "true"
+    return response
+
+
+def answer_repeat(record, digest):
+    """Response to a request whose key is already recorded as ``record``."""
+    if record.fingerprint != digest:
+        return Response({"detail": f"{HEADER} was already used for a different request."},
+                        status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+    if record.status != "done":
+        return in_progress()
+    return replay(record)
+
+
+def in_progress():
+    return Response({"detail": "A request with this key is still in progress."},
+                    status=status.HTTP_409_CONFLICT, headers={"Retry-After": "1"})
+
+
+def idempotent(request, handler):
+    """Run ``handler()`` at most once per ``Idempotency-Key``; see the module docstring."""
+    key = request.headers.get(HEADER)
+    if not key or request.method not in METHODS or getattr(request, "in_batch", False):
+        return handler()
+    if len(key) > 255:
+        return Response({"detail": f"{HEADER} must be at most 255 characters."}, status=status.HTTP_400_BAD_REQUEST)
+
+    user_id, now, digest = request.user.pk, timezone.now(), fingerprint(request)
+    record = None
+    for _ in range(2):  # once more if the key was released, or had expired, in the meantime
+        try:
+            with transaction.atomic(using=router.db_for_write(IdempotencyRecord)):
+                record = IdempotencyRecord.objects.create(
+                    user_id=user_id, key=key, fingerprint=digest,
+                    expires_at=now + timedelta(hours=settings.IDEMPOTENCY_TTL_HOURS),
+                )
+            break
+        except IntegrityError:
+            existing = IdempotencyRecord.objects.filter(user_id=user_id, key=key).first()
+            if existing is not None and existing.expires_at < now:
+                existing.delete()  # not purged by the housekeeping job yet
+            elif existing is not None:
+                return answer_repeat(existing, digest)
+    if record is None:
+        return in_progress()
+
+    try:
+        response = handler()
+    except Exception:
+        record.delete()
+        raise
+    if response.status_code >= 500:
+        record.delete()  # let the client retry
+        return response
+
+    record.status = "done"
+    record.response_status = response.status_code
+    record.response_body = json.loads(JSONRenderer().render(response.data)) if response.data is not None else None
+    record.response_headers = {name: response[name] for name in REPLAYED_HEADERS if response.has_header(name)}
+    record.save(update_fields=["status", "response_status", "response_body", "response_headers"])
+    return response
+
+
+class IdempotentMixin:
+    """Honour ``Idempotency-Key`` on a viewset's create and update (PUT and PATCH)."""
+
+    def create(self, request, *args, **kwargs):
+        return idempotent(request, lambda: super(IdempotentMixin, self).create(request, *args, **kwargs))
+
+    def update(self, request, *args, **kwargs):
+        return idempotent(request, lambda: super(IdempotentMixin, self).update(request, *args, **kwargs))
@@ -0,0 +1,47 @@
+"""Maintenance of ``OrderItemPropertyValue``, the index over ``OrderItem.selected_properties``."""
+from django.db import router, transaction
+
+from dressapp.models import OrderItem, OrderItemPropertyValue, ProductProperty
+
+
+def index_order_items(items, using=None):
+    """(Re)write the index rows for ``items``; one delete, one lookup and one insert per call."""
+    items = [item for item in items if item.pk is not None]
+    if not items:
+        return 0
+    using = using or router.db_for_write(OrderItemPropertyValue)
+
+    wanted = {int(prop_id) for item in items for prop_id in (item.selected_properties or {}) if str(prop_id).isdigit()}
+    existing = set(ProductProperty.objects.using(using).filter(pk__in=wanted).values_list("pk", flat=True))
+
+    rows = [
+        OrderItemPropertyValue(
+            order_item_id=item.pk,
+            property_id=int(prop_id),
+            value=OrderItemPropertyValue.normalize_value(value),
+        )
+        for item in items
+        for prop_id, value in (item.selected_properties or {}).items()
+        if str(prop_id).isdigit() and int(prop_id) in existing
+    ]
+    with transaction.atomic(using=using):
+        OrderItemPropertyValue.objects.using(using).filter(order_item__in=[item.pk for item in items]).delete()
+        OrderItemPropertyValue.objects.using(using).bulk_create(rows)
+    return len(rows)
+
+
+def rebuild_index(batch_size=500, progress=None, using=None):
+    """Re-index every order item in primary-key batches. ``progress(done, total)`` is called per batch."""
+    queryset = OrderItem.objects.using(using or router.db_for_read(OrderItem)).only("id", "selected_properties").order_by("id")
+    total = queryset.count()
+    done = indexed = last_id = 0
+    while True:
+        batch = list(queryset.filter(id__gt=last_id)[:batch_size])
+        if not batch:
+            break
+        indexed += index_order_items(batch, using=using)
+        done += len(batch)
+        last_id = batch[-1].id
+        if progress:
+            progress(done, total)
+    return {"items": done, "values": indexed}
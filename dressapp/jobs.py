@@ -0,0 +1,173 @@
+"""
+Lightweight database-backed job queue.
+
+Heavy work (exports, index/report rebuilds, imports) is registered as a task
+and enqueued as a ``Job`` row; ``manage.py run_worker`` claims and runs it
+outside the request cycle.
+
+    @jobs.task("rebuild_report")
+    def rebuild_report(job):
+        ...
+        return {"rows": 42}          # stored in job.result
+
+    job = jobs.enqueue("rebuild_report", {"month": "2025-10"}, priority=5)
+    return jobs.accepted(request, job)   # 202 + Location: /api/jobs/<id>/
+"""
+import logging
+import socket
+import threading
+import traceback
+from datetime import timedelta
+
+from django.db import connections, router
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from dressapp import tenancy
+from dressapp.models import Job
+
+logger = logging.getLogger(__name__)
+
+TASKS = {}
+
+RETRY_BACKOFF_SECONDS = 30  # doubled on every failed attempt
+
+
+def task(name):
+    """Register ``func(job)`` as the handler for jobs named ``name``."""
+    def decorator(func):
+        TASKS[name] = func
+        return func
+    return decorator
+
+
+def enqueue(task_name, payload=None, priority=0, max_attempts=3, run_after=None):
+    if task_name not in TASKS:
+        raise KeyError(f"Unknown task '{task_name}'")
+    payload = dict(payload or {})
+    if tenancy.current_tenant() and "tenant" not in payload:
+        payload["tenant"] = tenancy.current_tenant()  # run() re-activates it in the worker
+    return Job.objects.create(
+        task=task_name,
+        payload=payload,
+        priority=priority,
+        max_attempts=max_attempts,
+        run_after=run_after or timezone.now(),
+    )
+
+
+def ensure_queued(task_name, payload=None, **kwargs):
+    """The queued or running job for ``task_name`` (periodic tasks re-enqueue themselves), or a new one."""
+    pending = Job.objects.filter(task=task_name, status__in=["queued", "running"]).order_by("id").first()
+    return pending or enqueue(task_name, payload, **kwargs)
+
+
+def accepted(request, job):
+    """202 response pointing the client at the job status resource."""
+    from dressapp.serializers import JobSerializer
+
+    location = request.build_absolute_uri(reverse("dressapp:job-detail", args=[job.pk]))
+    return Response(JobSerializer(job).data, status=status.HTTP_202_ACCEPTED, headers={"Location": location})
+
+
+def worker_name():
+    return f"{socket.gethostname()}:{threading.get_ident()}"
+
+
+def claim(worker=None):
+    """
+    Atomically move the next runnable job to ``running`` and return it.
+
+    A single ``UPDATE ... RETURNING`` statement picks and locks the row, so
+    two workers can never claim the same job.
+    """
+    alias = router.db_for_write(Job)
+    connection = connections[alias]
+    now = connection.ops.adapt_datetimefield_value(timezone.now())
+    skip_locked = " FOR UPDATE SKIP LOCKED" if connection.features.has_select_for_update_skip_locked else ""
+    table = connection.ops.quote_name(Job._meta.db_table)
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            UPDATE {table}
+               SET status = 'running', attempts = attempts + 1, locked_by = %s, started_at = %s
+             WHERE id = (
+                SELECT id FROM {table}
+                 WHERE status = 'queued' AND run_after <= %s
+                 ORDER BY priority DESC, run_after, id
+                 LIMIT 1{skip_locked}
+             )
+            RETURNING id
+            """,
+            [worker or worker_name(), now, now],
+        )
+        row = cursor.fetchone()
+
+    if row is None:
+        return None
+    return Job.objects.using(alias).get(pk=row[0])
+
+
+def failure_message(error):
+    """
+    Just the exception ("ValueError: bad month") from a traceback stored in
+    ``Job.error``; the API shows this, the full traceback stays in the admin.
+    """
+    lines = (error or "").rstrip().splitlines()
+    frames = [index for index, line in enumerate(lines) if line.startswith("  File ")]
+    start = frames[-1] + 1 if frames else max(len(lines) - 1, 0)
+    while start < len(lines) and lines[start].startswith(" "):  # the frame's source line and carets
+        start += 1
+    return "\n".join(lines[start:]) or None
+
+
+def run(job):
+    """Execute a claimed job and record its outcome (done, retried or failed)."""
+    handler = TASKS.get(job.task)
+    try:
+        if handler is None:
+            raise KeyError(f"Unknown task '{job.task}'")
+        with tenancy.use_tenant((job.payload or {}).get("tenant")):
+            result = handler(job)
+    except Exception:
+        job.error = traceback.format_exc()
+        if job.attempts < job.max_attempts:
+            job.status = "queued"
+            job.run_after = timezone.now() + timedelta(seconds=RETRY_BACKOFF_SECONDS * 2 ** (job.attempts - 1))
+            logger.warning("Job %s (%s) failed, retrying at %s", job.pk, job.task, job.run_after)
+        else:
+            job.status = "failed"
+            job.finished_at = timezone.now()
+            logger.error("Job %s (%s) failed permanently", job.pk, job.task)
+        job.locked_by = None
+        job.save(update_fields=["status", "error", "run_after", "finished_at", "locked_by"])
+        return job
+
+    job.status = "done"
+    job.result = result
+    job.finished_at = timezone.now()
+    job.save(update_fields=["status", "result", "finished_at"])
+    return job
+
+
+def set_progress(job, **progress):
+    """Publish progress for long jobs; visible on ``jobs/<id>/`` while running."""
+    job.progress = progress
+    Job.objects.filter(pk=job.pk).update(progress=progress)
+
+
+def requeue_stale(older_than):
+    """Put back jobs whose worker died mid-run (still ``running`` after ``older_than``)."""
+    cutoff = timezone.now() - older_than
+    return Job.objects.filter(status="running", started_at__lt=cutoff).update(status="queued", locked_by=None)
+
+
+def run_next(worker=None):
+    """Claim and run one job. Returns the job, or None if the queue is empty."""
+    job = claim(worker)
+    if job is None:
+        return None
+    return run(job)
@@ -0,0 +1,42 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from dressapp import tenancy
+from dressapp.archiving import archive_orders
+
+
+class Command(BaseCommand):
+    help = "Move completed orders (and their items) older than --older-than days to the archive tables."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--older-than", type=int, required=True, metavar="DAYS",
+                            help="Archive completed orders created more than DAYS days ago.")
+        parser.add_argument("--batch-size", type=int, default=500, help="Orders moved per transaction.")
+        workshops = parser.add_mutually_exclusive_group()
+        workshops.add_argument("--tenant", metavar="SLUG", help="Archive this workshop's orders instead.")
+        workshops.add_argument("--all-tenants", action="store_true",
+                               help="Archive in the default database and in every workshop's.")
+
+    def handle(self, *args, **options):
+        if options["older_than"] < 0 or options["batch_size"] < 1:
+            raise CommandError("--older-than must be >= 0 and --batch-size >= 1")
+        try:
+            slugs = tenancy.tenant_slugs(options["tenant"], options["all_tenants"])
+        except LookupError as exc:
+            raise CommandError(str(exc))
+        cutoff = timezone.now() - timedelta(days=options["older_than"])
+        for slug in slugs:
+            started = time.perf_counter()
+            with tenancy.use_tenant(slug):
+                result = archive_orders(
+                    cutoff,
+                    batch_size=options["batch_size"],
+                    progress=lambda done, total: self.stdout.write(f"  {done}/{total} orders"),
+                )
+            self.stdout.write(self.style.SUCCESS(
+                f"{slug or 'default'}: archived {result['orders']} orders and {result['items']} items "
+                f"created before {cutoff:%Y-%m-%d} in {time.perf_counter() - started:.1f}s"
+            ))
@@ -0,0 +1,56 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from dressapp import jobs, tenancy
+from dressapp.backup import BackupError, backup_workshops
+
+
+class Command(BaseCommand):
+    help = "Back up the SQLite database online (the server keeps running), verify the copy and rotate old ones."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dest", help="Backup directory (default: settings.BACKUP_DIR).")
+        parser.add_argument("--pages", type=int, help="Pages copied per step (default: settings.BACKUP_PAGES).")
+        parser.add_argument("--sleep", type=float, help="Seconds to pause between steps (default: settings.BACKUP_SLEEP_SECONDS).")
+        parser.add_argument("--keep", type=int, help="Backups to keep (default: settings.BACKUP_KEEP).")
+        parser.add_argument("--database", default="default")
+        workshops = parser.add_mutually_exclusive_group()
+        workshops.add_argument("--tenant", metavar="SLUG", help="Back up this workshop's database instead.")
+        workshops.add_argument("--all-tenants", action="store_true",
+                               help="Back up --database and every workshop's database.")
+        parser.add_argument("--every", type=float, metavar="HOURS",
+                            help="Don't back up now; enqueue a 'backup' job that repeats every HOURS (run_worker runs it).")
+
+    def handle(self, *args, **options):
+        try:
+            slugs = tenancy.tenant_slugs(options["tenant"], options["all_tenants"])
+        except LookupError as exc:
+            raise CommandError(str(exc))
+
+        if options["every"]:
+            payload = {key: options[key] for key in ("dest", "pages", "sleep", "keep") if options[key] is not None}
+            payload.update(database=options["database"], every_hours=options["every"])
+            if options["all_tenants"]:
+                payload["all_tenants"] = True
+            with tenancy.use_tenant(options["tenant"]):  # recorded in the payload; the job runs in that workshop
+                job = jobs.enqueue("backup", payload, priority=-1, max_attempts=1)
+            self.stdout.write(f"Scheduled job #{job.pk}: backup every {options['every']:g}h")
+            return
+
+        try:
+            results = backup_workshops(
+                slugs,
+                database=options["database"],
+                destination=options["dest"],
+                pages=options["pages"],
+                sleep=options["sleep"],
+                keep=options["keep"],
+            )
+        except BackupError as exc:
+            raise CommandError(str(exc))
+        for result in results:
+            self.stdout.write(self.style.SUCCESS(
+                f"Backed up to {result['path']}: {result['bytes'] / 1024 / 1024:.1f} MB in {result['seconds']:.2f}s "
+                f"({result['mb_per_s']} MB/s), integrity ok"
+            ))
+            for path in result["removed"]:
+                self.stdout.write(f"  removed {path}")
@@ -0,0 +1,65 @@
+import statistics
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from django.utils.text import compress_string
+from rest_framework.renderers import JSONRenderer
+
+from dressapp.models import Customer, OrderItem
+from dressapp.renderers import ColumnarJSONRenderer
+from dressapp.serializers import CustomerSerializer, OrderItemSerializer
+
+
+class Command(BaseCommand):
+    help = "Compare payload size and encode time of the JSON and columnar renderers."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, nargs="+", default=[10, 100, 1000],
+                            help="List sizes to benchmark.")
+        parser.add_argument("--repeat", type=int, default=50, help="Encodes per measurement.")
+
+    def handle(self, *args, **options):
+        renderers = [("json", JSONRenderer()), ("columnar", ColumnarJSONRenderer())]
+        self.stdout.write(f"{'payload':<12}{'rows':>6}  {'renderer':<10}{'bytes':>10}{'gzip':>10}{'encode ms':>11}")
+        for name, build in [("customers", self.customers), ("order-items", self.order_items)]:
+            for count in options["rows"]:
+                page = {"count": count, "next": None, "previous": None, "results": build(count)}
+                for renderer_name, renderer in renderers:
+                    body = renderer.render(page)
+                    encode = self.time_ms(lambda: renderer.render(page), options["repeat"])
+                    self.stdout.write(
+                        f"{name:<12}{count:>6}  {renderer_name:<10}{len(body):>10}"
+                        f"{len(compress_string(body)):>10}{encode:>11.3f}"
+                    )
+
+    @staticmethod
+    def time_ms(func, repeat):
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            samples.append((time.perf_counter() - start) * 1000)
+        return statistics.median(samples)
+
+    @staticmethod
+    def customers(count):
+        now = timezone.now()
+        return [
+            CustomerSerializer(Customer(
+                id=i, first_name=f"Customer{i}", last_name="Ahmadi", phone=f"0912{i:07d}",
+                created_at=now - timedelta(days=i), updated_at=now,
+            )).data
+            for i in range(1, count + 1)
+        ]
+
+    @staticmethod
+    def order_items(count):
+        return [
+            OrderItemSerializer(OrderItem(
+                id=i, order_id=i // 3 + 1, customer_id=i % 50 + 1, product_id=i % 7 + 1, quantity=1 + i % 3,
+                selected_properties={"3": "Style A", "7": "Silk"}, note="",
+            )).data
+            for i in range(1, count + 1)
+        ]
@@ -0,0 +1,71 @@
+import gzip
+import shutil
+import subprocess
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+try:
+    import brotli
+except ImportError:  # optional: pip install brotli to also ship .br files
+    brotli = None
+
+COMPRESSIBLE = {".html", ".js", ".mjs", ".css", ".json", ".webmanifest", ".svg", ".txt", ".xml", ".map", ".ico"}
+MIN_SIZE = 256
+
+
+class Command(BaseCommand):
+    help = "Copy the Vite build of the PWA into PWA_ROOT and precompress it for serving from Django."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--source", default=str(settings.PWA_SOURCE_DIR / "dist"),
+                            help="Vite output directory (default: dressmaking-pwa/dist).")
+        parser.add_argument("--build", action="store_true", help="Run 'npm run build' first.")
+
+    def handle(self, *args, **options):
+        source = Path(options["source"])
+        if options["build"]:
+            self.stdout.write("Building PWA...")
+            subprocess.run(["npm", "run", "build"], cwd=settings.PWA_SOURCE_DIR, check=True)
+        if not (source / "index.html").is_file():
+            raise CommandError(f"No build found in {source}. Run 'npm run build' in dressmaking-pwa or pass --build.")
+
+        target = Path(settings.PWA_ROOT)
+        staging = target.with_name(target.name + ".tmp")
+        shutil.rmtree(staging, ignore_errors=True)
+        shutil.copytree(source, staging)
+
+        start = time.perf_counter()
+        files = raw = gz = br = 0
+        for path in sorted(staging.rglob("*")):
+            if not path.is_file() or path.suffix not in COMPRESSIBLE or path.stat().st_size < MIN_SIZE:
+                continue
+            data = path.read_bytes()
+            files += 1
+            raw += len(data)
+            gz += self.write_if_smaller(path.with_name(path.name + ".gz"), gzip.compress(data, 9, mtime=0), data)
+            if brotli is not None:
+                br += self.write_if_smaller(path.with_name(path.name + ".br"), brotli.compress(data), data)
+
+        # Swap the new build in only once it is complete
+        old = target.with_name(target.name + ".old")
+        shutil.rmtree(old, ignore_errors=True)
+        if target.exists():
+            target.rename(old)
+        staging.rename(target)
+        shutil.rmtree(old, ignore_errors=True)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Collected PWA into {target}: {files} compressible files, {raw} bytes -> "
+            f"gzip {gz} bytes" + (f", brotli {br} bytes" if brotli else " (install 'brotli' for .br)")
+            + f" in {time.perf_counter() - start:.2f}s"
+        ))
+
+    @staticmethod
+    def write_if_smaller(path, compressed, original):
+        if len(compressed) >= len(original):
+            return len(original)
+        path.write_bytes(compressed)
+        return len(compressed)
@@ -0,0 +1,43 @@
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from dressapp import tenancy
+from dressapp.models import Tenant, TenantMembership
+
+
+class Command(BaseCommand):
+    help = (
+        "Create a workshop with its own SQLite database and migrate it. Re-running it for an "
+        "existing workshop applies pending migrations and adds members."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("slug", help="Short id, also the database file name.")
+        parser.add_argument("--name", help="Display name (default: the slug).")
+        parser.add_argument("--user", action="append", default=[], dest="users", metavar="USERNAME",
+                            help="Add this user as a member (repeatable).")
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        users = []
+        for username in options["users"]:
+            try:
+                users.append(User.objects.get(username=username))
+            except User.DoesNotExist:
+                raise CommandError(f"No user named '{username}'")
+
+        tenant, created = Tenant.objects.get_or_create(
+            slug=options["slug"], defaults={"name": options["name"] or options["slug"]},
+        )
+        for user in users:
+            TenantMembership.objects.get_or_create(user=user, tenant=tenant)
+
+        tenancy.database_path(tenant.slug).parent.mkdir(parents=True, exist_ok=True)
+        alias = tenancy.register(tenant.slug)
+        call_command("migrate", database=alias, interactive=False, verbosity=max(options["verbosity"] - 1, 0),
+                     stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(
+            f"{'Created' if created else 'Updated'} workshop '{tenant.slug}' at {tenancy.database_path(tenant.slug)}"
+            + (f", members: {', '.join(user.username for user in users)}" if users else "")
+        ))
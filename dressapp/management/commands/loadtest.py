@@ -0,0 +1,331 @@
+import asyncio
+import getpass
+import json
+import math
+import random
+import ssl
+import time
+from collections import defaultdict
+from urllib.parse import urlencode, urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+# name -> default weight; see Session.<name>
+FLOWS = {"browse": 5, "view": 3, "create": 1, "status": 1}
+WRITE_FLOWS = {"create", "status"}
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(math.ceil(pct / 100 * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+class HTTPError(Exception):
+    pass
+
+
+class Connection:
+    """One keep-alive HTTP/1.1 connection; reconnects when the server closes it."""
+
+    def __init__(self, host, port, use_ssl, timeout):
+        self.host, self.port, self.timeout = host, port, timeout
+        self.ssl = ssl.create_default_context() if use_ssl else None
+        self.reader = self.writer = None
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except OSError:
+                pass
+        self.reader = self.writer = None
+
+    async def request(self, method, path, body=None, headers=None):
+        for attempt in (1, 2):  # a reused connection may have been closed by the server meanwhile
+            reused = self.writer is not None
+            try:
+                return await asyncio.wait_for(self._request(method, path, body, headers or {}), self.timeout)
+            except (ConnectionError, asyncio.IncompleteReadError) as exc:
+                await self.close()
+                if not reused or attempt == 2:
+                    raise HTTPError(f"connection failed: {exc!r}")
+            except asyncio.TimeoutError:
+                await self.close()
+                raise HTTPError("timeout")
+
+    async def _request(self, method, path, body, headers):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port, ssl=self.ssl)
+        payload = b"" if body is None else json.dumps(body).encode()
+        lines = [f"{method} {path} HTTP/1.1", f"Host: {self.host}:{self.port}", "Accept: application/json",
+                 f"Content-Length: {len(payload)}", "Connection: keep-alive"]
+        if body is not None:
+            lines.append("Content-Type: application/json")
+        lines += [f"{name}: {value}" for name, value in headers.items()]
+        self.writer.write(("\r\n".join(lines) + "\r\n\r\n").encode() + payload)
+        await self.writer.drain()
+
+        status_line = await self.reader.readuntil(b"\r\n")
+        status = int(status_line.split()[1])
+        response_headers = {}
+        while True:
+            line = await self.reader.readuntil(b"\r\n")
+            if line == b"\r\n":
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            response_headers[name.strip().lower()] = value.strip()
+
+        if response_headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int((await self.reader.readuntil(b"\r\n")).split(b";")[0], 16)
+                chunk = await self.reader.readexactly(size + 2)
+                if size == 0:
+                    break
+                chunks.append(chunk[:-2])
+            data = b"".join(chunks)
+        elif "content-length" in response_headers:
+            data = await self.reader.readexactly(int(response_headers["content-length"]))
+        else:
+            data = await self.reader.read()  # body ends when the server closes
+            response_headers["connection"] = "close"
+
+        if response_headers.get("connection", "").lower() == "close":
+            await self.close()
+        return status, data
+
+
+class Session:
+    """One simulated PWA device with its own connection; the access token is shared through ``run``."""
+
+    def __init__(self, run, connection):
+        self.run, self.connection = run, connection
+
+    async def call(self, flow, method, path, body=None, expect=(200,), retry=True):
+        token = self.run.token
+        headers = {"Authorization": f"Bearer {token}"} if token else {}
+        if method in ("POST", "PUT", "PATCH"):
+            headers["Idempotency-Key"] = f"loadtest-{random.getrandbits(64):016x}"
+        started = time.perf_counter()
+        try:
+            status, data = await self.connection.request(method, self.run.prefix + path, body, headers)
+        except HTTPError as exc:
+            self.run.record(flow, time.perf_counter() - started, error=str(exc))
+            return None
+        if status == 401 and retry and path != "token/":
+            if self.run.token == token:  # expired; the first session to notice logs in again
+                await self.login()
+            return await self.call(flow, method, path, body, expect, retry=False)
+        ok = status in expect
+        self.run.record(flow, time.perf_counter() - started, error=None if ok else f"HTTP {status} {method} {path}")
+        if not ok:
+            return None
+        return json.loads(data) if data else {}
+
+    async def login(self):
+        data = await self.call("login", "POST", "token/", self.run.credentials)
+        if data is None or "access" not in data:
+            raise CommandError("Login through api/token/ failed; check --username/--password")
+        self.run.token = data["access"]
+
+    # --- flows (names match FLOWS) ---
+
+    async def browse(self):
+        """Customer list, a name search, then the orders still in progress."""
+        data = await self.call("browse", "GET", "customers/")
+        if data and data.get("results"):
+            self.run.remember("customers", [c["id"] for c in data["results"]])
+            await self.call("browse", "GET", "customers/?" + urlencode({"search": data["results"][0]["first_name"][:2]}))
+        await self.call("browse", "GET", "orders/?status=in_progress")
+
+    async def view(self):
+        """Order details: the order, its items and the products they refer to."""
+        order_id = self.run.pick("orders")
+        if order_id is None:
+            data = await self.call("view", "GET", "orders/")
+            if data and data.get("results"):
+                self.run.remember("orders", [o["id"] for o in data["results"]])
+            return
+        await self.call("view", "GET", f"orders/{order_id}/?expand=placed_by", expect=(200, 404))
+        items = await self.call("view", "GET", f"order-items/?order={order_id}")
+        for product_id in {item["product"] for item in (items or {}).get("results", [])}:
+            await self.call("view", "GET", f"products/{product_id}/")
+
+    async def create(self):
+        """New order with one to three items."""
+        customer_id, product_id = self.run.pick("customers"), self.run.pick("products")
+        if customer_id is None or product_id is None:
+            return await self.browse()
+        order = await self.call("create", "POST", "orders/",
+                                {"placed_by": customer_id, "price": 1000, "payed": 0}, expect=(201,))
+        if order is None:
+            return
+        self.run.remember("orders", [order["id"]])
+        for _ in range(random.randint(1, 3)):
+            await self.call("create", "POST", "order-items/", {
+                "order": order["id"], "customer": customer_id, "product": self.run.pick("products"),
+                "quantity": 1, "note": "loadtest",
+            }, expect=(201,))
+
+    async def status(self):
+        """Cutting table marks an order done (or reopens it)."""
+        order_id = self.run.pick("orders")
+        if order_id is None:
+            return await self.view()
+        await self.call("status", "PATCH", f"orders/{order_id}/",
+                        {"status": random.choice(["in_progress", "completed"])}, expect=(200, 404))
+
+
+class LoadRun:
+    def __init__(self, base_url, credentials, flows, timeout):
+        parts = urlsplit(base_url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise CommandError("--url must look like http://127.0.0.1:8000")
+        self.host = parts.hostname
+        self.port = parts.port or (443 if parts.scheme == "https" else 80)
+        self.use_ssl = parts.scheme == "https"
+        self.prefix = parts.path.rstrip("/") + "/api/"
+        self.credentials, self.timeout = credentials, timeout
+        self.flow_names, self.flow_weights = zip(*flows.items())
+        self.token = None
+        self.known = defaultdict(list)
+        self.samples = []
+
+    def remember(self, kind, ids):
+        known = self.known[kind]
+        known.extend(pk for pk in ids if pk not in known)
+        del known[:-500]
+
+    def pick(self, kind):
+        return random.choice(self.known[kind]) if self.known[kind] else None
+
+    def record(self, flow, seconds, error=None):
+        self.samples.append((flow, seconds, error))
+
+    async def prepare(self):
+        """Log in once and learn some ids to work with."""
+        connection = Connection(self.host, self.port, self.use_ssl, self.timeout)
+        session = Session(self, connection)
+        await session.login()
+        for kind in ("customers", "products", "orders"):
+            data = await session.call("prepare", "GET", f"{kind}/")
+            self.remember(kind, [row["id"] for row in (data or {}).get("results", [])])
+        await connection.close()
+        self.samples.clear()
+
+    async def stage(self, concurrency, duration):
+        self.samples = []
+        deadline = time.perf_counter() + duration
+
+        async def user():
+            connection = Connection(self.host, self.port, self.use_ssl, self.timeout)
+            session = Session(self, connection)
+            try:
+                while time.perf_counter() < deadline:
+                    flow = random.choices(self.flow_names, weights=self.flow_weights)[0]
+                    await getattr(session, flow)()
+            finally:
+                await connection.close()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(user() for _ in range(concurrency)))
+        return self.summarize(concurrency, time.perf_counter() - started)
+
+    def summarize(self, concurrency, elapsed):
+        samples = [sample for sample in self.samples if sample[0] != "login"]
+        latencies = sorted(seconds * 1000 for _, seconds, _ in samples)
+        errors = [error for _, _, error in samples if error]
+        per_flow = defaultdict(list)
+        for flow, seconds, _ in samples:
+            per_flow[flow].append(seconds * 1000)
+        return {
+            "concurrency": concurrency,
+            "requests": len(samples),
+            "rps": len(samples) / elapsed if elapsed else 0,
+            "error_rate": len(errors) / len(samples) if samples else 0,
+            "p50": percentile(latencies, 50),
+            "p90": percentile(latencies, 90),
+            "p99": percentile(latencies, 99),
+            "flows": {flow: percentile(sorted(values), 90) for flow, values in per_flow.items()},
+            "errors": errors[:5],
+        }
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test a running server with a weighted mix of PWA flows, ramping up concurrency. "
+        "The create/status flows write real rows; point it at a copy of the database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--url", default="http://127.0.0.1:8000", help="Server root (the API is under api/).")
+        parser.add_argument("--username", required=True)
+        parser.add_argument("--password", help="Prompted for when omitted.")
+        parser.add_argument("--tenant", help="Workshop slug, for users in several workshops.")
+        parser.add_argument("--concurrency", default="1,2,4,8,16",
+                            help="Comma-separated simulated users per stage (default 1,2,4,8,16).")
+        parser.add_argument("--duration", type=float, default=10, help="Seconds per stage.")
+        parser.add_argument("--mix", default=",".join(f"{name}={weight}" for name, weight in FLOWS.items()),
+                            help="Flow weights, e.g. browse=5,view=3,create=1,status=1")
+        parser.add_argument("--read-only", action="store_true", help="Drop the flows that write.")
+        parser.add_argument("--timeout", type=float, default=30, help="Per-request timeout in seconds.")
+        parser.add_argument("--json", action="store_true", help="Print the stage results as JSON.")
+
+    def handle(self, *args, **options):
+        flows = self.parse_mix(options["mix"])
+        if options["read_only"]:
+            flows = {name: weight for name, weight in flows.items() if name not in WRITE_FLOWS}
+        if not flows:
+            raise CommandError("No flows left to run")
+        try:
+            stages = [int(value) for value in options["concurrency"].split(",")]
+        except ValueError:
+            raise CommandError("--concurrency must be a comma-separated list of integers")
+
+        credentials = {"username": options["username"], "password": options["password"] or getpass.getpass()}
+        if options["tenant"]:
+            credentials["tenant"] = options["tenant"]
+        run = LoadRun(options["url"], credentials, flows, options["timeout"])
+        results = asyncio.run(self.ramp(run, stages, options["duration"], options["json"]))
+        if options["json"]:
+            self.stdout.write(json.dumps(results, indent=2))
+
+    async def ramp(self, run, stages, duration, quiet):
+        await run.prepare()
+        if not quiet:
+            self.stdout.write(f"{'users':>5} {'requests':>9} {'req/s':>8} {'errors':>7} "
+                              f"{'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8}  p90 by flow")
+        results = []
+        for concurrency in stages:
+            result = await run.stage(concurrency, duration)
+            results.append(result)
+            if not quiet:
+                self.write_stage(result)
+        return results
+
+    def write_stage(self, result):
+        def ms(value):
+            return f"{value:8.1f}" if value is not None else f"{'-':>8}"
+
+        flows = "  ".join(f"{flow}={value:.0f}" for flow, value in sorted(result["flows"].items()))
+        self.stdout.write(
+            f"{result['concurrency']:>5} {result['requests']:>9} {result['rps']:>8.1f} {result['error_rate']:>7.1%} "
+            f"{ms(result['p50'])} {ms(result['p90'])} {ms(result['p99'])}  {flows}"
+        )
+        for error in result["errors"]:
+            self.stderr.write(f"      {error}")
+
+    @staticmethod
+    def parse_mix(mix):
+        flows = {}
+        for part in filter(None, mix.split(",")):
+            name, _, weight = part.partition("=")
+            if name not in FLOWS or not weight.replace(".", "", 1).isdigit():
+                raise CommandError(f"Bad --mix entry '{part}'; flows are {', '.join(FLOWS)}")
+            if float(weight) > 0:
+                flows[name] = float(weight)
+        return flows
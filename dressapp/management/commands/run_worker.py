@@ -0,0 +1,60 @@
+import signal
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+
+from dressapp import jobs
+
+
+class Command(BaseCommand):
+    help = "Run background jobs from the database queue."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=2, help="Number of jobs to run concurrently.")
+        parser.add_argument("--poll", type=float, default=1.0, help="Seconds to sleep when the queue is empty.")
+        parser.add_argument("--stale-after", type=int, default=3600,
+                            help="Seconds after which a 'running' job is considered abandoned and requeued.")
+        parser.add_argument("--burst", action="store_true", help="Exit once the queue is empty.")
+
+    def handle(self, *args, **options):
+        self.stop = threading.Event()
+        signal.signal(signal.SIGINT, self._shutdown)
+        signal.signal(signal.SIGTERM, self._shutdown)
+
+        requeued = jobs.requeue_stale(timedelta(seconds=options["stale_after"]))
+        if requeued:
+            self.stdout.write(f"Requeued {requeued} abandoned job(s)")
+
+        jobs.ensure_queued("housekeeping", priority=-1, max_attempts=1)
+
+        threads = options["threads"]
+        self.stdout.write(f"Worker started with {threads} thread(s)")
+        with ThreadPoolExecutor(max_workers=threads, thread_name_prefix="dressapp-worker") as pool:
+            for _ in range(threads):
+                pool.submit(self._loop, options["poll"], options["burst"])
+        self.stdout.write("Worker stopped")
+
+    def _shutdown(self, signum, frame):
+        self.stdout.write("Finishing running jobs before exit...")
+        self.stop.set()
+
+    def _loop(self, poll, burst):
+        worker = jobs.worker_name()
+        try:
+            while not self.stop.is_set():
+                close_old_connections()
+                job = jobs.run_next(worker)
+                if job is not None:
+                    self.stdout.write(f"{job} attempt {job.attempts}")
+                    continue
+                if burst:
+                    break
+                self.stop.wait(poll)
+        except Exception as exc:  # keep the pool alive on unexpected errors, but report them
+            self.stderr.write(f"Worker loop crashed: {exc!r}")
+            raise
+        finally:
+            connection.close()
@@ -0,0 +1,162 @@
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler, get_internal_wsgi_application
+from django.db import connections
+from django.urls import get_resolver
+
+from dressapp import audit
+
+
+def process_uptime():
+    """Seconds since this process started (Linux), or None."""
+    try:
+        with open("/proc/self/stat") as stat:
+            start_ticks = int(stat.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as uptime:
+            system_uptime = float(uptime.read().split()[0])
+    except (OSError, ValueError, IndexError):
+        return None
+    return system_uptime - start_ticks / os.sysconf("SC_CLK_TCK")
+
+
+def memory_kb(pid):
+    """(RSS, PSS) in kB. PSS splits pages shared copy-on-write between processes."""
+    rss = pss = None
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    rss = int(line.split()[1])
+        with open(f"/proc/{pid}/smaps_rollup") as rollup:
+            for line in rollup:
+                if line.startswith("Pss:"):
+                    pss = int(line.split()[1])
+    except (OSError, ValueError):
+        pass
+    return rss, pss
+
+
+def _interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        if self.server.access_log:
+            super().log_message(format, *args)
+
+
+class Command(BaseCommand):
+    help = (
+        "Pre-forking server for a workshop LAN: load the project once, then fork worker processes "
+        "that share it copy-on-write. Built on Django's development WSGI server, so not for "
+        "internet-facing use (see the README). Set API_ONLY=1 to drop the admin and browsable API."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("addrport", nargs="?", default="0.0.0.0:8000", help="host:port to listen on.")
+        parser.add_argument("--workers", type=int, default=2, help="Worker processes (default 2, one per Pi core is plenty).")
+        parser.add_argument("--backlog", type=int, default=64)
+        parser.add_argument("--access-log", action="store_true", help="Log every request.")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        host, _, port = options["addrport"].rpartition(":")
+        if not port.isdigit():
+            raise CommandError("addrport must look like 0.0.0.0:8000")
+
+        # Load what every request needs once in the parent, so workers share it instead of each
+        # importing it on its first request. Optional parts (Pillow, the thumbnail pool,
+        # cProfile/pstats) are imported on first use and stay out of the workers.
+        application = get_internal_wsgi_application()
+        get_resolver().url_patterns
+        connections.close_all()  # children must not share the parent's database handles
+
+        listener = socket.create_server((host or "0.0.0.0", int(port)), backlog=options["backlog"])
+        gc.collect()
+        gc.freeze()  # keep the preloaded objects out of GC passes so their pages stay shared
+
+        uptime = process_uptime()
+        self.stdout.write(
+            f"Ready in {time.perf_counter() - started:.2f}s"
+            + (f" ({uptime:.2f}s since process start)" if uptime is not None else "")
+            + f", mode: {'API only' if settings.API_ONLY else 'full'}, "
+            f"listening on {host or '0.0.0.0'}:{port}"
+        )
+
+        if not hasattr(os, "fork") or options["workers"] <= 1:
+            self.serve(listener, application, options["access_log"])
+            return
+
+        self.workers = {}
+        self.stopping = False
+        for _ in range(options["workers"]):
+            self.spawn(listener, application, options["access_log"])
+        signal.signal(signal.SIGTERM, self.shutdown)
+        signal.signal(signal.SIGINT, self.shutdown)
+
+        time.sleep(0.5)
+        self.report_memory()
+        while self.workers:
+            try:
+                pid, _ = os.wait()
+            except ChildProcessError:
+                break
+            except InterruptedError:
+                continue
+            self.workers.pop(pid, None)
+            if not self.stopping:
+                self.stderr.write(f"Worker {pid} exited; starting a replacement")
+                self.spawn(listener, application, options["access_log"])
+
+    def spawn(self, listener, application, access_log):
+        pid = os.fork()
+        if pid:
+            self.workers[pid] = True
+            return
+        signal.signal(signal.SIGTERM, _interrupt)  # stop serving, then drain the audit queue
+        signal.signal(signal.SIGINT, _interrupt)
+        try:
+            self.serve(listener, application, access_log)
+        finally:
+            try:
+                audit.entries.flush()  # os._exit() skips atexit
+            finally:
+                os._exit(0)
+
+    def serve(self, listener, application, access_log):
+        server = ThreadedWSGIServer(listener.getsockname(), QuietRequestHandler, bind_and_activate=False)
+        server.socket.close()
+        server.socket = listener
+        server.server_name, server.server_port = listener.getsockname()[:2]
+        server.setup_environ()
+        server.set_app(application)
+        server.access_log = access_log
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+    def report_memory(self):
+        rows = [(os.getpid(), "master", *memory_kb(os.getpid()))]
+        rows += [(pid, "worker", *memory_kb(pid)) for pid in self.workers]
+        for pid, role, rss, pss in rows:
+            if rss is None:
+                self.stdout.write(f"  {role:<7}{pid:>8}  memory stats unavailable on {sys.platform}")
+                continue
+            self.stdout.write(f"  {role:<7}{pid:>8}  RSS {rss / 1024:6.1f} MB" + (f"  PSS {pss / 1024:6.1f} MB" if pss else ""))
+
+    def shutdown(self, signum, frame):
+        self.stopping = True
+        for pid in list(self.workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
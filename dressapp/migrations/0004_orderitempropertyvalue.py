@@ -0,0 +1,60 @@
+# Generated by Django 5.2.5 on 2026-10-19 06:03
+
+import json
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def normalize_value(value):
+    """OrderItemPropertyValue.normalize_value as of this migration; copied so later changes don't alter it."""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    if isinstance(value, (int, float)):
+        return repr(value)
+    if isinstance(value, str):
+        return value.strip().casefold()[:255]
+    return json.dumps(value, sort_keys=True, ensure_ascii=False)[:255]
+
+
+def backfill(apps, schema_editor):
+    OrderItem = apps.get_model("dressapp", "OrderItem")
+    ProductProperty = apps.get_model("dressapp", "ProductProperty")
+    OrderItemPropertyValue = apps.get_model("dressapp", "OrderItemPropertyValue")
+    db = schema_editor.connection.alias
+
+    properties = set(ProductProperty.objects.using(db).values_list("pk", flat=True))
+    rows = []
+    for item in OrderItem.objects.using(db).exclude(selected_properties=None).only("id", "selected_properties").iterator():
+        for prop_id, value in (item.selected_properties or {}).items():
+            if str(prop_id).isdigit() and int(prop_id) in properties:
+                rows.append(OrderItemPropertyValue(
+                    order_item_id=item.pk, property_id=int(prop_id), value=normalize_value(value),
+                ))
+    OrderItemPropertyValue.objects.using(db).bulk_create(rows, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dressapp', '0003_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderItemPropertyValue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('value', models.CharField(max_length=255)),
+                ('order_item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='property_values', to='dressapp.orderitem')),
+                ('property', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='order_item_values', to='dressapp.productproperty')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['property', 'value'], name='item_prop_value_idx')],
+                'unique_together': {('order_item', 'property')},
+            },
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.5 on 2026-10-19 06:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dressapp', '0006_changeevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedOrder',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField()),
+                ('price', models.PositiveIntegerField()),
+                ('payed', models.PositiveIntegerField()),
+                ('status', models.CharField(choices=[('in_progress', 'IN_PROGRESS'), ('completed', 'COMPLETED')], max_length=20)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('placed_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_orders', to='dressapp.customer')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedOrderItem',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('quantity', models.PositiveIntegerField(default=1)),
+                ('selected_properties', models.JSONField(blank=True, null=True)),
+                ('note', models.CharField(blank=True, max_length=255, null=True)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('customer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_order_items', to='dressapp.customer')),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='order', to='dressapp.archivedorder')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_order_items', to='dressapp.product')),
+            ],
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 5.2.5 on 2026-10-19 06:23
+
+import django.db.models.functions.text
+import django.db.models.lookups
+from django.db import migrations, models
+from django.db.models import F, Q
+from django.db.models.functions import Length, Trim
+
+
+def check_existing_data(apps, schema_editor):
+    """Fail with the offending ids instead of a bare IntegrityError half-way through a table rebuild."""
+    Customer = apps.get_model("dressapp", "Customer")
+    Order = apps.get_model("dressapp", "Order")
+    OrderItem = apps.get_model("dressapp", "OrderItem")
+    db = schema_editor.connection.alias
+
+    Customer.objects.using(db).filter(phone="").update(phone=None)  # blank phone means "no phone"
+
+    problems = {
+        "customers with a blank first or last name": Customer.objects.using(db)
+            .annotate(first=Length(Trim("first_name")), last=Length(Trim("last_name")))
+            .filter(Q(first=0) | Q(last=0)),
+        "customers with a malformed phone": Customer.objects.using(db)
+            .exclude(phone__isnull=True).exclude(phone__regex=r"^0\d{10}$"),
+        "orders with payed > price": Order.objects.using(db).filter(payed__gt=F("price")),
+        "order items with quantity < 1": OrderItem.objects.using(db).filter(quantity__lt=1),
+    }
+    report = []
+    for label, queryset in problems.items():
+        ids = list(queryset.order_by("pk").values_list("pk", flat=True)[:20])
+        if ids:
+            report.append(f"{label}: {ids}")
+    if report:
+        raise ValueError("Fix these rows before adding the integrity constraints:\n  " + "\n  ".join(report))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dressapp', '0007_archive'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_existing_data, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='customer',
+            constraint=models.CheckConstraint(condition=django.db.models.lookups.GreaterThan(django.db.models.functions.text.Length(django.db.models.functions.text.Trim('first_name')), 0), name='customer_first_name_not_blank', violation_error_message='First name cannot be empty.'),
+        ),
+        migrations.AddConstraint(
+            model_name='customer',
+            constraint=models.CheckConstraint(condition=django.db.models.lookups.GreaterThan(django.db.models.functions.text.Length(django.db.models.functions.text.Trim('last_name')), 0), name='customer_last_name_not_blank', violation_error_message='Last name cannot be empty.'),
+        ),
+        migrations.AddConstraint(
+            model_name='customer',
+            constraint=models.CheckConstraint(condition=models.Q(('phone__isnull', True), ('phone__regex', '^0\\d{10}$'), _connector='OR'), name='customer_phone_format', violation_error_message='Phone number must start with 0 and be exactly 11 digits.'),
+        ),
+        migrations.AddConstraint(
+            model_name='order',
+            constraint=models.CheckConstraint(condition=models.Q(('payed__lte', models.F('price'))), name='order_payed_lte_price', violation_error_message='Payed amount cannot exceed total price'),
+        ),
+        migrations.AddConstraint(
+            model_name='orderitem',
+            constraint=models.CheckConstraint(condition=models.Q(('quantity__gte', 1)), name='orderitem_quantity_gte_1', violation_error_message='Quantity must be at least 1'),
+        ),
+    ]
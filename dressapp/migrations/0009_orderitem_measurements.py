@@ -0,0 +1,23 @@
+# Generated by Django 5.2.5 on 2026-10-19 06:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dressapp', '0008_integrity_constraints'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedorderitem',
+            name='measurements',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='measurements',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.5 on 2026-10-19 06:50
+
+import django.core.serializers.json
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dressapp', '0011_idempotencyrecord'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuditEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=30)),
+                ('object_id', models.BigIntegerField()),
+                ('action', models.CharField(choices=[('created', 'CREATED'), ('updated', 'UPDATED'), ('deleted', 'DELETED')], max_length=10)),
+                ('changes', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('user_id', models.BigIntegerField(blank=True, null=True)),
+                ('username', models.CharField(blank=True, max_length=150)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['model', 'object_id', '-created_at'], name='audit_object_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.5 on 2026-10-19 06:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dressapp', '0012_auditentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Attachment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('path', models.CharField(max_length=255)),
+                ('original_name', models.CharField(blank=True, max_length=255)),
+                ('content_type', models.CharField(max_length=50)),
+                ('size', models.PositiveBigIntegerField()),
+                ('sha256', models.CharField(max_length=64)),
+                ('width', models.PositiveIntegerField(blank=True, null=True)),
+                ('height', models.PositiveIntegerField(blank=True, null=True)),
+                ('thumbnail_path', models.CharField(blank=True, max_length=255)),
+                ('thumbnail_status', models.CharField(choices=[('pending', 'PENDING'), ('ready', 'READY'), ('failed', 'FAILED'), ('unavailable', 'UNAVAILABLE')], default='pending', max_length=12)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('archived_order', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='attachments', to='dressapp.archivedorder')),
+                ('archived_order_item', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='attachments', to='dressapp.archivedorderitem')),
+                ('order', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='attachments', to='dressapp.order')),
+                ('order_item', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='attachments', to='dressapp.orderitem')),
+            ],
+            options={
+                'constraints': [models.CheckConstraint(condition=models.Q(models.Q(('archived_order__isnull', True), ('order__isnull', False)), models.Q(('archived_order__isnull', False), ('order__isnull', True)), _connector='OR'), name='attachment_on_one_order')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.5 on 2026-10-19 07:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dressapp', '0014_order_due_dates'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='auditentry',
+            name='action',
+            field=models.CharField(choices=[('created', 'CREATED'), ('updated', 'UPDATED'), ('deleted', 'DELETED'), ('archived', 'ARCHIVED')], max_length=10),
+        ),
+        migrations.AlterField(
+            model_name='changeevent',
+            name='action',
+            field=models.CharField(choices=[('created', 'CREATED'), ('updated', 'UPDATED'), ('deleted', 'DELETED'), ('archived', 'ARCHIVED')], max_length=10),
+        ),
+    ]
@@ -1,6 +1,17 @@
+import json
+from collections import defaultdict
+
+from django.conf import settings
 from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
 from django.core.validators import RegexValidator
 from django.db import models
+from django.db.models import F, Q
+from django.db.models.functions import Length, Trim
+from django.db.models.lookups import GreaterThan
+from django.utils import timezone
+
+PHONE_REGEX = r'^0\d{10}$'
 
 
 # --- Customer ---
@@ -14,7 +25,7 @@ class Customer(models.Model):
         blank=True,            # allow empty phone numbers
         validators=[
             RegexValidator(
-                regex=r'^0\d{10}$',  # Must start with 0 and have exactly 11 digits
+                regex=PHONE_REGEX,  # Must start with 0 and have exactly 11 digits
                 message="Phone number must start with 0 and be exactly 11 digits."
             )
         ]
@@ -22,6 +33,26 @@ class Customer(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        # Enforced by the database too, so bulk_create()/update() can't bypass them
+        constraints = [
+            models.CheckConstraint(
+                condition=GreaterThan(Length(Trim("first_name")), 0),
+                name="customer_first_name_not_blank",
+                violation_error_message="First name cannot be empty.",
+            ),
+            models.CheckConstraint(
+                condition=GreaterThan(Length(Trim("last_name")), 0),
+                name="customer_last_name_not_blank",
+                violation_error_message="Last name cannot be empty.",
+            ),
+            models.CheckConstraint(
+                condition=Q(phone__isnull=True) | Q(phone__regex=PHONE_REGEX),
+                name="customer_phone_format",
+                violation_error_message="Phone number must start with 0 and be exactly 11 digits.",
+            ),
+        ]
+
     def clean(self):
         # Ensure first and last names are not empty or just spaces
         if not self.first_name.strip():
@@ -147,7 +178,26 @@ class Order(models.Model):
     price = models.PositiveIntegerField()
     payed = models.PositiveIntegerField()
     status = models.CharField(max_length=20, choices=STATUS_CHOICES,default='in_progress')
-    
+    due_date = models.DateField(blank=True, null=True)
+    fitting_date = models.DateField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "created_at"], name="order_status_created_idx"),
+            # Partial: only open work is planned, so the calendar's range scans stay small. status leads
+            # so SQLite seeks (status=, date range) here rather than on order_status_created_idx.
+            models.Index(fields=["status", "due_date"], name="order_due_in_progress_idx", condition=Q(status="in_progress")),
+            models.Index(fields=["status", "fitting_date"], name="order_fitting_in_progress_idx",
+                         condition=Q(status="in_progress")),
+        ]
+        constraints = [
+            models.CheckConstraint(
+                condition=Q(payed__lte=F("price")),
+                name="order_payed_lte_price",
+                violation_error_message="Payed amount cannot exceed total price",
+            ),
+        ]
+
     def __str__(self):
         return f"Order #{self.id} for {self.placed_by.first_name}"
     
@@ -158,10 +208,19 @@ class Order(models.Model):
             raise ValidationError({"payed": "Payed amount must be non-negative"})
         if self.payed > self.price:
             raise ValidationError({"payed": "Payed amount cannot exceed total price"})
+        if self.due_date and self.fitting_date and self.fitting_date > self.due_date:
+            raise ValidationError({"fitting_date": "Fitting cannot be after the due date"})
 
         super().clean()
 
 
+class OrderItemQuerySet(models.QuerySet):
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        OrderItem.snapshot_measurements(objs, using=self.db)
+        return super().bulk_create(objs, *args, **kwargs)
+
+
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, related_name="order", on_delete=models.CASCADE)
     customer = models.ForeignKey(Customer, on_delete=models.CASCADE)
@@ -169,7 +228,20 @@ class OrderItem(models.Model):
     quantity = models.PositiveIntegerField(default=1)
     selected_properties = models.JSONField(blank=True, null=True)  # Stores selected options at time of order
     note = models.CharField(max_length=255, blank=True, null=True)
+    # Customer-specific property values when the item was ordered: {"<property id>": {"name", "value"}}.
+    # Null for items created before snapshots existed.
+    measurements = models.JSONField(blank=True, null=True)
 
+    objects = OrderItemQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.CheckConstraint(
+                condition=Q(quantity__gte=1),
+                name="orderitem_quantity_gte_1",
+                violation_error_message="Quantity must be at least 1",
+            ),
+        ]
 
     def clean(self):
         if self.quantity <= 0:
@@ -201,5 +273,279 @@ class OrderItem(models.Model):
 
         super().clean()
 
+    def save(self, *args, **kwargs):
+        if self._state.adding:
+            self.snapshot_measurements([self], using=kwargs.get("using"))
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def snapshot_measurements(cls, items, using=None):
+        """Fill ``measurements`` on unsaved ``items`` that don't have one, with a single query."""
+        pending = [item for item in items if item.measurements is None]
+        if not pending:
+            return
+        rows = (
+            CustomerProductProperty.objects.using(using)
+            .filter(
+                customer_id__in={item.customer_id for item in pending},
+                property__product_id__in={item.product_id for item in pending},
+                property__is_customer_specific=True,
+            )
+            .order_by("property_id")
+            .values_list("customer_id", "property__product_id", "property_id", "property__name", "value")
+        )
+        snapshots = defaultdict(dict)
+        for customer_id, product_id, prop_id, name, value in rows:
+            snapshots[customer_id, product_id][str(prop_id)] = {"name": name, "value": value}
+        for item in pending:
+            item.measurements = snapshots.get((item.customer_id, item.product_id), {})
+
+    def __str__(self):
+        return f"{self.product.name} x{self.quantity}"
+
+
+# --- Archive (completed orders moved out of the hot tables by archive_orders) ---
+# Same columns in the same order as Order/OrderItem (plus archived_at last) so
+# the two can be UNIONed; ids are kept, and sqlite's AUTOINCREMENT never reuses them.
+class ArchivedOrder(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    placed_by = models.ForeignKey(Customer, related_name="archived_orders", on_delete=models.CASCADE)
+    created_at = models.DateTimeField()
+    price = models.PositiveIntegerField()
+    payed = models.PositiveIntegerField()
+    status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    due_date = models.DateField(blank=True, null=True)
+    fitting_date = models.DateField(blank=True, null=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    archived = True  # hot rows read as False, see OrderSerializer.get_archived
+
+    def __str__(self):
+        return f"Archived order #{self.id}"
+
+
+class ArchivedOrderItem(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    order = models.ForeignKey(ArchivedOrder, related_name="order", on_delete=models.CASCADE)  # same name as on Order
+    customer = models.ForeignKey(Customer, related_name="archived_order_items", on_delete=models.CASCADE)
+    product = models.ForeignKey(Product, related_name="archived_order_items", on_delete=models.CASCADE)
+    quantity = models.PositiveIntegerField(default=1)
+    selected_properties = models.JSONField(blank=True, null=True)
+    note = models.CharField(max_length=255, blank=True, null=True)
+    measurements = models.JSONField(blank=True, null=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    archived = True
+
+    def __str__(self):
+        return f"Archived item #{self.id}"
+
+
+class OrderItemPropertyValue(models.Model):
+    """
+    One row per (order item, selected property), kept in sync with
+    ``OrderItem.selected_properties`` so property/value questions can be
+    answered from an index instead of walking JSON in Python.
+    """
+    order_item = models.ForeignKey(OrderItem, related_name="property_values", on_delete=models.CASCADE)
+    property = models.ForeignKey(ProductProperty, related_name="order_item_values", on_delete=models.CASCADE)
+    value = models.CharField(max_length=255)  # normalized, see normalize_value()
+
+    class Meta:
+        unique_together = ("order_item", "property")
+        indexes = [
+            models.Index(fields=["property", "value"], name="item_prop_value_idx"),
+        ]
+
+    @staticmethod
+    def normalize_value(value):
+        """Canonical text for a selected value: case-folded text, numbers without a trailing .0"""
+        if isinstance(value, bool):
+            return "true" if value else "false"
+        if isinstance(value, float) and value.is_integer():
+            value = int(value)
+        if isinstance(value, (int, float)):
+            return repr(value)
+        if isinstance(value, str):
+            return value.strip().casefold()[:255]
+        return json.dumps(value, sort_keys=True, ensure_ascii=False)[:255]
+
+    @classmethod
+    def normalize_query(cls, value_type, raw):
+        """Normalize a value coming from a query string for a property of ``value_type``."""
+        if value_type == "number":
+            try:
+                return cls.normalize_value(float(raw))
+            except ValueError:
+                return None
+        return cls.normalize_value(raw)
+
+    def __str__(self):
+        return f"{self.order_item_id}: {self.property_id} = {self.value}"
+
+
+# --- ChangeEvent (feed for the api/events/ stream) ---
+class ChangeEvent(models.Model):
+    ACTION_CHOICES = [
+        ('created', 'CREATED'),
+        ('updated', 'UPDATED'),
+        ('deleted', 'DELETED'),
+        ('archived', 'ARCHIVED'),  # moved by archive_orders
+    ]
+
+    model = models.CharField(max_length=30)  # model_name, e.g. "order"
+    object_id = models.BigIntegerField()
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES)
+    data = models.JSONField(blank=True, null=True)  # small hints for the client, e.g. {"status": "completed"}
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def as_message(self):
+        return {"id": self.id, "model": self.model, "pk": self.object_id, "action": self.action, "data": self.data}
+
+    def __str__(self):
+        return f"#{self.id} {self.model} {self.object_id} {self.action}"
+
+
+# --- Attachment (fabric/design photos; files under ATTACHMENTS_DIR, see dressapp/attachments.py) ---
+class Attachment(models.Model):
+    THUMBNAIL_STATUS_CHOICES = [
+        ('pending', 'PENDING'),
+        ('ready', 'READY'),
+        ('failed', 'FAILED'),
+        ('unavailable', 'UNAVAILABLE'),  # Pillow not installed
+    ]
+
+    # Exactly one of order/archived_order: archive_orders moves attachments along with their order
+    order = models.ForeignKey(Order, related_name="attachments", on_delete=models.CASCADE, blank=True, null=True)
+    order_item = models.ForeignKey(OrderItem, related_name="attachments", on_delete=models.SET_NULL, blank=True, null=True)
+    archived_order = models.ForeignKey(ArchivedOrder, related_name="attachments", on_delete=models.CASCADE,
+                                       blank=True, null=True)
+    archived_order_item = models.ForeignKey(ArchivedOrderItem, related_name="attachments", on_delete=models.SET_NULL,
+                                            blank=True, null=True)
+    path = models.CharField(max_length=255)  # relative to ATTACHMENTS_DIR
+    original_name = models.CharField(max_length=255, blank=True)
+    content_type = models.CharField(max_length=50)
+    size = models.PositiveBigIntegerField()
+    sha256 = models.CharField(max_length=64)
+    width = models.PositiveIntegerField(blank=True, null=True)
+    height = models.PositiveIntegerField(blank=True, null=True)
+    thumbnail_path = models.CharField(max_length=255, blank=True)
+    thumbnail_status = models.CharField(max_length=12, choices=THUMBNAIL_STATUS_CHOICES, default='pending')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.CheckConstraint(
+                condition=Q(order__isnull=False, archived_order__isnull=True)
+                | Q(order__isnull=True, archived_order__isnull=False),
+                name="attachment_on_one_order",
+            ),
+        ]
+
+    def __str__(self):
+        return f"Attachment #{self.id} ({self.original_name or self.path})"
+
+
+# --- AuditEntry (who changed what; written behind the request, see dressapp/audit.py) ---
+class AuditEntry(models.Model):
+    ACTION_CHOICES = [
+        ('created', 'CREATED'),
+        ('updated', 'UPDATED'),
+        ('deleted', 'DELETED'),
+        ('archived', 'ARCHIVED'),  # moved by archive_orders
+    ]
+
+    model = models.CharField(max_length=30)  # model_name, e.g. "order"
+    object_id = models.BigIntegerField()
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES)
+    changes = models.JSONField(encoder=DjangoJSONEncoder)  # values, or {field: {"old", "new"}} for updates
+    user_id = models.BigIntegerField(blank=True, null=True)  # users live in the default database, so no FK
+    username = models.CharField(max_length=150, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["model", "object_id", "-created_at"], name="audit_object_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.model} {self.object_id} {self.action} by {self.username or 'system'}"
+
+
+# --- Tenancy (always in the default database, see dressapp/tenancy.py) ---
+class Tenant(models.Model):
+    slug = models.SlugField(max_length=50, unique=True)  # also names the database file: <TENANT_DB_DIR>/<slug>.sqlite3
+    name = models.CharField(max_length=100)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.name
+
+
+class TenantMembership(models.Model):
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, related_name="tenant_memberships", on_delete=models.CASCADE)
+    tenant = models.ForeignKey(Tenant, related_name="memberships", on_delete=models.CASCADE)
+
+    class Meta:
+        unique_together = ("user", "tenant")
+
+    def __str__(self):
+        return f"{self.user} @ {self.tenant}"
+
+
+# --- IdempotencyRecord (responses replayed for repeated Idempotency-Key requests) ---
+class IdempotencyRecord(models.Model):
+    STATUS_CHOICES = [
+        ('pending', 'PENDING'),
+        ('done', 'DONE'),
+    ]
+
+    user_id = models.BigIntegerField()  # plain id: the record lives in the default database, like the user
+    key = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64)  # sha256 of method, path and body
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    response_status = models.PositiveSmallIntegerField(blank=True, null=True)
+    response_body = models.JSONField(blank=True, null=True)
+    response_headers = models.JSONField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        unique_together = ("user_id", "key")
+
+    def __str__(self):
+        return f"{self.key} ({self.status})"
+
+
+# --- Job (background work queue) ---
+class Job(models.Model):
+    STATUS_CHOICES = [
+        ('queued', 'QUEUED'),
+        ('running', 'RUNNING'),
+        ('done', 'DONE'),
+        ('failed', 'FAILED'),
+    ]
+
+    task = models.CharField(max_length=100)
+    payload = models.JSONField(blank=True, null=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    priority = models.IntegerField(default=0)  # higher runs first
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)  # not claimed before this (used for retry backoff)
+    locked_by = models.CharField(max_length=100, blank=True, null=True)  # worker that claimed it
+    progress = models.JSONField(blank=True, null=True)
+    result = models.JSONField(blank=True, null=True)
+    error = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            # Covers the claim query: WHERE status='queued' ORDER BY priority DESC, run_after
+            models.Index(fields=["status", "-priority", "run_after"], name="job_claim_idx"),
+        ]
+
     def __str__(self):
-        return f"{self.product.name} x{self.quantity}"
\ No newline at end of file
+        return f"Job #{self.id} {self.task} ({self.status})"
@@ -0,0 +1,121 @@
+"""
+Staff-only, per-request CPU and memory profiling.
+
+Send ``X-Profile: cpu`` (or ``mem``), or add ``?_profile=cpu``, as a staff
+user. The view runs under ``cProfile`` (or ``tracemalloc``) and the result is
+written to ``settings.PROFILING_DIR``; the file name comes back in the
+``X-Profile-Id`` response header and can be browsed through ``api/profiles/``.
+
+Requests without the flag only pay for a header lookup and a substring test.
+"""
+import io
+import re
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+
+from django.conf import settings
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.request import Request
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import TokenError
+
+PROFILE_KINDS = {"cpu": ".prof", "mem": ".snapshot"}
+PROFILE_NAME = re.compile(r"^[\w.-]+\.(prof|snapshot)$")
+
+_tracemalloc_lock = threading.Lock()  # tracemalloc is process-wide; one memory profile at a time
+
+
+def profile_dir():
+    path = Path(settings.PROFILING_DIR)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def profile_path(name):
+    """Resolve a profile file name from the listing, refusing anything else."""
+    if not PROFILE_NAME.match(name):
+        return None
+    path = profile_dir() / name
+    return path if path.is_file() else None
+
+
+def summarize(path, limit=40):
+    """Human-readable top entries of a saved profile."""
+    if path.suffix == ".prof":
+        import pstats
+
+        out = io.StringIO()
+        pstats.Stats(str(path), stream=out).sort_stats("cumulative").print_stats(limit)
+        return out.getvalue()
+    snapshot = tracemalloc.Snapshot.load(str(path))
+    return "\n".join(str(stat) for stat in snapshot.statistics("lineno")[:limit])
+
+
+class RequestProfilingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        kind = request.META.get("HTTP_X_PROFILE")
+        if kind is None and "_profile=" in request.META.get("QUERY_STRING", ""):
+            kind = request.GET.get("_profile")
+        if kind is None or not settings.PROFILING_ENABLED:
+            return self.get_response(request)
+
+        if kind not in PROFILE_KINDS or not self.is_staff(request):
+            return self.get_response(request)
+        if kind == "cpu":
+            return self.profile_cpu(request)
+        return self.profile_memory(request)
+
+    @staticmethod
+    def is_staff(request):
+        user = getattr(request, "user", None)
+        if user is not None and user.is_authenticated:
+            return user.is_staff
+        try:
+            authenticated = JWTAuthentication().authenticate(Request(request))
+        except (AuthenticationFailed, TokenError):
+            return False
+        return bool(authenticated and authenticated[0].is_staff)
+
+    @staticmethod
+    def file_name(request, kind):
+        slug = re.sub(r"[^\w]+", "-", request.path).strip("-") or "root"
+        stamp = f"{time.strftime('%Y%m%d-%H%M%S')}-{time.time_ns() % 1_000_000:06d}"
+        return f"{stamp}-{request.method}-{slug}{PROFILE_KINDS[kind]}"
+
+    def profile_cpu(self, request):
+        import cProfile  # loaded on first use; most workers never profile
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler.disable()
+        name = self.file_name(request, "cpu")
+        profiler.dump_stats(str(profile_dir() / name))
+        response["X-Profile-Id"] = name
+        return response
+
+    def profile_memory(self, request):
+        if not _tracemalloc_lock.acquire(blocking=False):
+            response = self.get_response(request)
+            response["X-Profile-Id"] = "busy"
+            return response
+        try:
+            tracemalloc.start(settings.PROFILING_TRACEMALLOC_FRAMES)
+            try:
+                response = self.get_response(request)
+                snapshot = tracemalloc.take_snapshot()
+            finally:
+                tracemalloc.stop()
+        finally:
+            _tracemalloc_lock.release()
+        name = self.file_name(request, "mem")
+        snapshot.dump(str(profile_dir() / name))
+        response["X-Profile-Id"] = name
+        return response
@@ -0,0 +1,119 @@
+"""Signal handlers for dressapp models; connected from ``DressappConfig.ready()``."""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from dressapp import archiving, attachments, audit, representations
+from dressapp.indexing import index_order_items
+from dressapp.models import Attachment, ChangeEvent, Customer, Order, OrderItem
+from dressapp.signals import rows_updated
+
+# Models whose changes are pushed to api/events/, with the hint fields sent along
+EVENT_MODELS = {
+    Customer: (),
+    Order: ("status", "placed_by_id"),
+    OrderItem: ("order_id",),
+}
+
+
+@receiver(post_save, sender=OrderItem)
+def index_selected_properties(sender, instance, using, update_fields=None, raw=False, **kwargs):
+    if raw:
+        return
+    if update_fields is not None and "selected_properties" not in update_fields:
+        return
+    index_order_items([instance], using=using)
+
+
+def event_data(instance):
+    return {field: getattr(instance, field) for field in EVENT_MODELS[type(instance)]} or None
+
+
+def row_event_data(model, values):
+    """``event_data`` for a row known only by some of its values (set-based updates)."""
+    return {field: values[field] for field in EVENT_MODELS[model] if field in values} or None
+
+
+@receiver(post_save)
+def record_save_event(sender, instance, created, using, raw=False, **kwargs):
+    if raw or sender not in EVENT_MODELS:
+        return
+    ChangeEvent.objects.using(using).create(
+        model=sender._meta.model_name,
+        object_id=instance.pk,
+        action="created" if created else "updated",
+        data=event_data(instance),
+    )
+
+
+@receiver(post_delete)
+def record_delete_event(sender, instance, using, **kwargs):
+    if sender not in EVENT_MODELS:
+        return
+    ChangeEvent.objects.using(using).create(
+        model=sender._meta.model_name, object_id=instance.pk,
+        action="archived" if archiving.moving() else "deleted", data=event_data(instance),
+    )
+
+
+@receiver(rows_updated)
+def record_bulk_update_events(sender, pks, changes, using, rows=None, **kwargs):
+    if sender not in EVENT_MODELS:
+        return
+    rows = rows or {}
+    ChangeEvent.objects.using(using).bulk_create([
+        ChangeEvent(model=sender._meta.model_name, object_id=pk, action="updated",
+                    data=row_event_data(sender, {**rows.get(pk, {}), **changes}))
+        for pk in pks
+    ])
+
+
+@receiver(post_delete, sender=Attachment)
+def delete_attachment_files(sender, instance, using, **kwargs):
+    """Also on cascades (order, customer, chunked deletes); only once the delete is committed."""
+    transaction.on_commit(lambda: attachments.delete_files(instance.path, instance.thumbnail_path), using=using)
+
+
+# --- Audit log (see dressapp/audit.py) ---
+
+def remember_audited_values(sender, instance, using, update_fields=None, raw=False, **kwargs):
+    """Only saves of existing rows pay for the lookup; loading instances costs nothing."""
+    if not raw:
+        instance._audit_before = audit.stored(instance, using, update_fields)
+
+
+for model in audit.AUDITED_MODELS:
+    pre_save.connect(remember_audited_values, sender=model, dispatch_uid=f"audit-{model._meta.label_lower}")
+
+
+@receiver(post_save)
+def audit_save(sender, instance, created, using, update_fields=None, raw=False, **kwargs):
+    if raw or sender not in audit.AUDITED_MODELS:
+        return
+    after = audit.snapshot(instance, None if created else update_fields)
+    changes = after if created else audit.diff(instance.__dict__.pop("_audit_before", {}), after)
+    if changes:
+        audit.record(sender, instance.pk, "created" if created else "updated", changes, using)
+
+
+@receiver(post_delete)
+def audit_delete(sender, instance, using, **kwargs):
+    if sender not in audit.AUDITED_MODELS:
+        return
+    if archiving.moving():
+        audit.record(sender, instance.pk, "archived", {}, using)  # the values live on in the archive
+    else:
+        audit.record(sender, instance.pk, "deleted", audit.snapshot(instance), using)
+
+
+@receiver(rows_updated)
+def audit_bulk_update(sender, pks, changes, using, **kwargs):
+    if sender not in audit.AUDITED_MODELS:
+        return
+    for pk in pks:
+        audit.record(sender, pk, "updated", {name: {"new": value} for name, value in changes.items()}, using)
+
+
+@receiver(rows_updated)
+def evict_representations(sender, pks, using, **kwargs):
+    representations.cache.evict(using, sender._meta.label_lower, pks)  # update() leaves updated_at as it was
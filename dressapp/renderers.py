@@ -0,0 +1,36 @@
+from rest_framework.renderers import JSONRenderer
+
+
+def to_columnar(data):
+    """
+    Turn a list of homogeneous rows into ``{"columns": [...], "rows": [[...]]}``.
+
+    Paginated payloads keep ``count``/``next``/``previous`` and only ``results``
+    is converted. Anything that isn't a list of dicts is returned unchanged.
+    """
+    if isinstance(data, dict) and isinstance(data.get("results"), list):
+        return {**data, "results": to_columnar(data["results"])}
+    if not isinstance(data, list) or not all(isinstance(row, dict) for row in data):
+        return data
+
+    columns = list(data[0]) if data else []
+    for row in data[1:]:
+        for key in row:
+            if key not in columns:
+                columns.append(key)
+    return {"columns": columns, "rows": [[row.get(column) for column in columns] for row in data]}
+
+
+class ColumnarJSONRenderer(JSONRenderer):
+    """
+    Opt-in compact list format: ``?format=columnar`` or
+    ``Accept: application/vnd.dressapp.columnar+json``.
+
+    Key names are sent once per response instead of once per row; detail
+    responses are rendered as plain JSON.
+    """
+    media_type = "application/vnd.dressapp.columnar+json"
+    format = "columnar"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return super().render(to_columnar(data), accepted_media_type, renderer_context)
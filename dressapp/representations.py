@@ -0,0 +1,84 @@
+"""
+Cache of rendered serializer representations, per process.
+
+Hot customers and products are serialized over and over although they rarely
+change. ``CachedRepresentationMixin`` (serializers) keeps each row's rendered
+dict here under ``(database, model, pk, serializer, field names)`` together
+with the row's version (its ``updated_at``); an entry is only used while the
+version still matches, so a save makes it stale without any invalidation.
+Set-based ``update()``s don't touch ``updated_at`` and evict through the
+``rows_updated`` signal instead.
+
+``CachedReadMixin`` (views) lists and retrieves by loading only ``(pk,
+updated_at)`` first and then the full rows that aren't cached, in one query.
+
+Entries are dropped least recently used first once there are more than
+``settings.REPRESENTATION_CACHE_ENTRIES`` of them or they take more than
+``settings.REPRESENTATION_CACHE_MB`` (measured as their JSON size). Each
+``manage.py serve`` worker has its own cache.
+"""
+import json
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+
+
+class RepresentationCache:
+    def __init__(self):
+        self._entries = OrderedDict()  # key -> (version, data, size)
+        self._lock = threading.Lock()
+        self.size = 0
+        self.hits = self.misses = 0
+
+    @property
+    def enabled(self):
+        return settings.REPRESENTATION_CACHE_ENTRIES > 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, version):
+        """A copy of the representation stored for ``key`` at ``version``, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return dict(entry[1])
+
+    def set(self, key, version, data):
+        if not self.enabled:
+            return
+        size = len(json.dumps(data, default=str))
+        max_bytes = settings.REPRESENTATION_CACHE_MB * 1024 * 1024
+        if size > max_bytes:
+            return
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (version, dict(data), size)
+            self.size += size
+            while len(self._entries) > settings.REPRESENTATION_CACHE_ENTRIES or self.size > max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def evict(self, using, label, pks):
+        """Drop every representation of these rows (all serializers and field sets)."""
+        pks = set(pks)
+        with self._lock:
+            for key in [key for key in self._entries if key[:2] == (using, label) and key[2] in pks]:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = self.hits = self.misses = 0
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry[2]
+
+
+cache = RepresentationCache()
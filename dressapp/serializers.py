@@ -1,29 +1,129 @@
+from django.conf import settings
+from django.urls import reverse
+from django.utils.functional import cached_property
 from rest_framework import serializers
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from dressapp import jobs, representations
 from dressapp.models import *
 
+
+# --- Sparse fieldsets / expansion ---
+class ShapedSerializerMixin:
+    """
+    Honour ``?fields=`` and ``?expand=`` passed in through the serializer context.
+
+    ``expandable_fields`` maps a field name to the serializer (by name, so it can
+    be declared before the target class) and kwargs used to render it nested:
+
+        expandable_fields = {"placed_by": ("CustomerSerializer", {})}
+
+    Nested serializers are always rendered in full.
+    """
+    expandable_fields = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        requested = self.context.get("fields")
+        expand = [name for name in self.context.get("expand") or () if name in self.expandable_fields]
+
+        for name in expand:
+            self.fields[name] = self.build_expanded_field(name)
+        if requested:
+            for name in set(self.fields) - set(requested) - set(expand):
+                self.fields.pop(name)
+
+    @classmethod
+    def get_expanded_serializer(cls, name):
+        serializer_name, kwargs = cls.expandable_fields[name]
+        return globals()[serializer_name], kwargs
+
+    def build_expanded_field(self, name):
+        serializer_class, kwargs = self.get_expanded_serializer(name)
+        return serializer_class(read_only=True, **kwargs)
+
+
+# --- Representation cache ---
+class CachedRepresentationMixin:
+    """
+    Reuse the rendered representation of a row whose ``updated_at`` hasn't
+    changed (see ``dressapp.representations``). Only for serializers whose
+    output depends on the row alone; expanded nested serializers turn it off.
+    """
+    version_field = "updated_at"
+
+    def to_representation(self, instance):
+        return self.render(instance, instance.__dict__.get(self.version_field))
+
+    @cached_property
+    def representation_shape(self):
+        if any(isinstance(field, serializers.BaseSerializer) for field in self.fields.values()):
+            return None
+        return type(self).__name__, tuple(self.fields)
+
+    def representation_key(self, instance):
+        if instance.pk is None or self.representation_shape is None:
+            return None
+        return (instance._state.db, instance._meta.label_lower, instance.pk) + self.representation_shape
+
+    def cached(self, instance, version):
+        """The cached representation of ``instance`` at ``version`` (only its pk needs to be loaded), or None."""
+        key = self.representation_key(instance)
+        return None if key is None else representations.cache.get(key, version)
+
+    def render(self, instance, version):
+        key = self.representation_key(instance)
+        if key is None or version is None:
+            return super().to_representation(instance)
+        data = representations.cache.get(key, version)
+        if data is None:
+            data = super().to_representation(instance)
+            representations.cache.set(key, version, data)
+        return data
+
+
 # --- Customer ---
-class CustomerSerializer(serializers.ModelSerializer):
+class CustomerSerializer(CachedRepresentationMixin, ShapedSerializerMixin, serializers.ModelSerializer):
+    expandable_fields = {
+        "product_properties": ("CustomerProductPropertySerializer", {"many": True}),
+    }
+
     class Meta:
         model = Customer
         fields = "__all__"
 
+    def validate_phone(self, value):
+        return value or None  # "no phone" is stored as NULL (see customer_phone_format)
+
 
 # --- Product ---
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(CachedRepresentationMixin, ShapedSerializerMixin, serializers.ModelSerializer):
+    expandable_fields = {
+        "properties": ("ProductPropertySerializer", {"many": True}),
+    }
+
     class Meta:
         model = Product
         fields = "__all__"
 
 
 # --- ProductProperty ---
-class ProductPropertySerializer(serializers.ModelSerializer):
+class ProductPropertySerializer(ShapedSerializerMixin, serializers.ModelSerializer):
+    expandable_fields = {
+        "product": ("ProductSerializer", {}),
+    }
+
     class Meta:
         model = ProductProperty
         fields = "__all__"
 
 
 # --- CustomerProductProperty ---
-class CustomerProductPropertySerializer(serializers.ModelSerializer):
+class CustomerProductPropertySerializer(ShapedSerializerMixin, serializers.ModelSerializer):
+    expandable_fields = {
+        "customer": ("CustomerSerializer", {}),
+        "property": ("ProductPropertySerializer", {}),
+    }
+
     property_name = serializers.CharField(source="property.name", read_only=True)
     property_type = serializers.CharField(source="property.value_type", read_only=True)
     
@@ -49,10 +149,22 @@ class CustomerProductPropertySerializer(serializers.ModelSerializer):
 
 
 # --- OrderItem ---
-class OrderItemSerializer(serializers.ModelSerializer):
+class OrderItemSerializer(ShapedSerializerMixin, serializers.ModelSerializer):
+    expandable_fields = {
+        "order": ("OrderSerializer", {}),
+        "customer": ("CustomerSerializer", {}),
+        "product": ("ProductSerializer", {}),
+    }
+    archived = serializers.SerializerMethodField()
+
     class Meta:
         model = OrderItem
         fields = "__all__"
+        extra_kwargs = {"quantity": {"min_value": 1}}  # orderitem_quantity_gte_1
+        read_only_fields = ["measurements"]  # snapshot taken on insert, see OrderItem.snapshot_measurements
+
+    def get_archived(self, obj):
+        return bool(getattr(obj, "archived", False))
 
     def validate(self, data):
         """Check selected_properties validity"""
@@ -77,10 +189,184 @@ class OrderItemSerializer(serializers.ModelSerializer):
         return data
 
 
+# --- Attachment ---
+def attachment_url(serializer, name, pk):
+    url = reverse(f"dressapp:attachment-{name}", args=[pk])
+    request = serializer.context.get("request")
+    return request.build_absolute_uri(url) if request else url
+
+
+class AttachmentThumbnailSerializer(serializers.ModelSerializer):
+    """What order details carry: the thumbnail URL only (null until it is rendered)."""
+    thumbnail = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Attachment
+        fields = ["id", "order_item", "archived_order_item", "thumbnail"]
+
+    def get_thumbnail(self, obj):
+        return attachment_url(self, "thumbnail", obj.pk) if obj.thumbnail_status == "ready" else None
+
+
+class AttachmentSerializer(AttachmentThumbnailSerializer):
+    file = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Attachment
+        fields = ["id", "order", "order_item", "archived_order", "archived_order_item", "file", "thumbnail",
+                  "original_name", "content_type", "size", "sha256", "width", "height", "thumbnail_status",
+                  "created_at"]
+        read_only_fields = [name for name in fields if name not in ("order", "order_item")]
+        extra_kwargs = {"order": {"required": True, "allow_null": False}}
+
+    def get_file(self, obj):
+        return attachment_url(self, "file", obj.pk)
+
+    def validate(self, data):
+        item = data.get("order_item")
+        if item is not None and item.order_id != data["order"].pk:
+            raise serializers.ValidationError({"order_item": "Item does not belong to this order."})
+        return data
+
+
 # --- Order ---
-class OrderSerializer(serializers.ModelSerializer):
-    items = OrderItemSerializer(many=True, read_only=True)
+class OrderSerializer(ShapedSerializerMixin, serializers.ModelSerializer):
+    expandable_fields = {
+        "placed_by": ("CustomerSerializer", {}),
+        "items": ("OrderItemSerializer", {"source": "order", "many": True}),  # reverse FK is named "order"
+        "attachments": ("AttachmentThumbnailSerializer", {"many": True}),  # always on the detail view
+    }
+    archived = serializers.SerializerMethodField()
 
     class Meta:
         model = Order
         fields = "__all__"
+
+    def validate(self, data):
+        """payed <= price, checked here so clients get a 400 instead of the constraint's IntegrityError"""
+        price = data.get("price", getattr(self.instance, "price", None))
+        payed = data.get("payed", getattr(self.instance, "payed", None))
+        if price is not None and payed is not None and payed > price:
+            raise serializers.ValidationError({"payed": "Payed amount cannot exceed total price"})
+        due_date = data.get("due_date", getattr(self.instance, "due_date", None))
+        fitting_date = data.get("fitting_date", getattr(self.instance, "fitting_date", None))
+        if due_date and fitting_date and fitting_date > due_date:
+            raise serializers.ValidationError({"fitting_date": "Fitting cannot be after the due date"})
+        return data
+
+    def get_archived(self, obj):
+        """True for rows served from the archive (``?include_archived=1``)."""
+        return bool(getattr(obj, "archived", False))
+
+
+# --- Job ---
+class JobSerializer(ShapedSerializerMixin, serializers.ModelSerializer):
+    error = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Job
+        fields = ["id", "task", "status", "priority", "attempts", "max_attempts",
+                  "progress", "result", "error", "created_at", "started_at", "finished_at"]
+        read_only_fields = fields
+
+    def get_error(self, obj):
+        """The exception type and message only; tracebacks carry paths and SQL."""
+        return jobs.failure_message(obj.error)
+
+
+# --- AuditEntry ---
+class AuditEntrySerializer(ShapedSerializerMixin, serializers.ModelSerializer):
+    class Meta:
+        model = AuditEntry
+        fields = ["id", "model", "object_id", "action", "changes", "user_id", "username", "created_at"]
+        read_only_fields = fields
+
+
+# --- Bulk order status ---
+class OrderBulkFilterSerializer(serializers.Serializer):
+    status = serializers.ChoiceField(choices=Order.STATUS_CHOICES, required=False)
+    placed_by = serializers.IntegerField(min_value=1, required=False)
+
+    def to_internal_value(self, data):
+        if isinstance(data, dict):
+            unknown = set(data) - set(self.fields)
+            if unknown:
+                raise serializers.ValidationError(f"Unsupported filter fields: {sorted(unknown)}. Allowed: {list(self.fields)}")
+        value = super().to_internal_value(data)
+        if not value:
+            raise serializers.ValidationError(f"Filter on at least one of {list(self.fields)}.")
+        return value
+
+
+class OrderBulkStatusSerializer(serializers.Serializer):
+    status = serializers.ChoiceField(choices=Order.STATUS_CHOICES)
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1), required=False, allow_empty=False)
+    filter = OrderBulkFilterSerializer(required=False)
+
+    def validate(self, data):
+        if ("ids" in data) == ("filter" in data):
+            raise serializers.ValidationError("Provide either 'ids' or 'filter'.")
+        return data
+
+
+# --- Batch operations ---
+class BatchOperationSerializer(serializers.Serializer):
+    METHOD_ACTIONS = {
+        "POST": "create",
+        "PUT": "update",
+        "PATCH": "partial_update",
+        "DELETE": "destroy",
+    }
+
+    method = serializers.ChoiceField(choices=list(METHOD_ACTIONS))
+    resource = serializers.CharField()
+    id = serializers.JSONField(required=False)  # pk, or {"$ref": "<client id>"} of an earlier create
+    ref = serializers.CharField(required=False)  # client id to register for the created object
+    body = serializers.DictField(required=False, default=dict)
+
+    def validate(self, data):
+        if data["method"] == "POST":
+            if "id" in data:
+                raise serializers.ValidationError("POST operations cannot target an id.")
+        elif "id" not in data:
+            raise serializers.ValidationError(f"{data['method']} operations need an id.")
+        if "ref" in data and data["method"] != "POST":
+            raise serializers.ValidationError("Only POST operations can register a ref.")
+        return data
+
+
+class BatchSerializer(serializers.Serializer):
+    operations = BatchOperationSerializer(many=True, allow_empty=False)
+
+    def validate_operations(self, value):
+        limit = settings.BATCH_MAX_OPERATIONS
+        if len(value) > limit:
+            raise serializers.ValidationError(f"A batch can hold at most {limit} operations.")
+        return value
+
+
+# --- Tenant-aware login ---
+class TenantTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """
+    Login that puts the workshop in the token's ``tenant`` claim.
+
+    Users with one membership get it automatically; users with several must
+    send ``"tenant": "<slug>"``. Users with no membership get a token for the
+    default database. Refreshed access tokens keep the claim.
+    """
+    tenant = serializers.SlugField(required=False, write_only=True)
+
+    def validate(self, attrs):
+        data = super().validate(attrs)
+        slugs = list(self.user.tenant_memberships.values_list("tenant__slug", flat=True))
+        requested = attrs.get("tenant")
+        if requested is not None and requested not in slugs:
+            raise serializers.ValidationError({"tenant": "You are not a member of this workshop."})
+        if requested is None and len(slugs) > 1:
+            raise serializers.ValidationError({"tenant": f"Choose a workshop: {sorted(slugs)}"})
+        slug = requested or (slugs[0] if slugs else None)
+        if slug:
+            refresh = self.get_token(self.user)
+            refresh["tenant"] = slug
+            data.update(refresh=str(refresh), access=str(refresh.access_token), tenant=slug)
+        return data
@@ -0,0 +1,10 @@
+from django.dispatch import Signal
+
+# Sent after a set-based ``QuerySet.update()`` on dressapp rows, which bypasses
+# ``post_save``. Anything that reacts to single-object saves (notifications,
+# counters, caches) should also listen here. ``rows`` optionally maps each pk to
+# the row's values after the update, for receivers that need more than ``changes``.
+#
+#   rows_updated.send(sender=Order, pks=[1, 2, 3], changes={"status": "completed"}, using="default",
+#                     rows={1: {"id": 1, "status": "completed", "placed_by_id": 4}, ...})
+rows_updated = Signal()
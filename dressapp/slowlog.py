@@ -0,0 +1,159 @@
+"""
+Slow-query and repeated-query logging.
+
+``SlowQueryMiddleware`` installs a ``connection.execute_wrapper`` for each
+request. Queries slower than ``settings.SLOW_QUERY_MS`` are logged with
+their SQL, parameters, ``EXPLAIN`` output, the calling line in dressapp and
+the view/query string that triggered them. Every query is fingerprinted
+(literals and IN-lists collapsed); a fingerprint seen
+``settings.SLOW_QUERY_REPEAT_THRESHOLD`` times in one request is logged as a
+likely N+1.
+
+Records go to the ``dressapp.slow_queries`` logger as one JSON object per
+line; settings.LOGGING points it at a rotating file.
+"""
+import hashlib
+import json
+import logging
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger("dressapp.slow_queries")
+
+APP_DIR = Path(__file__).resolve().parent
+APP_PREFIX = str(APP_DIR)
+SKIP_FILES = {str(APP_DIR / "slowlog.py"), str(APP_DIR / "profiling.py")}
+
+_IN_LIST = re.compile(r"\bIN\s*\((?:\s*%s\s*,)*\s*%s\s*\)", re.IGNORECASE)
+_NUMBER = re.compile(r"\b\d+\b")
+_STRING = re.compile(r"'(?:[^']|'')*'")
+
+_local = threading.local()
+
+
+def fingerprint(sql):
+    """Stable id for the *shape* of a query, ignoring literal values."""
+    shape = _IN_LIST.sub("IN (...)", sql)
+    shape = _STRING.sub("?", shape)
+    shape = _NUMBER.sub("?", shape)
+    return hashlib.sha1(shape.encode()).hexdigest()[:12]
+
+
+def call_site():
+    """
+    Innermost frame in dressapp code (outside this module and middleware).
+    Walks the frames without reading source lines; still only called for
+    queries that get logged.
+    """
+    frame = sys._getframe(1)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(APP_PREFIX) and filename not in SKIP_FILES:
+            return f"{Path(filename).relative_to(APP_DIR.parent)}:{frame.f_lineno} in {frame.f_code.co_name}"
+        frame = frame.f_back
+    return None
+
+
+def explain(connection, sql, params):
+    if not sql.lstrip().upper().startswith("SELECT"):
+        return None
+    prefix = "EXPLAIN QUERY PLAN" if connection.vendor == "sqlite" else "EXPLAIN"
+    _local.explaining = True
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f"{prefix} {sql}", params)
+            return [" ".join(str(col) for col in row) for row in cursor.fetchall()]
+    except Exception as exc:  # the plan is best-effort; never break the request for it
+        return [f"EXPLAIN failed: {exc!r}"]
+    finally:
+        _local.explaining = False
+
+
+class QueryLogger:
+    """``execute_wrapper`` callable collecting timings for one request."""
+
+    def __init__(self, request=None):
+        self.request = request
+        self.threshold = settings.SLOW_QUERY_MS / 1000
+        self.repeat_limit = max(settings.SLOW_QUERY_REPEAT_THRESHOLD, 1)
+        self.counts = Counter()
+        self.examples = {}  # fingerprint -> (sql, call site), taken when the query reaches repeat_limit
+
+    def __call__(self, execute, sql, params, many, context):
+        if getattr(_local, "explaining", False):
+            return execute(sql, params, many, context)
+
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            key = fingerprint(sql)
+            self.counts[key] += 1
+            if self.counts[key] == self.repeat_limit:
+                self.examples[key] = (sql, call_site())
+            if duration >= self.threshold:
+                self.log_slow(context["connection"], sql, params, many, duration, key)
+
+    def request_info(self):
+        if self.request is None:
+            return {}
+        match = getattr(self.request, "resolver_match", None)
+        return {
+            "method": self.request.method,
+            "path": self.request.path,
+            "query": self.request.META.get("QUERY_STRING", ""),
+            "view": match.view_name if match else None,
+        }
+
+    def log_slow(self, connection, sql, params, many, duration, key):
+        logger.warning(json.dumps({
+            "event": "slow_query",
+            "ms": round(duration * 1000, 2),
+            "fingerprint": key,
+            "database": connection.alias,
+            "sql": sql,
+            "params": None if many else [str(param) for param in params or ()],
+            "plan": None if many else explain(connection, sql, params),
+            "call_site": call_site(),
+            **self.request_info(),
+        }, ensure_ascii=False))
+
+    def report_repeats(self):
+        for key, count in self.counts.most_common():
+            if count < self.repeat_limit:
+                break
+            sql, site = self.examples[key]
+            logger.warning(json.dumps({
+                "event": "repeated_query",
+                "count": count,
+                "fingerprint": key,
+                "sql": sql,
+                "call_site": site,
+                **self.request_info(),
+            }, ensure_ascii=False))
+
+
+class SlowQueryMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.SLOW_QUERY_LOG_ENABLED:
+            return self.get_response(request)
+
+        query_logger = QueryLogger(request)
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(query_logger))
+            response = self.get_response(request)
+        query_logger.report_repeats()
+        return response
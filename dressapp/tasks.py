@@ -0,0 +1,87 @@
+"""Background job handlers; imported from ``DressappConfig.ready()`` so workers know them."""
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.utils import timezone
+
+from dressapp import jobs, tenancy
+from dressapp.attachments import create_thumbnail
+from dressapp.backup import backup_workshops
+from dressapp.deletion import chunked_delete
+from dressapp.indexing import rebuild_index
+from dressapp.models import Attachment, ChangeEvent, IdempotencyRecord
+
+
+@jobs.task("rebuild_property_index")
+def rebuild_property_index(job):
+    batch_size = (job.payload or {}).get("batch_size", 500)
+    return rebuild_index(
+        batch_size=batch_size,
+        progress=lambda done, total: jobs.set_progress(job, done=done, total=total),
+    )
+
+
+@jobs.task("backup")
+def backup(job):
+    """
+    Online database backup of the job's workshop, or of every workshop with
+    ``all_tenants``; with ``every_hours`` in the payload the job re-enqueues itself.
+    """
+    payload = job.payload or {}
+    slugs = tenancy.tenant_slugs(all_tenants=True) if payload.get("all_tenants") else [tenancy.current_tenant()]
+    result = {"backups": backup_workshops(
+        slugs,
+        database=payload.get("database", "default"),
+        destination=payload.get("dest"),
+        pages=payload.get("pages"),
+        sleep=payload.get("sleep"),
+        keep=payload.get("keep"),
+        progress=lambda done, total: jobs.set_progress(job, done=done, total=total),
+    )}
+    if payload.get("every_hours"):
+        next_run = timezone.now() + timedelta(hours=payload["every_hours"])
+        result["next_job"] = jobs.enqueue("backup", payload, priority=job.priority, max_attempts=job.max_attempts,
+                                          run_after=next_run).pk
+    return result
+
+
+@jobs.task("chunked_delete")
+def delete_in_chunks(job):
+    """Delete ``payload["model"]`` row ``payload["pk"]`` and its cascade in short batches."""
+    payload = job.payload or {}
+    instance = apps.get_model(payload["model"])._base_manager.filter(pk=payload["pk"]).first()
+    if instance is None:
+        return {"deleted": {}}  # already gone
+    deleted = chunked_delete(
+        instance,
+        batch_size=payload.get("batch_size") or settings.CHUNKED_DELETE_BATCH_SIZE,
+        progress=lambda done, total: jobs.set_progress(job, done=done, total=total),
+    )
+    return {"deleted": deleted}
+
+
+@jobs.task("attachment_thumbnail")
+def attachment_thumbnail(job):
+    attachment = Attachment.objects.filter(pk=job.payload["attachment"]).first()
+    if attachment is None:
+        return {"status": "deleted"}
+    return create_thumbnail(attachment)
+
+
+@jobs.task("housekeeping")
+def housekeeping(job):
+    """
+    Prune expired change events in every database and expired idempotency
+    records (kept in ``default``), then re-enqueue itself
+    ``settings.HOUSEKEEPING_MINUTES`` later (``run_worker`` queues the first one).
+    """
+    cutoff = timezone.now() - timedelta(hours=settings.SSE_RETENTION_HOURS)
+    pruned = {}
+    for slug in tenancy.tenant_slugs(all_tenants=True):
+        with tenancy.use_tenant(slug):
+            pruned[slug or "default"] = ChangeEvent.objects.filter(created_at__lt=cutoff).delete()[0]
+    idempotency_records = IdempotencyRecord.objects.filter(expires_at__lt=timezone.now()).delete()[0]
+    next_run = timezone.now() + timedelta(minutes=settings.HOUSEKEEPING_MINUTES)
+    following = jobs.enqueue("housekeeping", priority=-1, max_attempts=1, run_after=next_run)
+    return {"change_events": pruned, "idempotency_records": idempotency_records, "next_job": following.pk}
@@ -0,0 +1,142 @@
+"""
+One SQLite database per workshop (tenant).
+
+``Tenant``, ``TenantMembership``, ``Job``, ``IdempotencyRecord`` and Django's
+own apps stay in the ``default`` database. Every other dressapp model lives in the tenant's file
+under ``settings.TENANT_DB_DIR`` while that tenant is active; with no tenant
+active everything uses ``default``, as before tenancy existed.
+
+The active tenant is a context variable set from the ``tenant`` claim of the
+JWT (``TenantJWTAuthentication``) or from a job's payload, and cleared after
+each request by ``TenantMiddleware``. Tenant databases are registered as
+connection aliases (``tenant_<slug>``) the first time they are used. Their
+connections persist between requests; each thread keeps at most
+``settings.TENANT_CONNECTION_CACHE`` of them open and closes the least
+recently used one beyond that.
+"""
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+
+SHARED_MODELS = {"tenant", "tenantmembership", "job", "idempotencyrecord"}  # dressapp models that stay in "default"
+
+_current = ContextVar("dressapp_tenant", default=None)
+_register_lock = threading.Lock()
+_open = threading.local()
+
+
+def current_tenant():
+    """Slug of the active tenant, or None."""
+    return _current.get()
+
+
+def alias_for(slug):
+    return f"tenant_{slug}"
+
+
+def database_path(slug):
+    return Path(settings.TENANT_DB_DIR) / f"{slug}.sqlite3"
+
+
+def register(slug):
+    """Make ``tenant_<slug>`` a known database alias; returns the alias."""
+    alias = alias_for(slug)
+    if alias in connections.settings:
+        return alias
+    with _register_lock:
+        if alias not in connections.settings:
+            database = {**connections.settings["default"], "NAME": database_path(slug), "CONN_MAX_AGE": None}
+            database["TEST"] = {**database["TEST"], "NAME": None}
+            connections.settings[alias] = database
+            settings.DATABASES[alias] = database
+    return alias
+
+
+def tenant_slugs(tenant=None, all_tenants=False):
+    """
+    Workshops a maintenance command or job covers: ``[tenant]`` or, with
+    ``all_tenants``, None (the ``default`` database) followed by every workshop.
+    Raises ``LookupError`` for an unknown slug.
+    """
+    from dressapp.models import Tenant  # not at import time: this module is loaded as the database router
+
+    if all_tenants:
+        return [None, *Tenant.objects.order_by("slug").values_list("slug", flat=True)]
+    if tenant is not None and not Tenant.objects.filter(slug=tenant).exists():
+        raise LookupError(f"No workshop '{tenant}'")
+    return [tenant]
+
+
+def _touch(alias):
+    """Mark ``alias`` used by this thread and close this thread's least recently used extras."""
+    recent = getattr(_open, "aliases", None)
+    if recent is None:
+        recent = _open.aliases = OrderedDict()
+    recent[alias] = True
+    recent.move_to_end(alias)
+    while len(recent) > settings.TENANT_CONNECTION_CACHE:
+        stale, _ = recent.popitem(last=False)
+        connections[stale].close()
+
+
+def activate(slug):
+    """Make ``slug`` the active tenant in the current context; returns a token for ``deactivate``."""
+    if slug:
+        _touch(register(slug))
+    return _current.set(slug or None)
+
+
+def deactivate(token=None):
+    if token is None:
+        _current.set(None)
+    else:
+        _current.reset(token)
+
+
+@contextmanager
+def use_tenant(slug):
+    token = activate(slug)
+    try:
+        yield
+    finally:
+        deactivate(token)
+
+
+def tenant_database(model):
+    """Alias for ``model`` under the active tenant, or None to fall through to ``default``."""
+    slug = _current.get()
+    if slug is None or model._meta.app_label != "dressapp" or model._meta.model_name in SHARED_MODELS:
+        return None
+    return alias_for(slug)
+
+
+class TenantRouter:
+    def db_for_read(self, model, **hints):
+        return tenant_database(model)
+
+    def db_for_write(self, model, **hints):
+        return tenant_database(model)
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if not db.startswith("tenant_"):
+            return None
+        return app_label == "dressapp" and model_name not in SHARED_MODELS
+
+
+class TenantMiddleware:
+    """Start every request with no tenant and clear whatever authentication activated."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = _current.set(None)
+        try:
+            return self.get_response(request)
+        finally:
+            _current.reset(token)
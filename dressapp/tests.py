@@ -1,11 +1,42 @@
-from django.test import TestCase
+import gzip
+import hashlib
+import io
+import json
+import os
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from unittest import mock
+from pathlib import Path
+
+from asgiref.sync import sync_to_async
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.test import LiveServerTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.db import IntegrityError, connection, connections, transaction
+from django.db.models import F
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 from django.core.exceptions import ValidationError
 from rest_framework.test import APITestCase,APIClient
 from rest_framework import status
+from rest_framework_simplejwt.tokens import AccessToken
 from dressapp.models import *
 from dressapp.serializers import *
 from dressapp.views import *
+from dressapp import archiving, attachments, audit, jobs, representations, tenancy, thumbnails
+from dressapp.admin import EstimatedCountPaginator
+from dressapp.backup import backup_database
+from dressapp.deletion import cascade_size, chunked_delete
+from dressapp.management.commands.loadtest import percentile
+from dressapp.management.commands.serve import memory_kb, process_uptime
+from dressapp.signals import rows_updated
+from dressapp.slowlog import fingerprint
 from decouple import config
 
 User = get_user_model()
@@ -236,6 +267,93 @@ class OrderItemModelTest(TestCase):
             
 
 
+class OrderItemMeasurementsTest(TestCase):
+    def setUp(self):
+        self.customer = Customer.objects.create(first_name="Alex", last_name="Smith", phone="09123456789")
+        self.other = Customer.objects.create(first_name="Sara", last_name="Smith")
+        self.product = Product.objects.create(name="Pants")
+        self.shirt = Product.objects.create(name="Shirt")
+        self.length = ProductProperty.objects.create(product=self.product, name="Length", value_type="number", is_customer_specific=True)
+        self.neck = ProductProperty.objects.create(product=self.shirt, name="Neck", value_type="number", is_customer_specific=True)
+        self.measured = CustomerProductProperty.objects.create(customer=self.customer, property=self.length, value=100)
+        CustomerProductProperty.objects.create(customer=self.customer, property=self.neck, value=38)
+        CustomerProductProperty.objects.create(customer=self.other, property=self.length, value=90)
+        self.order = Order.objects.create(placed_by=self.customer, price=500, payed=200)
+
+    def test_snapshot_taken_on_create_and_kept(self):
+        item = OrderItem.objects.create(order=self.order, customer=self.customer, product=self.product)
+        self.measured.value = 104
+        self.measured.save()
+        item.refresh_from_db()
+        self.assertEqual(item.measurements, {str(self.length.id): {"name": "Length", "value": 100}})
+
+    def test_bulk_create_snapshots_in_one_query(self):
+        items = [
+            OrderItem(order=self.order, customer=self.customer, product=self.product),
+            OrderItem(order=self.order, customer=self.customer, product=self.shirt),
+            OrderItem(order=self.order, customer=self.other, product=self.shirt),
+        ]
+        with self.assertNumQueries(2):  # snapshot lookup + insert
+            OrderItem.objects.bulk_create(items)
+        self.assertEqual([item.measurements for item in items], [
+            {str(self.length.id): {"name": "Length", "value": 100}},
+            {str(self.neck.id): {"name": "Neck", "value": 38}},
+            {},
+        ])
+
+    def test_measurements_are_read_only_in_api(self):
+        serializer = OrderItemSerializer(data={
+            "order": self.order.id, "customer": self.customer.id, "product": self.product.id,
+            "measurements": {"1": {"name": "Fake", "value": 1}},
+        })
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        item = serializer.save()
+        self.assertEqual(item.measurements, {str(self.length.id): {"name": "Length", "value": 100}})
+
+
+class DatabaseConstraintTest(TestCase):
+    """The clean() rules are enforced by the database, so bulk paths can't skip them."""
+
+    def setUp(self):
+        self.customer = Customer.objects.create(first_name="Alex", last_name="Smith", phone="09123456789")
+        self.product = Product.objects.create(name="Pants")
+        self.order = Order.objects.create(placed_by=self.customer, price=500, payed=200)
+
+    def assertRejected(self, func):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            func()
+
+    def test_customer_constraints(self):
+        self.assertRejected(lambda: Customer.objects.bulk_create([Customer(first_name="   ", last_name="Doe")]))
+        self.assertRejected(lambda: Customer.objects.filter(pk=self.customer.pk).update(last_name=""))
+        self.assertRejected(lambda: Customer.objects.filter(pk=self.customer.pk).update(phone="9123456789"))
+        self.assertRejected(lambda: Customer.objects.filter(pk=self.customer.pk).update(phone="0912345678a"))
+        Customer.objects.filter(pk=self.customer.pk).update(phone=None)  # no phone is fine
+
+    def test_order_payed_cannot_exceed_price(self):
+        self.assertRejected(lambda: Order.objects.filter(pk=self.order.pk).update(payed=F("price") + 1))
+        self.assertRejected(lambda: Order.objects.bulk_create([Order(placed_by=self.customer, price=10, payed=11)]))
+        Order.objects.filter(pk=self.order.pk).update(payed=F("price"))
+
+    def test_order_item_quantity(self):
+        self.assertRejected(lambda: OrderItem.objects.bulk_create(
+            [OrderItem(order=self.order, customer=self.customer, product=self.product, quantity=0)]
+        ))
+
+    def test_api_answers_400_not_integrity_error(self):
+        serializer = OrderSerializer(self.order, data={"payed": 600}, partial=True)
+        self.assertFalse(serializer.is_valid())
+        self.assertIn("payed", serializer.errors)
+        serializer = OrderItemSerializer(data={"order": self.order.id, "customer": self.customer.id,
+                                               "product": self.product.id, "quantity": 0})
+        self.assertFalse(serializer.is_valid())
+        self.assertIn("quantity", serializer.errors)
+
+    def test_full_clean_reports_constraints(self):
+        with self.assertRaises(ValidationError):
+            Order(placed_by=self.customer, price=10, payed=11).validate_constraints()
+
+
 # ----------- Serializers ----------- #
 
 
@@ -697,4 +815,1368 @@ class OrderItemViewSetTest(AuthenticatedAPITestCase):
             "selected_properties": {str(self.prop.id): "B"},
         }
         response = self.client.post(url, data, format="json")
-        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
\ No newline at end of file
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+# -------------- Background jobs -----------------#
+
+
+
+@jobs.task("test_echo")
+def _echo_task(job):
+    return {"echo": job.payload.get("value")}
+
+
+@jobs.task("test_explode")
+def _explode_task(job):
+    raise RuntimeError("boom")
+
+
+class JobQueueTest(AuthenticatedAPITestCase):
+    def test_claim_prefers_higher_priority(self):
+        low = jobs.enqueue("test_echo", {"value": 1})
+        high = jobs.enqueue("test_echo", {"value": 2}, priority=10)
+
+        claimed = jobs.claim("tester")
+        self.assertEqual(claimed.pk, high.pk)
+        self.assertEqual(claimed.status, "running")
+        self.assertEqual(claimed.attempts, 1)
+        self.assertEqual(jobs.claim("tester").pk, low.pk)
+        self.assertIsNone(jobs.claim("tester"))
+
+    def test_run_stores_result(self):
+        job = jobs.enqueue("test_echo", {"value": "hi"})
+        jobs.run_next()
+        job.refresh_from_db()
+        self.assertEqual(job.status, "done")
+        self.assertEqual(job.result, {"echo": "hi"})
+
+    def test_failed_job_is_retried_then_marked_failed(self):
+        job = jobs.enqueue("test_explode", max_attempts=2)
+        jobs.run_next()
+        job.refresh_from_db()
+        self.assertEqual(job.status, "queued")
+        self.assertIn("boom", job.error)
+
+        Job.objects.filter(pk=job.pk).update(run_after=job.created_at)  # skip the backoff
+        jobs.run_next()
+        job.refresh_from_db()
+        self.assertEqual(job.status, "failed")
+        self.assertEqual(job.attempts, 2)
+
+        self.authenticate()
+        response = self.client.get(reverse("dressapp:job-detail", args=[job.id]))
+        self.assertEqual(response.json()["error"], "RuntimeError: boom")  # the traceback stays in the admin
+        self.assertIn("Traceback", job.error)
+
+    def test_job_status_endpoint(self):
+        self.authenticate()
+        job = jobs.enqueue("test_echo", {"value": 3})
+        response = self.client.get(reverse("dressapp:job-detail", args=[job.id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["status"], "queued")
+
+
+@override_settings(CHUNKED_DELETE_THRESHOLD=10)
+class ChunkedDeleteTest(AuthenticatedAPITestCase):
+    def setUp(self):
+        self.customer = Customer.objects.create(first_name="Alex", last_name="Doe")
+        self.product = Product.objects.create(name="Dress")
+        size = ProductProperty.objects.create(product=self.product, name="Size", value_type="number",
+                                              is_customer_specific=True)
+        CustomerProductProperty.objects.create(customer=self.customer, property=size, value=40)
+        for _ in range(4):
+            order = Order.objects.create(placed_by=self.customer, price=100, payed=0)
+            OrderItem.objects.bulk_create(
+                OrderItem(order=order, customer=self.customer, product=self.product) for _ in range(3)
+            )
+
+    def test_cascade_size(self):
+        # customer + 4 orders + 12 items (reachable via order and via customer, counted once) + 1 measurement
+        self.assertEqual(cascade_size(self.customer), 1 + 4 + 12 + 1)
+        self.assertLess(cascade_size(self.customer, limit=3), 18)  # stops counting once over the limit
+
+    def test_chunked_delete_in_batches(self):
+        progress = []
+        deleted = chunked_delete(self.product, batch_size=5, progress=lambda done, total: progress.append(done))
+        self.assertEqual(deleted["dressapp.OrderItem"], 12)
+        self.assertEqual(deleted["dressapp.CustomerProductProperty"], 1)
+        self.assertFalse(Product.objects.exists())
+        self.assertEqual(Order.objects.count(), 4)  # orders belong to the customer, not the product
+        self.assertGreaterEqual(len(progress), 3)
+        self.assertEqual(progress, sorted(progress))
+
+    def test_large_delete_runs_as_job(self):
+        self.authenticate()
+        url = reverse("dressapp:customer-detail", args=[self.customer.id])
+        response = self.client.delete(url)
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertTrue(Customer.objects.filter(pk=self.customer.pk).exists())
+        self.assertEqual(self.client.delete(url).json()["id"], response.json()["id"])  # no second job
+
+        job = jobs.run_next()
+        self.assertEqual(job.status, "done", job.error)
+        self.assertEqual(job.result["deleted"]["dressapp.Customer"], 1)
+        self.assertEqual(job.progress, {"done": 18, "total": 18})
+        self.assertFalse(Customer.objects.exists())
+        self.assertFalse(OrderItem.objects.exists())
+        self.assertTrue(ChangeEvent.objects.filter(model="customer", action="deleted").exists())
+
+    def test_small_delete_is_immediate(self):
+        other = Customer.objects.create(first_name="Sara", last_name="Smith")
+        self.authenticate()
+        response = self.client.delete(reverse("dressapp:customer-detail", args=[other.id]))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(Customer.objects.filter(pk=other.pk).exists())
+        self.assertFalse(Job.objects.exists())
+
+
+class OrderBulkStatusTest(AuthenticatedAPITestCase):
+    def setUp(self):
+        self.customer = Customer.objects.create(first_name="Alex", last_name="Doe", phone="09123456789")
+        self.other = Customer.objects.create(first_name="Sara", last_name="Smith", phone="09111111111")
+        self.order_1 = Order.objects.create(placed_by=self.customer, price=500, payed=300)
+        self.order_2 = Order.objects.create(placed_by=self.customer, price=400, payed=400, status="completed")
+        self.order_3 = Order.objects.create(placed_by=self.other, price=100, payed=0)
+        self.url = reverse("dressapp:order-bulk-status")
+
+    def test_bulk_status_by_ids(self):
+        self.authenticate()
+        received = []
+
+        def receiver(sender, pks, changes, **kwargs):
+            received.append((sender, sorted(pks), changes))
+
+        rows_updated.connect(receiver)
+        try:
+            data = {"status": "completed", "ids": [self.order_1.id, self.order_2.id, 9999]}
+            response = self.client.post(self.url, data, format="json")
+        finally:
+            rows_updated.disconnect(receiver)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = {r["id"]: r["result"] for r in response.json()["results"]}
+        self.assertEqual(results, {self.order_1.id: "updated", self.order_2.id: "unchanged", 9999: "not_found"})
+        self.order_1.refresh_from_db()
+        self.assertEqual(self.order_1.status, "completed")
+        self.assertEqual(received, [(Order, [self.order_1.id], {"status": "completed"})])
+
+    def test_bulk_status_by_filter(self):
+        self.authenticate()
+        data = {"status": "completed", "filter": {"status": "in_progress", "placed_by": self.customer.id}}
+        response = self.client.post(self.url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["updated"], 1)
+        self.order_3.refresh_from_db()
+        self.assertEqual(self.order_3.status, "in_progress")
+
+    def test_bulk_status_rejects_unknown_status(self):
+        self.authenticate()
+        response = self.client.post(self.url, {"status": "lost", "ids": [self.order_1.id]}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_status_rejects_bad_filters(self):
+        self.authenticate()
+        for bad in ({"placed_by": "abc"}, {"status": "lost"}, {"price": 100}, {}, "in_progress"):
+            response = self.client.post(self.url, {"status": "completed", "filter": bad}, format="json")
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, bad)
+            self.assertIn("filter", response.json())
+
+
+class BatchViewTest(AuthenticatedAPITestCase):
+    def setUp(self):
+        self.customer = Customer.objects.create(first_name="Alex", last_name="Doe", phone="09123456789")
+        self.product = Product.objects.create(name="Jacket")
+        self.prop = ProductProperty.objects.create(
+            product=self.product, name="Pocket Style", value_type="dropdown", possible_values=["A", "B"], is_customer_specific=False
+        )
+        self.url = reverse("dressapp:batch")
+
+    def test_batch_resolves_refs_across_operations(self):
+        self.authenticate()
+        data = {"operations": [
+            {"method": "POST", "resource": "orders", "ref": "o1",
+             "body": {"placed_by": self.customer.id, "price": 900, "payed": 100}},
+            {"method": "POST", "resource": "order-items",
+             "body": {"order": {"$ref": "o1"}, "customer": self.customer.id, "product": self.product.id,
+                      "selected_properties": {str(self.prop.id): "A"}}},
+            {"method": "PATCH", "resource": "orders", "id": {"$ref": "o1"}, "body": {"payed": 900}},
+            {"method": "PATCH", "resource": "customers", "id": self.customer.id, "body": {"last_name": "Smith"}},
+        ]}
+        response = self.client.post(self.url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        self.assertEqual([r["status"] for r in response.json()["results"]], [201, 201, 200, 200])
+
+        order = Order.objects.get(pk=response.json()["refs"]["o1"])
+        self.assertEqual(order.payed, 900)
+        self.assertEqual(OrderItem.objects.get().order_id, order.id)
+        self.customer.refresh_from_db()
+        self.assertEqual(self.customer.last_name, "Smith")
+
+    def test_failed_operation_rolls_back_batch(self):
+        self.authenticate()
+        data = {"operations": [
+            {"method": "POST", "resource": "customers", "body": {"first_name": "Sara", "last_name": "Ahmadi"}},
+            {"method": "POST", "resource": "orders", "body": {"placed_by": self.customer.id, "price": 100, "payed": -1}},
+        ]}
+        response = self.client.post(self.url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(response.json()["committed"])
+        self.assertEqual(response.json()["results"][1]["status"], 400)
+        self.assertEqual(Customer.objects.count(), 1)
+
+    def test_unknown_ref_and_missing_object(self):
+        self.authenticate()
+        data = {"operations": [{"method": "DELETE", "resource": "customers", "id": {"$ref": "nope"}}]}
+        response = self.client.post(self.url, data, format="json")
+        self.assertEqual(response.json()["results"][0]["status"], 400)
+
+        data = {"operations": [{"method": "DELETE", "resource": "customers", "id": 9999}]}
+        response = self.client.post(self.url, data, format="json")
+        self.assertEqual(response.json()["results"][0]["status"], 404)
+
+    def test_operations_carry_their_own_method(self):
+        order = Order.objects.create(placed_by=self.customer, price=100, payed=0)
+        self.authenticate()
+        data = {"operations": [{"method": "PATCH", "resource": "attachments", "id": 1, "body": {}}]}
+        response = self.client.post(self.url, data, format="json")
+        self.assertEqual(response.json()["results"][0]["status"], 400)  # attachments allow get/post/delete
+
+        data = {"operations": [{"method": "PATCH", "resource": "orders", "id": order.id, "body": {"payed": 50}}]}
+        with mock.patch.object(IsAuthenticated, "has_permission", autospec=True, return_value=True) as check:
+            response = self.client.post(self.url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        self.assertEqual([call.args[1].method for call in check.call_args_list], ["POST", "PATCH"])
+
+    def test_attachment_uploads_need_multipart(self):
+        order = Order.objects.create(placed_by=self.customer, price=100, payed=0)
+        self.authenticate()
+        data = {"operations": [{"method": "POST", "resource": "attachments", "body": {"order": order.id}}]}
+        response = self.client.post(self.url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json()["results"][0]["status"], 400)
+        self.assertIn("file", response.json()["results"][0]["errors"])
+        self.assertFalse(Attachment.objects.exists())
+
+
+class SparseFieldsetTest(AuthenticatedAPITestCase):
+    def setUp(self):
+        self.product = Product.objects.create(name="Jacket")
+        self.prop = ProductProperty.objects.create(product=self.product, name="Length", value_type="number", is_customer_specific=True)
+        for i in range(3):
+            customer = Customer.objects.create(first_name="Alex", last_name="Doe", phone=f"0912345678{i}")
+            CustomerProductProperty.objects.create(customer=customer, property=self.prop, value=100 + i)
+            order = Order.objects.create(placed_by=customer, price=500, payed=200)
+            OrderItem.objects.create(order=order, customer=customer, product=self.product)
+
+    def test_fields_limits_keys_and_columns(self):
+        self.authenticate()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/customers/?fields=id,first_name")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(response.json()["results"][0]), {"id", "first_name"})
+        select = [q["sql"] for q in queries.captured_queries if 'FROM "dressapp_customer"' in q["sql"]][-1]
+        self.assertNotIn('"phone"', select)
+
+    def test_expand_uses_joins_instead_of_extra_queries(self):
+        self.authenticate()
+        response = self.client.get("/api/orders/?expand=placed_by,items")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        order = response.json()["results"][0]
+        self.assertEqual(order["placed_by"]["first_name"], "Alex")
+        self.assertEqual(order["items"][0]["product"], self.product.id)
+
+        Order.objects.create(placed_by=Customer.objects.first(), price=1, payed=0)
+        with CaptureQueriesContext(connection) as few:
+            self.client.get("/api/orders/?expand=placed_by,items")
+        for _ in range(5):
+            Order.objects.create(placed_by=Customer.objects.first(), price=1, payed=0)
+        with CaptureQueriesContext(connection) as many:
+            self.client.get("/api/orders/?expand=placed_by,items")
+        self.assertEqual(len(few), len(many))
+
+    def test_dotted_sources_are_joined(self):
+        self.authenticate()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/customer-properties/")
+        self.assertEqual(response.json()["results"][0]["property_name"], "Length")
+        self.assertEqual(len([q for q in queries.captured_queries if 'FROM "dressapp_productproperty"' in q["sql"]]), 0)
+
+    def test_writes_ignore_shape(self):
+        self.authenticate()
+        data = {"first_name": "Sara", "last_name": "Ahmadi"}
+        response = self.client.post("/api/customers/?fields=id", data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertIn("first_name", response.json())
+
+
+class RepresentationCacheTest(AuthenticatedAPITestCase):
+    def setUp(self):
+        representations.cache.clear()
+        self.customers = [Customer.objects.create(first_name="Alex", last_name="Doe", phone=f"0912345678{i}") for i in range(3)]
+
+    def customer_selects(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        selects = [q["sql"] for q in queries.captured_queries if 'FROM "dressapp_customer"' in q["sql"] and "COUNT" not in q["sql"]]
+        return response.json(), selects
+
+    def test_list_and_detail_reuse_cached_rows(self):
+        self.authenticate()
+        first, selects = self.customer_selects("/api/customers/")
+        self.assertEqual(len(selects), 2)  # versions, then the missing rows
+        second, selects = self.customer_selects("/api/customers/")
+        self.assertEqual(second, first)
+        self.assertEqual(len(selects), 1)
+        self.assertNotIn('"phone"', selects[0])
+
+        detail, selects = self.customer_selects(f"/api/customers/{self.customers[0].id}/")
+        self.assertEqual(detail, next(c for c in first["results"] if c["id"] == self.customers[0].id))
+        self.assertEqual(len(selects), 1)
+        self.assertEqual(self.client.get("/api/customers/999999/").status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_changes_are_never_served_stale(self):
+        self.authenticate()
+        url = f"/api/customers/{self.customers[0].id}/"
+        self.client.get(url)
+        self.client.patch(url, {"first_name": "Sara"}, format="json")
+        self.assertEqual(self.client.get(url).json()["first_name"], "Sara")
+
+        Customer.objects.filter(pk=self.customers[0].pk).update(last_name="Smith")  # updated_at untouched
+        rows_updated.send(sender=Customer, pks=[self.customers[0].pk], changes={"last_name": "Smith"}, using="default")
+        self.assertEqual(self.client.get(url).json()["last_name"], "Smith")
+
+    def test_shapes_are_cached_apart_and_expand_bypasses(self):
+        self.authenticate()
+        self.client.get("/api/customers/")
+        sparse, _ = self.customer_selects("/api/customers/?fields=id,first_name")
+        self.assertEqual(set(sparse["results"][0]), {"id", "first_name"})
+        expanded, _ = self.customer_selects("/api/customers/?expand=product_properties")
+        self.assertEqual(expanded["results"][0]["product_properties"], [])
+        self.assertEqual(len(representations.cache), 6)
+
+    @override_settings(REPRESENTATION_CACHE_ENTRIES=2)
+    def test_least_recently_used_rows_are_evicted(self):
+        self.authenticate()
+        self.client.get("/api/customers/")
+        self.assertEqual(len(representations.cache), 2)
+        self.client.get(f"/api/customers/{self.customers[0].id}/")
+        self.assertLessEqual(len(representations.cache), 2)
+        self.assertGreater(representations.cache.size, 0)
+
+
+class ColumnarRendererTest(AuthenticatedAPITestCase):
+    def setUp(self):
+        self.customer_1 = Customer.objects.create(first_name="Ali", last_name="Rezaei", phone="09123456789")
+        self.customer_2 = Customer.objects.create(first_name="Sara", last_name="Smith", phone="09333333333")
+
+    def test_list_as_columns_and_rows(self):
+        self.authenticate()
+        response = self.client.get("/api/customers/?format=columnar&fields=id,first_name&ordering=first_name")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "application/vnd.dressapp.columnar+json")
+        body = json.loads(response.content)
+        self.assertEqual(body["count"], 2)
+        self.assertEqual(body["results"]["columns"], ["id", "first_name"])
+        self.assertEqual(body["results"]["rows"], [[self.customer_1.id, "Ali"], [self.customer_2.id, "Sara"]])
+
+    def test_accept_header_and_detail_passthrough(self):
+        self.authenticate()
+        url = reverse("dressapp:customer-detail", args=[self.customer_1.id])
+        response = self.client.get(url, HTTP_ACCEPT="application/vnd.dressapp.columnar+json")
+        self.assertEqual(json.loads(response.content)["first_name"], "Ali")
+
+    def test_gzip_when_accepted(self):
+        self.authenticate()
+        for i in range(30):
+            Customer.objects.create(first_name="Reza", last_name="Karimi", phone=f"091200000{i:02d}")
+        response = self.client.get("/api/customers/?format=columnar", HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+
+
+class OrderItemPropertyIndexTest(AuthenticatedAPITestCase):
+    def setUp(self):
+        self.customer = Customer.objects.create(first_name="Alex", last_name="Doe", phone="09123456789")
+        self.product = Product.objects.create(name="Dress")
+        self.fabric = ProductProperty.objects.create(product=self.product, name="Fabric", value_type="text")
+        self.width = ProductProperty.objects.create(product=self.product, name="Width", value_type="number")
+        self.order = Order.objects.create(placed_by=self.customer, price=500, payed=200)
+        self.silk = OrderItem.objects.create(order=self.order, customer=self.customer, product=self.product, quantity=2,
+                                             selected_properties={str(self.fabric.id): "Silk ", str(self.width.id): 40.0})
+        self.cotton = OrderItem.objects.create(order=self.order, customer=self.customer, product=self.product,
+                                               selected_properties={str(self.fabric.id): "cotton"})
+
+    def test_index_follows_saves(self):
+        self.assertEqual(
+            set(OrderItemPropertyValue.objects.values_list("order_item_id", "property_id", "value")),
+            {(self.silk.id, self.fabric.id, "silk"), (self.silk.id, self.width.id, "40"), (self.cotton.id, self.fabric.id, "cotton")},
+        )
+        self.cotton.selected_properties = {str(self.fabric.id): "Linen"}
+        self.cotton.save()
+        self.assertEqual(OrderItemPropertyValue.objects.get(order_item=self.cotton).value, "linen")
+
+    def test_prop_filter(self):
+        self.authenticate()
+        response = self.client.get(f"/api/order-items/?prop={self.fabric.id}:SILK")
+        self.assertEqual([item["id"] for item in response.json()["results"]], [self.silk.id])
+        response = self.client.get(f"/api/order-items/?prop={self.fabric.id}:silk&prop={self.width.id}:40")
+        self.assertEqual(response.json()["count"], 1)
+        response = self.client.get("/api/order-items/?prop=nonsense")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_property_report(self):
+        self.authenticate()
+        OrderItem.objects.create(order=self.order, customer=self.customer, product=self.product, quantity=3,
+                                 selected_properties={str(self.fabric.id): "silk"})
+        response = self.client.get(f"/api/order-items/property-report/?property={self.fabric.id}")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["values"], [
+            {"value": "silk", "items": 2, "quantity": 5},
+            {"value": "cotton", "items": 1, "quantity": 1},
+        ])
+
+    def test_rebuild_job(self):
+        self.authenticate()
+        OrderItemPropertyValue.objects.all().delete()
+        response = self.client.post("/api/order-items/rebuild-property-index/")
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        jobs.run_next()
+        self.assertEqual(Job.objects.get(pk=response.json()["id"]).result, {"items": 2, "values": 3})
+        self.assertEqual(OrderItemPropertyValue.objects.count(), 3)
+
+
+class AdminChangelistTest(TestCase):
+    def setUp(self):
+        self.admin_user = User.objects.create_superuser(username="boss", password="secret-pass-123")
+        self.client.force_login(self.admin_user)
+        self.product = Product.objects.create(name="Dress")
+        self.prop = ProductProperty.objects.create(product=self.product, name="Length", value_type="number", is_customer_specific=True)
+
+    def add_rows(self, count):
+        for _ in range(count):
+            n = Customer.objects.count()
+            customer = Customer.objects.create(first_name="Alex", last_name="Doe", phone=f"09{n:09d}")
+            order = Order.objects.create(placed_by=customer, price=100, payed=0)
+            OrderItem.objects.create(order=order, customer=customer, product=self.product)
+            CustomerProductProperty.objects.create(customer=customer, property=self.prop, value=n)
+
+    def changelist_queries(self, model):
+        url = reverse(f"admin:dressapp_{model._meta.model_name}_changelist")
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_changelist_query_count_is_constant(self):
+        models_ = [Customer, Order, OrderItem, CustomerProductProperty, ProductProperty]
+        self.add_rows(2)
+        small = {model: self.changelist_queries(model) for model in models_}
+        self.add_rows(10)
+        large = {model: self.changelist_queries(model) for model in models_}
+        self.assertEqual(small, large)
+
+    def test_estimated_count_paginator(self):
+        self.add_rows(3)
+        paginator = EstimatedCountPaginator(Customer.objects.order_by("pk"), 50)
+        paginator.exact_below = 1
+        Customer.objects.filter(pk=Customer.objects.order_by("pk").first().pk).delete()
+        self.assertEqual(paginator.count, Customer.objects.order_by("-pk").first().pk)
+        filtered = EstimatedCountPaginator(Customer.objects.filter(first_name="Alex").order_by("pk"), 50)
+        filtered.exact_below = 1
+        self.assertEqual(filtered.count, 2)
+
+
+class RequestProfilingTest(AuthenticatedAPITestCase):
+    def setUp(self):
+        self.profile_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.profile_dir)
+        self.settings_override = override_settings(PROFILING_DIR=self.profile_dir)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+        Customer.objects.create(first_name="Ali", last_name="Rezaei", phone="09123456789")
+
+    def test_cpu_profile_written_and_browsable(self):
+        self.authenticate()
+        response = self.client.get("/api/customers/", HTTP_X_PROFILE="cpu")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        name = response["X-Profile-Id"]
+        self.assertTrue(name.endswith(".prof"))
+
+        listing = self.client.get("/api/profiles/").json()
+        self.assertEqual([entry["name"] for entry in listing], [name])
+        detail = self.client.get(f"/api/profiles/{name}/")
+        self.assertIn("function calls", detail.json()["summary"])
+
+    def test_memory_profile_via_query_flag(self):
+        self.authenticate()
+        response = self.client.get("/api/customers/?_profile=mem")
+        self.assertTrue(response["X-Profile-Id"].endswith(".snapshot"))
+
+    def test_non_staff_requests_are_not_profiled(self):
+        self.authenticate()
+        self.user.is_staff = False
+        self.user.save()
+        response = self.client.get("/api/customers/", HTTP_X_PROFILE="cpu")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(response.has_header("X-Profile-Id"))
+        self.assertEqual(os.listdir(self.profile_dir), [])
+        self.assertEqual(self.client.get("/api/profiles/").status_code, status.HTTP_403_FORBIDDEN)
+
+
+class SlowQueryLogTest(AuthenticatedAPITestCase):
+    def setUp(self):
+        customer = Customer.objects.create(first_name="Alex", last_name="Doe", phone="09123456789")
+        Order.objects.create(placed_by=customer, price=500, payed=200)
+
+    def records(self, logs):
+        return [json.loads(record.getMessage()) for record in logs.records]
+
+    @override_settings(SLOW_QUERY_MS=0)
+    def test_slow_query_has_plan_and_context(self):
+        self.authenticate()
+        with self.assertLogs("dressapp.slow_queries", "WARNING") as logs:
+            self.client.get("/api/orders/?search=Alex&placed_by=1")
+        slow = [r for r in self.records(logs) if r["event"] == "slow_query" and 'FROM "dressapp_order"' in r["sql"]]
+        self.assertTrue(slow)
+        self.assertEqual(slow[-1]["view"], "dressapp:order-list")
+        self.assertIn("search=Alex", slow[-1]["query"])
+        self.assertTrue(any(r["plan"] for r in slow))
+
+    @override_settings(SLOW_QUERY_REPEAT_THRESHOLD=3)
+    def test_repeated_queries_are_reported(self):
+        self.authenticate()
+        order = Order.objects.get()
+        product = Product.objects.create(name="Dress")
+        props = [ProductProperty.objects.create(product=product, name=f"P{i}", value_type="text") for i in range(4)]
+        with self.assertLogs("dressapp.slow_queries", "WARNING") as logs:
+            response = self.client.post("/api/order-items/", {
+                "order": order.id, "customer": order.placed_by_id, "product": product.id,
+                "selected_properties": {str(prop.id): "x" for prop in props},
+            }, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        repeated = [r for r in self.records(logs) if r["event"] == "repeated_query"]
+        self.assertEqual(repeated[0]["count"], 4)
+        self.assertIn("dressapp_productproperty", repeated[0]["sql"])
+        self.assertTrue(repeated[0]["call_site"].startswith("dressapp/serializers.py"))
+
+    def test_call_site_only_for_logged_queries(self):
+        self.authenticate()
+        with mock.patch("dressapp.slowlog.call_site") as call_site:
+            self.client.get("/api/orders/")
+        call_site.assert_not_called()
+
+    def test_fingerprint_ignores_literals(self):
+        self.assertEqual(
+            fingerprint('SELECT * FROM "t" WHERE "id" IN (%s, %s, %s) LIMIT 21'),
+            fingerprint('SELECT * FROM "t" WHERE "id" IN (%s) LIMIT 10'),
+        )
+
+
+class PWAServingTest(TestCase):
+    def setUp(self):
+        self.source = Path(tempfile.mkdtemp())
+        self.root = Path(tempfile.mkdtemp()) / "pwa"
+        self.addCleanup(shutil.rmtree, self.source)
+        self.addCleanup(shutil.rmtree, self.root.parent)
+        (self.source / "assets").mkdir()
+        (self.source / "index.html").write_text("<html>" + "app " * 200 + "</html>")
+        (self.source / "assets" / "index-4f9a2c1b.js").write_text("console.log('pwa');" * 100)
+        (self.source / "vite.svg").write_text("<svg/>")
+        override = override_settings(PWA_ROOT=str(self.root))
+        override.enable()
+        self.addCleanup(override.disable)
+        call_command("collect_pwa", source=str(self.source), stdout=io.StringIO())
+
+    def test_collect_precompresses(self):
+        self.assertTrue((self.root / "assets" / "index-4f9a2c1b.js.gz").is_file())
+        self.assertFalse((self.root / "vite.svg.gz").exists())  # too small to bother
+
+    def test_hashed_asset_is_immutable_and_precompressed(self):
+        response = self.client.get("/assets/index-4f9a2c1b.js", HTTP_ACCEPT_ENCODING="gzip, deflate")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("immutable", response["Cache-Control"])
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        body = gzip.decompress(b"".join(response.streaming_content))
+        self.assertTrue(body.startswith(b"console.log"))
+
+    def test_index_revalidates(self):
+        response = self.client.get("/orders/12")  # client-side route
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Cache-Control"], "no-cache")
+        again = self.client.get("/", HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(again.status_code, 304)
+
+    def test_range_request(self):
+        response = self.client.get("/assets/index-4f9a2c1b.js", HTTP_RANGE="bytes=0-6", HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b"".join(response.streaming_content), b"console")
+        size = (self.root / "assets" / "index-4f9a2c1b.js").stat().st_size
+        self.assertEqual(response["Content-Range"], f"bytes 0-6/{size}")
+        self.assertFalse(response.has_header("Content-Encoding"))
+
+    def test_unusable_ranges_get_the_whole_file(self):
+        size = (self.root / "assets" / "index-4f9a2c1b.js").stat().st_size
+        for header in ("bytes=0-1,4-5", "bytes=5-2", "items=0-1", "bytes=-"):
+            response = self.client.get("/assets/index-4f9a2c1b.js", HTTP_RANGE=header)
+            self.assertEqual(response.status_code, 200, header)
+            self.assertEqual(len(b"".join(response.streaming_content)), size)
+
+        response = self.client.get("/assets/index-4f9a2c1b.js", HTTP_RANGE=f"bytes={size}-")
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response["Content-Range"], f"bytes */{size}")
+
+    def test_missing_files_and_api_paths(self):
+        self.assertEqual(self.client.get("/assets/missing.js").status_code, 404)
+        self.assertEqual(self.client.get("/api/nothing-here/").status_code, 404)
+        self.assertNotIn("<html>", self.client.get("/api/nothing-here/").content.decode())
+
+
+class BootstrapViewTest(AuthenticatedAPITestCase):
+    def setUp(self):
+        self.product = Product.objects.create(name="Dress")
+        ProductProperty.objects.create(product=self.product, name="Length", value_type="number", is_customer_specific=True)
+        for i in range(12):
+            customer = Customer.objects.create(first_name=f"Customer{i:02d}", last_name="Doe", phone=f"091200000{i:02d}")
+            Order.objects.create(placed_by=customer, price=100, payed=0, status="completed" if i % 2 else "in_progress")
+        self.url = reverse("dressapp:bootstrap")
+
+    def test_bootstrap_payload(self):
+        self.authenticate()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        self.assertEqual(data["user"]["username"], self.username)
+        self.assertEqual(data["products"][0]["properties"][0]["name"], "Length")
+        self.assertEqual(data["customers"]["count"], 12)
+        self.assertEqual(len(data["customers"]["results"]), 10)
+        self.assertIn("page=2", data["customers"]["next"])
+        self.assertEqual(data["orders"]["count"], 6)
+        self.assertEqual({o["status"] for o in data["orders"]["results"]}, {"in_progress"})
+
+    def test_etag_revalidation(self):
+        self.authenticate()
+        etag = self.client.get(self.url)["ETag"]
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        Product.objects.create(name="Shirt")
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_etag_revalidation_with_gzip(self):
+        self.authenticate()
+        etag = self.client.get(self.url, HTTP_ACCEPT_ENCODING="gzip")["ETag"]
+        self.assertTrue(etag.startswith("W/"))  # weakened by GZipMiddleware
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING="gzip", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response["ETag"].removeprefix("W/"), etag.removeprefix("W/"))
+
+
+@override_settings(SSE_MAX_SECONDS=0.2, SSE_POLL_SECONDS=0.05, SSE_HEARTBEAT_SECONDS=0.1)
+class ChangeEventStreamTest(AuthenticatedAPITestCase):
+    def setUp(self):
+        self.customer = Customer.objects.create(first_name="Alex", last_name="Doe", phone="09123456789")
+        self.url = reverse("dressapp:events")
+
+    def read_stream(self, **extra):
+        response = self.client.get(self.url, {"token": self.token}, **extra)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        self.assertFalse(response.is_async)  # WSGI gets a sync iterator, so nothing is buffered
+        return self.parse(b"".join(response).decode())
+
+    @staticmethod
+    def parse(body):
+        messages = []
+        for block in body.split("\n\n"):
+            lines = dict(line.split(": ", 1) for line in block.splitlines() if ": " in line and not line.startswith(":"))
+            if "data" in lines:
+                messages.append((lines["event"], json.loads(lines["data"])))
+        return body, messages
+
+    def test_saves_and_deletes_are_recorded(self):
+        order = Order.objects.create(placed_by=self.customer, price=100, payed=0)
+        order.status = "completed"
+        order.save()
+        order.delete()
+        self.assertEqual(
+            list(ChangeEvent.objects.filter(model="order").values_list("action", flat=True)),
+            ["created", "updated", "deleted"],
+        )
+        self.assertEqual(ChangeEvent.objects.filter(model="order")[1].data["status"], "completed")
+
+    def test_bulk_updates_carry_the_same_hints(self):
+        order = Order.objects.create(placed_by=self.customer, price=100, payed=0)
+        self.authenticate()
+        self.client.post(reverse("dressapp:order-bulk-status"), {"status": "completed", "ids": [order.id]}, format="json")
+        event = ChangeEvent.objects.filter(model="order", action="updated").get()
+        self.assertEqual(event.data, {"status": "completed", "placed_by_id": self.customer.id})
+
+    def test_resume_from_last_event_id(self):
+        self.authenticate()
+        last_seen = ChangeEvent.objects.latest("id").id
+        order = Order.objects.create(placed_by=self.customer, price=100, payed=0)
+        self.client.post(reverse("dressapp:order-bulk-status"), {"status": "completed", "ids": [order.id]}, format="json")
+
+        body, messages = self.read_stream(HTTP_LAST_EVENT_ID=str(last_seen))
+        self.assertTrue(body.startswith("retry: "))
+        self.assertEqual(
+            [(m["model"], m["pk"], m["action"]) for _, m in messages],
+            [("order", order.id, "created"), ("order", order.id, "updated")],
+        )
+        self.assertIn(": ping", body)
+
+    def test_new_connection_starts_from_now_and_pruned_ids_reset(self):
+        self.authenticate()
+        _, messages = self.read_stream()
+        self.assertEqual(messages, [])
+
+        ChangeEvent.objects.create(model="customer", object_id=self.customer.id, action="updated")
+        ChangeEvent.objects.filter(pk=ChangeEvent.objects.earliest("id").pk).delete()
+        _, messages = self.read_stream(HTTP_LAST_EVENT_ID="0")
+        self.assertEqual(messages[0][0], "reset")
+
+    def test_requires_token(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 401)
+
+    @override_settings(SSE_MAX_SECONDS=30)
+    def test_wsgi_stream_sends_before_it_ends(self):
+        self.authenticate()
+        response = self.client.get(self.url, {"token": self.token})
+        started = time.monotonic()
+        self.assertTrue(next(iter(response)).startswith(b"retry: "))
+        self.assertLess(time.monotonic() - started, 5)
+        response.close()
+
+    async def test_asgi_stream_is_async(self):
+        await sync_to_async(self.authenticate)()
+        last_seen = await ChangeEvent.objects.alatest("id")
+        await Customer.objects.acreate(first_name="Sara", last_name="Ahmadi")
+        response = await self.async_client.get(self.url, {"token": self.token},
+                                               headers={"Last-Event-ID": str(last_seen.id)})
+        self.assertTrue(response.is_async)
+        body = b"".join([chunk async for chunk in response.streaming_content]).decode()
+        _, messages = self.parse(body)
+        self.assertEqual([(m["model"], m["action"]) for _, m in messages], [("customer", "created")])
+
+    def test_housekeeping_prunes_expired_events(self):
+        ChangeEvent.objects.update(created_at=timezone.now() - timedelta(days=2))
+        ChangeEvent.objects.create(model="customer", object_id=self.customer.id, action="updated")
+        job = jobs.ensure_queued("housekeeping")
+        self.assertEqual(jobs.ensure_queued("housekeeping"), job)
+        jobs.run(job)
+        job.refresh_from_db()
+        self.assertEqual(job.result["change_events"], {"default": 1})
+        self.assertEqual(ChangeEvent.objects.count(), 1)
+        self.assertEqual(Job.objects.get(pk=job.result["next_job"]).status, "queued")
+
+
+class CalendarTest(AuthenticatedAPITestCase):
+    def setUp(self):
+        customer = Customer.objects.create(first_name="Alex", last_name="Doe")
+        dress, coat = Product.objects.create(name="Dress"), Product.objects.create(name="Coat")
+        self.day = date(2025, 11, 3)
+        first = Order.objects.create(placed_by=customer, price=100, payed=0, due_date=self.day,
+                                     fitting_date=self.day - timedelta(days=2))
+        second = Order.objects.create(placed_by=customer, price=100, payed=0, due_date=self.day)
+        OrderItem.objects.create(order=first, customer=customer, product=dress, quantity=2)
+        OrderItem.objects.create(order=first, customer=customer, product=coat)
+        OrderItem.objects.create(order=second, customer=customer, product=dress)
+        Order.objects.create(placed_by=customer, price=100, payed=0, due_date=self.day + timedelta(days=1))  # no items
+        Order.objects.create(placed_by=customer, price=100, payed=100, due_date=self.day, status="completed")
+        Order.objects.create(placed_by=customer, price=100, payed=0, due_date=date(2025, 12, 1))
+
+    def test_days_with_counts_and_products(self):
+        self.authenticate()
+        response = self.client.get(reverse("dressapp:calendar"), {"from": "2025-11-01", "to": "2025-11-30"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        days = response.json()["days"]
+        self.assertEqual(days, [
+            {"date": "2025-11-01", "orders": 0, "fittings": 1, "products": []},
+            {"date": "2025-11-03", "orders": 2, "fittings": 0, "products": [
+                {"product": days[1]["products"][0]["product"], "name": "Dress", "quantity": 3},
+                {"product": days[1]["products"][1]["product"], "name": "Coat", "quantity": 1},
+            ]},
+            {"date": "2025-11-04", "orders": 1, "fittings": 0, "products": []},
+        ])
+
+    def test_range_uses_partial_index(self):
+        plan = CalendarView.due_rows(self.day, self.day).explain()
+        self.assertIn("order_due_in_progress_idx", plan)
+        self.assertIn("order_fitting_in_progress_idx", CalendarView.fitting_rows(self.day, self.day).explain())
+
+    def test_rejects_bad_ranges(self):
+        self.authenticate()
+        url = reverse("dressapp:calendar")
+        for params in ({}, {"from": "2025-11-30", "to": "2025-11-01"}, {"from": "2025-01-01", "to": "2025-12-31"},
+                       {"from": "2025-02-30", "to": "2025-03-01"}):
+            self.assertEqual(self.client.get(url, params).status_code, status.HTTP_400_BAD_REQUEST, params)
+
+    def test_fitting_after_due_date_is_rejected(self):
+        self.authenticate()
+        order = Order.objects.filter(fitting_date__isnull=False).get()
+        response = self.client.patch(reverse("dressapp:order-detail", args=[order.id]),
+                                     {"fitting_date": "2025-11-10"}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ArchiveOrdersTest(AuthenticatedAPITestCase):
+    def setUp(self):
+        self.customer = Customer.objects.create(first_name="Alex", last_name="Doe", phone="09123456789")
+        self.product = Product.objects.create(name="Dress")
+        self.old = Order.objects.create(placed_by=self.customer, price=500, payed=500, status="completed")
+        self.item = OrderItem.objects.create(order=self.old, customer=self.customer, product=self.product, quantity=2)
+        self.recent = Order.objects.create(placed_by=self.customer, price=300, payed=300, status="completed")
+        self.open = Order.objects.create(placed_by=self.customer, price=200, payed=0)
+        self.old_date = timezone.now() - timedelta(days=400)
+        Order.objects.filter(pk__in=[self.old.pk, self.open.pk]).update(created_at=self.old_date)
+        call_command("archive_orders", "--older-than", "365", "--batch-size", "1", stdout=io.StringIO())
+
+    def test_moves_only_old_completed_orders(self):
+        self.assertEqual(set(Order.objects.values_list("id", flat=True)), {self.recent.id, self.open.id})
+        archived = ArchivedOrder.objects.get()
+        self.assertEqual((archived.id, archived.price, archived.status), (self.old.id, 500, "completed"))
+        self.assertEqual(archived.created_at, self.old_date)
+        self.assertEqual(list(archived.order.values_list("id", "quantity")), [(self.item.id, 2)])
+        self.assertFalse(OrderItem.objects.exists())
+
+    def test_moves_are_logged_as_archived(self):
+        self.assertFalse(AuditEntry.objects.filter(action="deleted").exists())
+        self.assertEqual(
+            set(AuditEntry.objects.filter(action="archived").values_list("model", "object_id")),
+            {("order", self.old.id), ("orderitem", self.item.id)},
+        )
+        self.assertFalse(ChangeEvent.objects.filter(action="deleted").exists())
+        self.assertEqual(ChangeEvent.objects.filter(action="archived").count(), 2)
+        self.assertFalse(archiving.moving())
+
+        open_id = self.open.id
+        self.open.delete()
+        self.assertTrue(AuditEntry.objects.filter(model="order", object_id=open_id, action="deleted").exists())
+
+    def test_lists_are_hot_unless_asked(self):
+        self.authenticate()
+        url = reverse("dressapp:order-list")
+        hot = self.client.get(url).json()["results"]
+        self.assertEqual({o["id"] for o in hot}, {self.recent.id, self.open.id})
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {"include_archived": "1", "expand": "placed_by", "status": "completed"})
+        body = response.json()
+        self.assertEqual(body["count"], 2)
+        self.assertEqual([(o["id"], o["archived"]) for o in body["results"]], [(self.recent.id, False), (self.old.id, True)])
+        self.assertEqual(body["results"][1]["placed_by"]["first_name"], "Alex")
+        self.assertEqual(len([q for q in queries if "UNION" in q["sql"]]), 2)  # count + page
+
+        by_price = self.client.get(url, {"include_archived": "1", "ordering": "-price", "expand": "items"}).json()
+        self.assertEqual([o["id"] for o in by_price["results"]], [self.old.id, self.recent.id, self.open.id])
+
+        items = self.client.get(reverse("dressapp:orderitem-list"), {"order": self.old.id, "include_archived": "true"}).json()
+        self.assertEqual([(i["id"], i["archived"]) for i in items["results"]], [(self.item.id, True)])
+
+    def test_archived_detail_is_read_only(self):
+        self.authenticate()
+        url = reverse("dressapp:order-detail", args=[self.old.id])
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.get(url, {"include_archived": "1"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.json()["archived"])
+        response = self.client.patch(f"{url}?include_archived=1", {"payed": 0}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+JPEG = b"\xff\xd8\xff\xe0\x00\x10JFIF\x00" + b"\x00" * 200_000 + b"\xff\xd9"
+
+
+def fake_render(source, destination):
+    Path(destination).write_bytes(b"\xff\xd8\xff thumb")
+    return 4000, 3000
+
+
+class AttachmentTest(AuthenticatedAPITestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.settings_override = override_settings(ATTACHMENTS_DIR=self.directory)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+        self.customer = Customer.objects.create(first_name="Alex", last_name="Doe")
+        self.order = Order.objects.create(placed_by=self.customer, price=500, payed=0, status="completed")
+        self.authenticate()
+
+    def upload(self, content=JPEG, name="fabric.jpg", **data):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(reverse("dressapp:attachment-list"),
+                                    {"order": self.order.id, "file": SimpleUploadedFile(name, content), **data},
+                                    format="multipart")
+
+    def stored_files(self):
+        return sorted(path.name for path in Path(self.directory).rglob("*") if path.is_file())
+
+    def test_upload_is_streamed_to_disk_and_thumbnailed(self):
+        response = self.upload()
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        body = response.json()
+        attachment = Attachment.objects.get(pk=body["id"])
+        self.assertEqual((body["content_type"], body["size"]), ("image/jpeg", len(JPEG)))
+        self.assertEqual(body["sha256"], hashlib.sha256(JPEG).hexdigest())
+        self.assertEqual(attachments.full_path(attachment.path).read_bytes(), JPEG)
+        self.assertTrue(attachment.path.startswith("default/") and attachment.path.endswith(".jpg"))
+        self.assertIsNone(body["thumbnail"])
+
+        with mock.patch.object(thumbnails, "available", return_value=True), \
+                mock.patch.object(attachments, "render_thumbnail", side_effect=fake_render):
+            job = jobs.run_next()
+        self.assertEqual(job.result, {"status": "ready", "width": 4000, "height": 3000})
+
+        detail = self.client.get(reverse("dressapp:order-detail", args=[self.order.id])).json()
+        self.assertEqual(len(detail["attachments"]), 1)
+        self.assertEqual(set(detail["attachments"][0]), {"id", "order_item", "archived_order_item", "thumbnail"})
+        thumbnail_url = detail["attachments"][0]["thumbnail"]
+        listed = self.client.get(reverse("dressapp:order-list")).json()["results"][0]
+        self.assertNotIn("attachments", listed)
+
+        anonymous = APIClient()
+        response = anonymous.get(thumbnail_url, {"token": self.token})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Cache-Control"], "private, max-age=31536000, immutable")
+        self.assertEqual(anonymous.get(thumbnail_url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+        ranged = self.client.get(reverse("dressapp:attachment-file", args=[attachment.id]), HTTP_RANGE="bytes=0-3")
+        self.assertEqual(ranged.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(b"".join(ranged.streaming_content), JPEG[:4])
+
+    def test_without_pillow_thumbnails_are_unavailable(self):
+        self.upload()
+        with mock.patch.object(thumbnails, "available", return_value=False):
+            job = jobs.run_next()
+        self.assertEqual(job.result, {"status": "unavailable"})
+
+    def test_rejected_uploads_leave_no_files(self):
+        response = self.upload(content=b"%PDF-1.7 not a photo at all", name="photo.jpg")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        with override_settings(ATTACHMENT_MAX_MB=0):
+            self.assertEqual(self.upload().status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        other = Order.objects.create(placed_by=self.customer, price=1, payed=0)
+        item = OrderItem.objects.create(order=other, customer=self.customer, product=Product.objects.create(name="Coat"))
+        self.assertEqual(self.upload(order_item=item.id).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.stored_files(), [])
+        self.assertFalse(Attachment.objects.exists())
+
+    def test_files_follow_archiving_and_deletion(self):
+        attachment_id = self.upload().json()["id"]
+        Order.objects.filter(pk=self.order.pk).update(created_at=timezone.now() - timedelta(days=400))
+        call_command("archive_orders", "--older-than", "365", stdout=io.StringIO())
+        attachment = Attachment.objects.get(pk=attachment_id)
+        self.assertEqual((attachment.order_id, attachment.archived_order_id), (None, self.order.id))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ArchivedOrder.objects.get().delete()
+        self.assertFalse(Attachment.objects.exists())
+        self.assertEqual(self.stored_files(), [])
+
+
+class BackupTest(TransactionTestCase):  # the backup API can't run inside the test transaction
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        Customer.objects.create(first_name="Alex", last_name="Doe", phone="09123456789")
+
+    def test_backup_is_verified_and_rotated(self):
+        out = io.StringIO()
+        for _ in range(3):
+            call_command("backup", "--dest", self.directory, "--pages", "2", "--sleep", "0", "--keep", "2", stdout=out)
+        self.assertIn("integrity ok", out.getvalue())
+        self.assertIn("removed", out.getvalue())
+        backups = sorted(Path(self.directory).glob("default-*.sqlite3"))
+        self.assertEqual(len(backups), 2)
+
+        copy = sqlite3.connect(backups[-1])
+        self.addCleanup(copy.close)
+        self.assertEqual(copy.execute("SELECT phone FROM dressapp_customer").fetchall(), [("09123456789",)])
+
+    @override_settings(BACKUP_MAX_RESTARTS=2)
+    def test_busy_database_falls_back_to_vacuum_into(self):
+        name = connection.settings_dict["NAME"]
+        writer = sqlite3.connect(name, uri=name.startswith("file:"))
+        self.addCleanup(writer.close)
+        writer.execute("CREATE TABLE backup_probe (x)")
+        self.addCleanup(writer.execute, "DROP TABLE backup_probe")
+        for _ in range(50):
+            Customer.objects.create(first_name="Busy", last_name="Writer")
+
+        def write(done, total):  # every step sees a write from another connection: the copy restarts
+            writer.execute("INSERT INTO backup_probe VALUES (1)")
+            writer.commit()
+
+        result = backup_database(destination=self.directory, pages=1, sleep=0, progress=write)
+        self.assertEqual((result["method"], result["restarts"]), ("vacuum", 3))
+        copy = sqlite3.connect(result["path"])
+        self.addCleanup(copy.close)
+        self.assertEqual(copy.execute("SELECT COUNT(*) FROM dressapp_customer").fetchone(), (51,))
+
+    def test_scheduled_job_reschedules_itself(self):
+        call_command("backup", "--dest", self.directory, "--every", "24", "--keep", "1", stdout=io.StringIO())
+        job = Job.objects.get(task="backup")
+        jobs.run(job)
+        job.refresh_from_db()
+        self.assertEqual(job.status, "done", job.error)
+        self.assertGreater(job.result["backups"][0]["bytes"], 0)
+        self.assertEqual(job.progress["done"], job.progress["total"])
+        following = Job.objects.get(pk=job.result["next_job"])
+        self.assertEqual(following.payload["every_hours"], 24)
+        self.assertGreater(following.run_after, timezone.now() + timedelta(hours=23))
+
+
+class IdempotencyKeyTest(AuthenticatedAPITestCase):
+    def setUp(self):
+        self.authenticate()
+        self.url = reverse("dressapp:customer-list")
+
+    def post(self, data, key, url=None):
+        return self.client.post(url or self.url, data, format="json", HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_repeat_is_replayed_not_rerun(self):
+        first = self.post({"first_name": "Mina", "last_name": "Rad"}, "k-1")
+        second = self.post({"first_name": "Mina", "last_name": "Rad"}, "k-1")
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual((second.status_code, second.json()), (status.HTTP_201_CREATED, first.json()))
+        self.assertEqual(second["Idempotent-Replayed"], "true")
+        self.assertEqual(Customer.objects.filter(last_name="Rad").count(), 1)
+
+        other = self.post({"first_name": "Mina", "last_name": "Rad"}, "k-2")  # new key, new write
+        self.assertEqual(other.status_code, status.HTTP_201_CREATED)
+        self.assertFalse(other.has_header("Idempotent-Replayed"))
+
+    def test_key_reused_for_different_request(self):
+        self.post({"first_name": "Mina", "last_name": "Rad"}, "k-1")
+        response = self.post({"first_name": "Other", "last_name": "Person"}, "k-1")
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+    def test_failed_request_releases_the_key(self):
+        self.assertEqual(self.post({"first_name": "", "last_name": "Rad"}, "k-1").status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.post({"first_name": "Mina", "last_name": "Rad"}, "k-1").status_code, status.HTTP_201_CREATED)
+
+    def test_in_flight_duplicate_conflicts_at_once(self):
+        data = {"first_name": "Mina", "last_name": "Rad"}
+        IdempotencyRecord.objects.create(
+            user_id=self.user.pk, key="k-1", fingerprint=self.fingerprint("POST", self.url, data),
+            expires_at=timezone.now() + timedelta(hours=1),
+        )
+        response = self.post(data, "k-1")
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response["Retry-After"], "1")
+        self.assertFalse(Customer.objects.filter(last_name="Rad").exists())
+
+    def test_batch_runs_once(self):
+        customer = Customer.objects.create(first_name="Alex", last_name="Doe")
+        product = Product.objects.create(name="Dress")
+        body = {"operations": [
+            {"method": "POST", "resource": "orders", "ref": "o", "body": {"placed_by": customer.id, "price": 100, "payed": 0}},
+            {"method": "POST", "resource": "order-items", "body": {"order": {"$ref": "o"}, "customer": customer.id, "product": product.id}},
+        ]}
+        url = reverse("dressapp:batch")
+        first, second = self.post(body, "b-1", url), self.post(body, "b-1", url)
+        self.assertTrue(first.json()["committed"])
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual((Order.objects.count(), OrderItem.objects.count()), (1, 1))
+
+    def test_expired_records_are_purged(self):
+        for key in ("old", "k-1"):
+            IdempotencyRecord.objects.create(user_id=self.user.pk, key=key, fingerprint="x", status="done",
+                                             expires_at=timezone.now() - timedelta(minutes=1))
+        response = self.post({"first_name": "Mina", "last_name": "Rad"}, "k-1")  # an expired key is free again
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(IdempotencyRecord.objects.filter(key="old").exists())  # not on the request path
+
+        job = jobs.ensure_queued("housekeeping")
+        jobs.run(job)
+        job.refresh_from_db()
+        self.assertEqual(job.result["idempotency_records"], 1)
+        self.assertEqual(list(IdempotencyRecord.objects.values_list("key", flat=True)), ["k-1"])
+
+    @staticmethod
+    def fingerprint(method, path, data):
+        body = json.dumps(data, sort_keys=True)
+        return hashlib.sha256(f"{method} {path}\n{body}".encode()).hexdigest()
+
+
+# -------------- Tenancy -----------------#
+
+
+
+# Registered at import so the test runner creates (in-memory) test databases for them
+for _slug in ("north", "south"):
+    tenancy.register(_slug)
+
+
+class TenancyTest(APITestCase):
+    databases = {"default", "tenant_north", "tenant_south"}
+
+    @classmethod
+    def setUpClass(cls):
+        tenant_dir = tempfile.mkdtemp()
+        cls.addClassCleanup(shutil.rmtree, tenant_dir)
+        cls.enterClassContext(override_settings(TENANT_DB_DIR=tenant_dir))
+        super().setUpClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = User.objects.create_user(username="alice", password="Pass-word-123")
+        cls.bob = User.objects.create_user(username="bob", password="Pass-word-123")
+        cls.owner = User.objects.create_user(username="owner", password="Pass-word-123")
+        for slug, users in [("north", ["alice", "owner"]), ("south", ["bob", "owner"])]:
+            call_command("create_tenant", slug, *[f"--user={name}" for name in users], stdout=io.StringIO())
+
+    def login(self, username, **extra):
+        return self.client.post("/api/token/", {"username": username, "password": "Pass-word-123", **extra}, format="json")
+
+    def use_token(self, response):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+
+    def test_token_carries_the_tenant(self):
+        response = self.login("alice")
+        self.assertEqual(response.data["tenant"], "north")
+        self.assertEqual(AccessToken(response.data["access"])["tenant"], "north")
+        refreshed = self.client.post("/api/token/refresh/", {"refresh": response.data["refresh"]}, format="json")
+        self.assertEqual(AccessToken(refreshed.data["access"])["tenant"], "north")
+
+        self.assertEqual(self.login("owner").status_code, status.HTTP_400_BAD_REQUEST)  # two workshops: must choose
+        self.assertEqual(self.login("owner", tenant="south").data["tenant"], "south")
+        self.assertEqual(self.login("alice", tenant="south").status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_data_lives_in_the_tenant_database(self):
+        self.use_token(self.login("alice"))
+        response = self.client.post(reverse("dressapp:customer-list"), {"first_name": "Nora", "last_name": "North"})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+
+        self.assertTrue(Customer.objects.using("tenant_north").filter(last_name="North").exists())
+        self.assertFalse(Customer.objects.using("tenant_south").filter(last_name="North").exists())
+        self.assertFalse(Customer.objects.filter(last_name="North").exists())  # default database
+        self.assertIsNone(tenancy.current_tenant())  # cleared after the request
+
+        self.use_token(self.login("bob"))
+        names = [c["last_name"] for c in self.client.get(reverse("dressapp:customer-list")).data["results"]]
+        self.assertNotIn("North", names)
+
+    def test_removed_member_is_rejected(self):
+        self.use_token(self.login("alice"))
+        TenantMembership.objects.filter(user=self.alice).delete()
+        response = self.client.get(reverse("dressapp:customer-list"))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_jobs_run_in_their_tenant(self):
+        with tenancy.use_tenant("south"):
+            customer = Customer.objects.create(first_name="Sam", last_name="South")
+            product = Product.objects.create(name="Coat")
+            order = Order.objects.create(placed_by=customer, price=100, payed=0)
+            OrderItem.objects.create(order=order, customer=customer, product=product)
+            job = jobs.enqueue("rebuild_property_index")
+        self.assertEqual(job.payload["tenant"], "south")
+        self.assertEqual(Job.objects.filter(pk=job.pk).count(), 1)  # the queue stays in default
+
+        jobs.run(job)
+        job.refresh_from_db()
+        self.assertEqual(job.result["items"], OrderItem.objects.using("tenant_south").count())
+
+    def test_jobs_are_listed_per_workshop(self):
+        with tenancy.use_tenant("south"):
+            south_job = jobs.enqueue("rebuild_property_index")
+        own_job = jobs.enqueue("rebuild_property_index")
+        User.objects.create_user(username="solo", password="Pass-word-123")
+        self.use_token(self.login("solo"))
+        listed = [job["id"] for job in self.client.get(reverse("dressapp:job-list")).data["results"]]
+        self.assertEqual(listed, [own_job.id])
+        self.use_token(self.login("bob"))
+        listed = [job["id"] for job in self.client.get(reverse("dressapp:job-list")).data["results"]]
+        self.assertEqual(listed, [south_job.id])
+
+    @override_settings(TENANT_CONNECTION_CACHE=1)
+    def test_least_recently_used_connection_is_closed(self):
+        with mock.patch.object(connections["tenant_north"], "close") as close_north:
+            with tenancy.use_tenant("north"):
+                Customer.objects.exists()
+            close_north.assert_not_called()  # kept open for the next request
+            with tenancy.use_tenant("south"):
+                Customer.objects.exists()
+            close_north.assert_called_once()
+
+
+class TenantMaintenanceTest(TransactionTestCase):  # backups can't run inside the test transaction
+    databases = {"default", "tenant_north"}
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        Tenant.objects.create(slug="north", name="North")
+        with tenancy.use_tenant("north"):
+            self.customer = Customer.objects.create(first_name="Nora", last_name="North")
+
+    def backups(self, alias):
+        return sorted(Path(self.directory).glob(f"{alias}-*.sqlite3"))
+
+    def test_backup_a_tenant_database(self):
+        call_command("backup", "--tenant", "north", "--dest", self.directory, "--sleep", "0", stdout=io.StringIO())
+        [backup] = self.backups("tenant_north")
+        copy = sqlite3.connect(backup)
+        self.addCleanup(copy.close)
+        self.assertEqual(copy.execute("SELECT last_name FROM dressapp_customer").fetchall(), [("North",)])
+
+        with self.assertRaises(CommandError):
+            call_command("backup", "--tenant", "nowhere", "--dest", self.directory, stdout=io.StringIO())
+
+    def test_scheduled_backup_covers_all_tenants(self):
+        call_command("backup", "--all-tenants", "--every", "24", "--dest", self.directory, "--sleep", "0",
+                     stdout=io.StringIO())
+        job = Job.objects.get(task="backup")
+        jobs.run(job)
+        job.refresh_from_db()
+        self.assertEqual(job.status, "done", job.error)
+        self.assertEqual(len(job.result["backups"]), 2)
+        self.assertEqual(len(self.backups("default")), 1)
+        self.assertEqual(len(self.backups("tenant_north")), 1)
+
+    def test_archive_orders_in_a_tenant(self):
+        with tenancy.use_tenant("north"):
+            order = Order.objects.create(placed_by=self.customer, price=100, payed=100, status="completed")
+            Order.objects.filter(pk=order.pk).update(created_at=timezone.now() - timedelta(days=400))
+        call_command("archive_orders", "--older-than", "365", "--tenant", "north", stdout=io.StringIO())
+        self.assertEqual(ArchivedOrder.objects.using("tenant_north").count(), 1)
+        self.assertFalse(Order.objects.using("tenant_north").exists())
+
+
+# -------------- Audit log -----------------#
+
+
+
+class AuditLogTest(AuthenticatedAPITestCase):
+    def test_api_changes_are_audited_with_user(self):
+        self.authenticate()
+        response = self.client.post(reverse("dressapp:customer-list"),
+                                    {"first_name": "Alex", "last_name": "Doe"}, format="json")
+        customer_id = response.json()["id"]
+        url = reverse("dressapp:customer-detail", args=[customer_id])
+        self.client.patch(url, {"phone": "09123456789"}, format="json")
+        self.client.patch(url, {"phone": "09123456789"}, format="json")  # no change, no entry
+        self.client.delete(url)
+
+        response = self.client.get(reverse("dressapp:auditentry-list"), {"model": "customer", "object_id": customer_id})
+        entries = response.json()["results"]
+        self.assertEqual([entry["action"] for entry in entries], ["deleted", "updated", "created"])
+        self.assertEqual(entries[1]["changes"], {"phone": {"old": None, "new": "09123456789"}})
+        self.assertEqual(entries[2]["changes"]["first_name"], "Alex")
+        self.assertNotIn("created_at", entries[2]["changes"])
+        self.assertEqual({entry["username"] for entry in entries}, {self.username})
+
+    def test_bulk_update_and_lookup_index(self):
+        customer = Customer.objects.create(first_name="Sara", last_name="Smith")
+        order = Order.objects.create(placed_by=customer, price=100, payed=0)
+        self.authenticate()
+        self.client.post(reverse("dressapp:order-bulk-status"), {"status": "completed", "ids": [order.id]}, format="json")
+        entry = AuditEntry.objects.filter(model="order", object_id=order.id).order_by("-created_at").first()
+        self.assertEqual(entry.changes, {"status": {"new": "completed"}})
+
+        plan = AuditEntry.objects.filter(model="order", object_id=order.id).order_by("-created_at").explain()
+        self.assertIn("audit_object_idx", plan)
+
+    @override_settings(AUDIT_WRITE_BEHIND=True)
+    def test_write_behind_queues_after_commit(self):
+        customer = Customer.objects.create(first_name="Sara", last_name="Smith")
+        audit.entries.flush()
+        with mock.patch.object(audit.entries, "ensure_flusher"):
+            with self.captureOnCommitCallbacks(execute=True):
+                Order.objects.create(placed_by=customer, price=100, payed=20)
+            try:
+                with transaction.atomic():
+                    Order.objects.create(placed_by=customer, price=50, payed=0)
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+        self.assertFalse(AuditEntry.objects.filter(model="order").exists())
+        self.assertEqual(audit.entries.flush(), 1)
+        self.assertEqual(AuditEntry.objects.get(model="order").changes["payed"], 20)
+
+    def test_only_saves_read_the_stored_values(self):
+        customer = Customer.objects.create(first_name="Sara", last_name="Smith")
+        Customer.objects.filter(pk=customer.pk).update(phone="09123456789")  # behind the instance's back
+        with self.assertNumQueries(1):
+            loaded = list(Customer.objects.all())
+        self.assertFalse(any(hasattr(row, "_audit_before") for row in loaded))
+
+        customer.last_name = "Jones"
+        customer.save(update_fields=["last_name"])
+        entry = AuditEntry.objects.filter(model="customer", action="updated").latest("created_at")
+        self.assertEqual(entry.changes, {"last_name": {"old": "Smith", "new": "Jones"}})
+
+
+# -------------- Serving -----------------#
+
+
+
+class ServeCommandTests(TestCase):
+    def test_memory_and_uptime_readers(self):
+        if not os.path.exists("/proc/self/status"):
+            self.skipTest("needs /proc")
+        rss, pss = memory_kb(os.getpid())
+        self.assertGreater(rss, 0)
+        self.assertGreater(process_uptime(), 0)
+        self.assertEqual(memory_kb(2 ** 22 + 1), (None, None))
+
+    def test_rejects_bad_address(self):
+        with self.assertRaises(CommandError):
+            call_command("serve", "localhost")
+
+    def test_workers_leave_optional_modules_unloaded(self):
+        script = (
+            "import django, sys; django.setup()\n"
+            "from django.core.wsgi import get_wsgi_application; from django.urls import get_resolver\n"
+            "get_wsgi_application(); get_resolver().url_patterns\n"
+            "print(sorted(m for m in ('PIL', 'cProfile', 'pstats', 'concurrent.futures.process') if m in sys.modules))"
+        )
+        env = {**os.environ, "DJANGO_SETTINGS_MODULE": "dressmake.settings", "API_ONLY": "1"}
+        result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, env=env, check=True)
+        self.assertEqual(result.stdout.strip(), "[]")
+
+
+# -------------- Load test -----------------#
+
+
+
+class LoadTestCommandTests(LiveServerTestCase):
+    def setUp(self):
+        get_user_model().objects.create_user(username="loadtester", password="Pass-word-123")
+        customer = Customer.objects.create(first_name="Ann", last_name="Lee")
+        Product.objects.create(name="Dress")
+        Order.objects.create(placed_by=customer, price=100, payed=0)
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([7], 90), 7)
+        self.assertIsNone(percentile([], 50))
+
+    def test_runs_mix_against_live_server(self):
+        out = io.StringIO()
+        call_command("loadtest", "--url", self.live_server_url, "--username", "loadtester",
+                     "--password", "Pass-word-123", "--concurrency", "1,2", "--duration", "0.5",
+                     "--json", stdout=out)
+        stages = json.loads(out.getvalue())
+        self.assertEqual([stage["concurrency"] for stage in stages], [1, 2])
+        for stage in stages:
+            self.assertGreater(stage["requests"], 0)
+            self.assertEqual(stage["error_rate"], 0, stage["errors"])
+
+        call_command("loadtest", "--url", self.live_server_url, "--username", "loadtester",
+                     "--password", "Pass-word-123", "--concurrency", "1", "--duration", "0.3",
+                     "--mix", "create=1", stdout=io.StringIO())
+        self.assertTrue(Order.objects.filter(order__note="loadtest").exists())
+
+    def test_bad_login_and_mix(self):
+        with self.assertRaises(CommandError):
+            call_command("loadtest", "--url", self.live_server_url, "--username", "loadtester",
+                         "--password", "wrong", "--duration", "0.1")
+        with self.assertRaises(CommandError):
+            call_command("loadtest", "--username", "x", "--password", "y", "--mix", "dance=1")
@@ -0,0 +1,30 @@
+"""
+Thumbnail rendering, run in worker processes (see ``dressapp.attachments``).
+
+Kept free of Django imports so pool processes start quickly. Pillow
+(optional: pip install Pillow to get thumbnails) is only imported in the
+pool processes, so web workers don't carry it.
+"""
+import importlib.util
+import os
+
+
+def available():
+    return importlib.util.find_spec("PIL") is not None
+
+
+def make_thumbnail(source, destination, size, quality=80):
+    """Write a JPEG of at most ``size`` x ``size`` pixels; returns the original's (width, height)."""
+    from PIL import Image, ImageOps
+
+    with Image.open(source) as image:
+        original = image.size
+        image.draft("RGB", (size * 2, size * 2))  # JPEG: decode at a reduced scale, much cheaper on a Pi
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((size, size))
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        partial = f"{destination}.partial"
+        image.save(partial, "JPEG", quality=quality, optimize=True)
+    os.replace(partial, destination)
+    return original
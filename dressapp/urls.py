@@ -12,10 +12,18 @@ router.register(r'properties', ProductPropertyViewSet)
 router.register(r'customer-properties', CustomerProductPropertyViewSet)
 router.register(r'orders', OrderViewSet)
 router.register(r'order-items', OrderItemViewSet)
+router.register(r'attachments', AttachmentViewSet)
+router.register(r'jobs', JobViewSet)
+router.register(r'audit', AuditEntryViewSet)
+router.register(r'profiles', ProfileViewSet, basename='profile')
 
 urlpatterns = [
     path('api/', include(router.urls)),
     path('api/', api_root, name="api-root"),   # custom root
+    path("api/batch/", BatchView.as_view(), name="batch"),
+    path("api/bootstrap/", BootstrapView.as_view(), name="bootstrap"),
+    path("api/calendar/", CalendarView.as_view(), name="calendar"),
+    path("api/events/", events, name="events"),
     path("api/token/", TokenObtainPairView.as_view(), name="token_obtain_pair"),
     path("api/token/refresh/", TokenRefreshView.as_view(), name="token_refresh"),
 ]
@@ -1,13 +1,205 @@
+import asyncio
+import copy
+import hashlib
+import json
+import time
+from pathlib import Path
+
 from rest_framework import viewsets,filters
-from rest_framework.permissions import IsAuthenticated
+from rest_framework import status as http_status
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework.decorators import api_view
+from rest_framework.request import Request
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
+from rest_framework.decorators import api_view, action
+from rest_framework.exceptions import APIException, AuthenticationFailed, NotFound, ValidationError as APIValidationError
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured, ValidationError as DjangoValidationError
+from django.db.models import Count, Max, Min, Sum
+from django.db.models.expressions import RawSQL
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.shortcuts import get_object_or_404
+from django.http import FileResponse, Http404, JsonResponse, StreamingHttpResponse
+from django.utils.dateparse import parse_date
+from django.utils.cache import get_conditional_response
+from django.utils.http import content_disposition_header
+from django.views.decorators.http import require_safe
+from django.utils.datastructures import MultiValueDict
+from django.db import IntegrityError, router, transaction
 from django.urls import reverse
 from django_filters.rest_framework import DjangoFilterBackend
+from rest_framework_simplejwt.exceptions import TokenError
 from rest_framework.response import Response
+from dressapp import jobs, profiling, representations, tenancy
+from dressapp.archiving import with_archive
+from dressapp.attachments import FIELD_NAME, AttachmentUploadHandler, full_path
+from dressapp.authentication import QueryParamJWTAuthentication
+from dressapp.deletion import ChunkedDestroyMixin
+from dressapp.fileserving import serve_file
+from dressapp.idempotency import IdempotentMixin, idempotent
 from dressapp.models import *
 from dressapp.serializers import *
+from dressapp.signals import rows_updated
+
+
+class ShapedQuerysetMixin:
+    """
+    ``?fields=id,first_name`` and ``?expand=placed_by,items`` for read requests.
+
+    The requested shape is handed to the serializer (see ``ShapedSerializerMixin``)
+    and also drives the query: only the needed columns are loaded, expanded
+    foreign keys are joined with ``select_related`` and expanded reverse
+    relations are fetched with ``prefetch_related``.
+    """
+
+    def get_shape(self):
+        if self.request is None or self.request.method not in ("GET", "HEAD"):
+            return None, []
+        params = self.request.query_params
+        fields = [name for name in params.get("fields", "").split(",") if name.strip()] or None
+        expand = [name for name in params.get("expand", "").split(",") if name.strip()]
+        return fields, expand
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context["fields"], context["expand"] = self.get_shape()
+        return context
+
+    def filter_queryset(self, queryset):
+        return self.shape_queryset(super().filter_queryset(queryset))
+
+    def shape_queryset(self, queryset):
+        fields, expand = self.get_shape()
+        serializer = self.get_serializer()
+        model = queryset.model
+        only, select, prefetch = {model._meta.pk.name}, set(), set()
+
+        for name, field in serializer.fields.items():
+            source = field.source.split(".")
+            try:
+                model_field = model._meta.get_field(source[0])
+            except FieldDoesNotExist:
+                continue
+            if name in expand:
+                nested = getattr(field, "child", field)
+                related = prefetch if model_field.one_to_many or model_field.many_to_many else select
+                related.add(source[0])
+                related.update(f"{source[0]}__{path}" for path in self.related_paths(nested))
+            elif len(source) > 1 and model_field.is_relation:
+                select.add(source[0])  # e.g. property_name -> property.name
+            if model_field.concrete:
+                only.add(source[0])
+
+        if select:
+            queryset = queryset.select_related(*sorted(select))
+        if prefetch:
+            queryset = queryset.prefetch_related(*sorted(prefetch))
+        if fields:
+            queryset = queryset.only(*sorted(only))
+        return queryset
+
+    @staticmethod
+    def related_paths(serializer):
+        """Relations a (nested) serializer reads through dotted sources."""
+        return {field.source.split(".")[0] for field in serializer.fields.values() if "." in field.source}
+
+
+class CachedReadMixin:
+    """
+    List and retrieve from cached representations (see ``dressapp.representations``).
+
+    Only ``(pk, updated_at)`` of the requested rows is read first; the full
+    rows are loaded, in one query, for those whose representation isn't cached
+    at that version. Requests with ``?expand=`` are served as usual.
+    """
+
+    def use_representation_cache(self):
+        return representations.cache.enabled and not self.get_shape()[1]
+
+    def versions(self, queryset, version_field):
+        return queryset.only(queryset.model._meta.pk.name, version_field)
+
+    def render_rows(self, rows, queryset, serializer):
+        """Representations of ``rows`` (pk and version loaded), in order; rows deleted meanwhile are left out."""
+        rendered, missing = {}, {}
+        for row in rows:
+            version = getattr(row, serializer.version_field)
+            data = serializer.cached(row, version)
+            if data is None:
+                missing[row.pk] = version
+            else:
+                rendered[row.pk] = data
+        if missing:
+            for instance in queryset.filter(pk__in=missing).order_by():
+                rendered[instance.pk] = serializer.render(instance, missing[instance.pk])
+        return [rendered[row.pk] for row in rows if row.pk in rendered]
+
+    def list(self, request, *args, **kwargs):
+        if not self.use_representation_cache():
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        serializer = self.get_serializer(many=True).child
+        rows = self.versions(queryset, serializer.version_field)
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(self.render_rows(page, queryset, serializer))
+        return Response(self.render_rows(list(rows), queryset, serializer))
+
+    def retrieve(self, request, *args, **kwargs):
+        if not self.use_representation_cache():
+            return super().retrieve(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        serializer = self.get_serializer()
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        row = get_object_or_404(self.versions(queryset, serializer.version_field),
+                                **{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        self.check_object_permissions(request, row)
+        rendered = self.render_rows([row], queryset, serializer)
+        if not rendered:
+            raise Http404
+        return Response(rendered[0])
+
+
+class ArchiveQuerysetMixin:
+    """
+    Lists read only the hot tables; ``?include_archived=1`` unions the archive
+    in (see ``dressapp.archiving``) and lets GET on a detail URL find archived rows.
+    Archived rows are read-only. Subclasses name the archive table in
+    ``archive_model``; it is read with the view's ordering and ``filter_params``.
+    """
+    archive_model = None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if cls.archive_model is None:
+            raise ImproperlyConfigured(f"{cls.__name__} must set archive_model")
+
+    def include_archived(self):
+        return self.request.query_params.get("include_archived", "").lower() in ("1", "true", "yes")
+
+    def get_archived_queryset(self):
+        queryset = self.archive_model.objects.all().order_by(*self.queryset.query.order_by)
+        return self.filter_params(queryset)
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.action != "list" or not self.include_archived():
+            return queryset
+        return with_archive(queryset, super().filter_queryset(self.get_archived_queryset()))
+
+    def get_object(self):
+        try:
+            return super().get_object()
+        except Http404:
+            if self.request.method not in ("GET", "HEAD") or not self.include_archived():
+                raise
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        obj = get_object_or_404(self.get_archived_queryset(), **{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        self.check_object_permissions(self.request, obj)
+        return obj
 
 
 class ProtectedView(APIView):
@@ -17,7 +209,7 @@ class ProtectedView(APIView):
         return Response({"message": f"Hello, {request.user.username}!"})
 
 
-class CustomerViewSet(viewsets.ModelViewSet):
+class CustomerViewSet(IdempotentMixin, ChunkedDestroyMixin, CachedReadMixin, ShapedQuerysetMixin, viewsets.ModelViewSet):
     queryset = Customer.objects.all().order_by("-created_at")
     serializer_class = CustomerSerializer
     
@@ -28,7 +220,7 @@ class CustomerViewSet(viewsets.ModelViewSet):
     search_fields = ["first_name","last_name","phone"] # partial matching
     permission_classes = [IsAuthenticated]
 
-class ProductViewSet(viewsets.ModelViewSet):
+class ProductViewSet(IdempotentMixin, ChunkedDestroyMixin, CachedReadMixin, ShapedQuerysetMixin, viewsets.ModelViewSet):
     queryset = Product.objects.all().order_by("-created_at")
     serializer_class = ProductSerializer
     filter_backends = [DjangoFilterBackend,filters.OrderingFilter,filters.SearchFilter]
@@ -38,7 +230,7 @@ class ProductViewSet(viewsets.ModelViewSet):
     
 
 
-class ProductPropertyViewSet(viewsets.ModelViewSet):
+class ProductPropertyViewSet(IdempotentMixin, ShapedQuerysetMixin, viewsets.ModelViewSet):
     queryset = ProductProperty.objects.all().order_by("id")
     serializer_class = ProductPropertySerializer
     filter_backends = [DjangoFilterBackend,filters.SearchFilter,filters.OrderingFilter]
@@ -46,7 +238,7 @@ class ProductPropertyViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
 
 
-class CustomerProductPropertyViewSet(viewsets.ModelViewSet):
+class CustomerProductPropertyViewSet(IdempotentMixin, ShapedQuerysetMixin, viewsets.ModelViewSet):
     queryset = CustomerProductProperty.objects.all().order_by('id')
     serializer_class = CustomerProductPropertySerializer
     filter_backends = [DjangoFilterBackend,filters.SearchFilter,filters.OrderingFilter]
@@ -69,15 +261,24 @@ class CustomerProductPropertyViewSet(viewsets.ModelViewSet):
         return queryset
 
 
-class OrderViewSet(viewsets.ModelViewSet):
+class OrderViewSet(IdempotentMixin, ArchiveQuerysetMixin, ShapedQuerysetMixin, viewsets.ModelViewSet):
     queryset = Order.objects.all().order_by("-created_at")
+    archive_model = ArchivedOrder
     serializer_class = OrderSerializer
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['placed_by__first_name', 'placed_by__last_name']  # remove 'order'
     filterset_fields = ['status']  # you can filter by status
 
     def get_queryset(self):
-        queryset = Order.objects.all().order_by("-created_at")
+        return self.filter_params(Order.objects.all().order_by("-created_at"))
+
+    def get_shape(self):
+        fields, expand = super().get_shape()
+        if self.action == "retrieve" and "attachments" not in expand:
+            expand = [*expand, "attachments"]  # order details always carry the thumbnail URLs
+        return fields, expand
+
+    def filter_params(self, queryset):
         placed_by_id = self.request.query_params.get("placed_by")
         status = self.request.query_params.get("status")
 
@@ -92,14 +293,67 @@ class OrderViewSet(viewsets.ModelViewSet):
         kwargs['partial'] = True
         return super().update(request, *args, **kwargs)
 
-class OrderItemViewSet(viewsets.ModelViewSet):
+    @action(detail=False, methods=["post"], url_path="bulk-status")
+    def bulk_status(self, request):
+        """
+        Move many orders to one status with a single UPDATE.
+
+        Body: {"status": "completed", "ids": [1, 2, 3]}
+           or {"status": "completed", "filter": {"status": "in_progress", "placed_by": 4}}
+        Returns a result per order id: updated / unchanged / not_found.
+        """
+        serializer = OrderBulkStatusSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        new_status = serializer.validated_data["status"]
+        ids = serializer.validated_data.get("ids")
+
+        queryset = Order.objects.all()
+        if ids is not None:
+            queryset = queryset.filter(pk__in=ids)
+        else:
+            queryset = queryset.filter(**serializer.validated_data["filter"])
+
+        using = router.db_for_write(Order)
+        with transaction.atomic(using=using):
+            current = {row["id"]: row for row in queryset.select_for_update().values("id", "status", "placed_by_id")}
+            changed = [pk for pk, row in current.items() if row["status"] != new_status]
+            if changed:
+                Order.objects.filter(pk__in=changed).update(status=new_status)
+                rows_updated.send(sender=Order, pks=changed, changes={"status": new_status}, using=using,
+                                  rows={pk: {**current[pk], "status": new_status} for pk in changed})
+
+        changed = set(changed)
+        results = [
+            {"id": pk, "result": "updated" if pk in changed else "unchanged"}
+            for pk in sorted(current)
+        ]
+        if ids is not None:
+            results += [{"id": pk, "result": "not_found"} for pk in dict.fromkeys(ids) if pk not in current]
+
+        return Response(
+            {"status": new_status, "updated": len(changed), "results": results},
+            status=http_status.HTTP_200_OK,
+        )
+
+class OrderItemViewSet(IdempotentMixin, ArchiveQuerysetMixin, ShapedQuerysetMixin, viewsets.ModelViewSet):
     queryset = OrderItem.objects.all().order_by("id")
+    archive_model = ArchivedOrderItem
     serializer_class = OrderItemSerializer
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['customer__first_name', 'customer__last_name', 'product__name']  # correct fields
 
     def get_queryset(self):
-        queryset = OrderItem.objects.all().order_by("id")
+        queryset = self.filter_params(OrderItem.objects.all().order_by("id"))
+        for prop_id, value in self.get_property_filters():
+            queryset = queryset.filter(property_values__property_id=prop_id, property_values__value=value)
+        return queryset
+
+    def get_archived_queryset(self):
+        if self.request.query_params.getlist("prop"):
+            return ArchivedOrderItem.objects.none()  # the property index only covers hot items
+        return super().get_archived_queryset()
+
+    def filter_params(self, queryset):
         order_id = self.request.query_params.get("order")
         customer_id = self.request.query_params.get("customer")
 
@@ -109,7 +363,544 @@ class OrderItemViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(customer_id=customer_id)
         return queryset
 
+    def get_property_filters(self):
+        """``?prop=<property id>:<value>`` (repeatable), normalized like the index."""
+        parsed = []
+        for raw in self.request.query_params.getlist("prop"):
+            prop_id, sep, value = raw.partition(":")
+            if not sep or not prop_id.isdigit():
+                raise APIValidationError({"prop": f"Expected <property id>:<value>, got '{raw}'."})
+            parsed.append((int(prop_id), value))
+        if not parsed:
+            return []
+
+        value_types = dict(ProductProperty.objects.filter(pk__in=[p for p, _ in parsed]).values_list("pk", "value_type"))
+        return [
+            (prop_id, OrderItemPropertyValue.normalize_query(value_types.get(prop_id), value))
+            for prop_id, value in parsed
+        ]
+
+    @action(detail=False, methods=["get"], url_path="property-report")
+    def property_report(self, request):
+        """
+        How often each value of one property was ordered.
+
+        ?property=<id>[&from=YYYY-MM-DD][&to=YYYY-MM-DD] -> [{"value", "items", "quantity"}]
+        """
+        prop_id = request.query_params.get("property", "")
+        if not prop_id.isdigit():
+            raise APIValidationError({"property": "A numeric property id is required."})
+
+        values = OrderItemPropertyValue.objects.filter(property_id=prop_id)
+        date_from, date_to = request.query_params.get("from"), request.query_params.get("to")
+        try:
+            if date_from:
+                values = values.filter(order_item__order__created_at__date__gte=date_from)
+            if date_to:
+                values = values.filter(order_item__order__created_at__date__lte=date_to)
+            report = list(
+                values.values("value")
+                .annotate(items=Count("id"), quantity=Sum("order_item__quantity"))
+                .order_by("-items", "value")
+            )
+        except DjangoValidationError:
+            raise APIValidationError({"date": "Dates must be YYYY-MM-DD."})
+        return Response({"property": int(prop_id), "values": report})
+
+    @action(detail=False, methods=["post"], url_path="rebuild-property-index", permission_classes=[IsAdminUser])
+    def rebuild_property_index(self, request):
+        """Re-derive the property value index in the background."""
+        return jobs.accepted(request, jobs.enqueue("rebuild_property_index", priority=-1))
+
+
+class PayloadTooLarge(APIException):
+    status_code = http_status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = "Upload is too large."
+    default_code = "too_large"
+
+
+PRIVATE_IMMUTABLE = "private, max-age=31536000, immutable"  # files never change under an attachment id
+
+
+class AttachmentViewSet(IdempotentMixin, ShapedQuerysetMixin, viewsets.ModelViewSet):
+    """
+    Fabric and design photos on orders.
+
+    POST is multipart with a ``file`` field plus ``order`` (and optionally
+    ``order_item``); the file is streamed to disk by ``AttachmentUploadHandler``
+    and its thumbnail is rendered by the ``attachment_thumbnail`` job.
+    ``file/`` and ``thumbnail/`` serve the images (with Range support) and
+    accept ``?token=`` so they can be used in ``<img src>``.
+    """
+    queryset = Attachment.objects.all().order_by("id")
+    serializer_class = AttachmentSerializer
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ["order", "order_item", "archived_order"]
+    permission_classes = [IsAuthenticated]
+    http_method_names = ["get", "post", "delete", "head", "options"]
+    upload_handler = None  # only set for a streamed multipart POST (not inside api/batch/)
+
+    def initialize_request(self, request, *args, **kwargs):
+        if request.method == "POST":  # must be in place before anything reads the body
+            self.upload_handler = AttachmentUploadHandler(request)
+            request.upload_handlers = [self.upload_handler]
+        return super().initialize_request(request, *args, **kwargs)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        if self.upload_handler is not None:
+            self.upload_handler.discard()  # files not claimed by a new row (errors, replays)
+        return super().finalize_response(request, response, *args, **kwargs)
+
+    def perform_create(self, serializer):
+        if self.upload_handler is None:
+            raise APIValidationError({FIELD_NAME: ["Attachments are uploaded as multipart to attachments/."]})
+        upload = self.request.FILES.get(FIELD_NAME)
+        if self.upload_handler.error == "too_large":
+            raise PayloadTooLarge(f"Attachments can be at most {settings.ATTACHMENT_MAX_MB} MB.")
+        if self.upload_handler.error or upload is None:
+            raise APIValidationError({FIELD_NAME: ["Upload a JPEG, PNG, WebP, HEIC or GIF image."]})
+        attachment = serializer.save(
+            path=upload.relative_path, original_name=(upload.name or "")[:255], content_type=upload.content_type,
+            size=upload.size, sha256=upload.sha256,
+        )
+        self.upload_handler.stored.remove(upload.relative_path)  # the row owns the file now
+        transaction.on_commit(lambda: jobs.enqueue("attachment_thumbnail", {"attachment": attachment.pk}),
+                              using=router.db_for_write(Attachment))
+
+    @action(detail=True, methods=["get"], authentication_classes=[QueryParamJWTAuthentication])
+    def file(self, request, pk=None):
+        """The original upload."""
+        attachment = self.get_object()
+        response = serve_file(request._request, full_path(attachment.path), cache_control=PRIVATE_IMMUTABLE,
+                              content_type=attachment.content_type, precompressed=False)
+        response["Content-Disposition"] = content_disposition_header(False, attachment.original_name or "attachment")
+        return response
+
+    @action(detail=True, methods=["get"], authentication_classes=[QueryParamJWTAuthentication])
+    def thumbnail(self, request, pk=None):
+        attachment = self.get_object()
+        if attachment.thumbnail_status != "ready":
+            raise NotFound("No thumbnail yet.")
+        return serve_file(request._request, full_path(attachment.thumbnail_path), cache_control=PRIVATE_IMMUTABLE,
+                          content_type="image/jpeg", precompressed=False)
+
+
+class JobViewSet(ShapedQuerysetMixin, viewsets.ReadOnlyModelViewSet):
+    """Status of background jobs; views enqueue work and answer 202 with a link here."""
+    queryset = Job.objects.all().order_by("-created_at")
+    serializer_class = JobSerializer
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
+    filterset_fields = ["status", "task"]
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        tenant = tenancy.current_tenant()
+        if tenant:
+            return queryset.filter(payload__tenant=tenant)  # the queue is shared between workshops
+        return queryset.filter(payload__tenant__isnull=True)  # users without a workshop see only theirs
+
+
+class AuditEntryViewSet(ShapedQuerysetMixin, viewsets.ReadOnlyModelViewSet):
+    """History of changes; ``?model=order&object_id=5`` reads one object's through audit_object_idx."""
+    queryset = AuditEntry.objects.all().order_by("-created_at")
+    serializer_class = AuditEntrySerializer
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ["model", "object_id", "action", "user_id"]
+    permission_classes = [IsAuthenticated]
+
+
+class ProfileViewSet(viewsets.ViewSet):
+    """
+    Browse request profiles written by ``RequestProfilingMiddleware``.
+
+    ``profiles/<name>/`` returns the top entries as text; add ``?download=1``
+    for the raw ``.prof`` (snakeviz, pstats) or tracemalloc snapshot.
+    """
+    permission_classes = [IsAdminUser]
+    lookup_value_regex = r"[\w.-]+"
+
+    def list(self, request):
+        files = sorted(profiling.profile_dir().iterdir(), key=lambda path: path.stat().st_mtime, reverse=True)
+        return Response([
+            {
+                "name": path.name,
+                "kind": "cpu" if path.suffix == ".prof" else "mem",
+                "size": path.stat().st_size,
+                "url": request.build_absolute_uri(reverse("dressapp:profile-detail", args=[path.name])),
+            }
+            for path in files if profiling.PROFILE_NAME.match(path.name)
+        ])
+
+    def retrieve(self, request, pk=None):
+        path = profiling.profile_path(pk)
+        if path is None:
+            raise NotFound()
+        if request.query_params.get("download"):
+            return FileResponse(path.open("rb"), as_attachment=True, filename=path.name)
+        return Response({"name": path.name, "summary": profiling.summarize(path)})
+
+
+class BootstrapView(APIView):
+    """
+    Everything the PWA needs on cold start in one response: the current user,
+    the product catalog with property definitions, and the first page of
+    customers and of in-progress orders.
+
+    The ETag is a hash of the payload, so a warm start that sends
+    If-None-Match (strong or weak) gets an empty 304.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        data = {
+            "user": {"id": request.user.id, "username": request.user.username, "is_staff": request.user.is_staff},
+            "products": ProductSerializer(
+                Product.objects.prefetch_related("properties").order_by("-created_at"),
+                many=True, context={"request": request, "expand": ["properties"]},
+            ).data,
+            "customers": self.first_page(
+                request, "dressapp:customer-list",
+                Customer.objects.order_by("first_name"), CustomerSerializer,  # CustomerViewSet.ordering
+            ),
+            "orders": self.first_page(
+                request, "dressapp:order-list",
+                Order.objects.filter(status="in_progress").order_by("-created_at"), OrderSerializer,
+                query="status=in_progress",
+            ),
+        }
+
+        etag = '"%s"' % hashlib.sha1(JSONRenderer().render(data)).hexdigest()
+        # Weak comparison: GZipMiddleware hands gzip clients the tag back as W/"..."
+        response = get_conditional_response(request._request, etag=etag) or Response(data)
+        response["ETag"] = etag
+        response["Cache-Control"] = "private, no-cache"
+        return response
+
+    @staticmethod
+    def first_page(request, list_name, queryset, serializer_class, query=""):
+        """Same shape as page 1 of the list endpoint."""
+        page_size = api_settings.PAGE_SIZE
+        count = queryset.count()
+        next_url = None
+        if count > page_size:
+            params = "&".join(filter(None, [query, "page=2"]))
+            next_url = request.build_absolute_uri(f"{reverse(list_name)}?{params}")
+        results = serializer_class(queryset[:page_size], many=True, context={"request": request}).data
+        return {"count": count, "next": next_url, "previous": None, "results": results}
+
+
+class BatchView(APIView):
+    """
+    Replay an ordered list of writes against the router resources in one transaction.
+
+    {"operations": [
+        {"method": "POST", "resource": "orders", "ref": "o1", "body": {"placed_by": 3, "price": 900, "payed": 0}},
+        {"method": "POST", "resource": "order-items", "body": {"order": {"$ref": "o1"}, "customer": 3, "product": 2}},
+        {"method": "PATCH", "resource": "customers", "id": 3, "body": {"phone": "09120000000"}}
+    ]}
+
+    ``{"$ref": "<ref>"}`` anywhere in an id or body is replaced by the pk created
+    under that ref earlier in the batch. If any operation fails the whole batch is
+    rolled back and a 400 lists the results up to and including the failure.
+    """
+    permission_classes = [IsAuthenticated]
+
+    class Failed(Exception):
+        pass
+
+    def post(self, request):
+        return idempotent(request, lambda: self.run_batch(request))
+
+    def run_batch(self, request):
+        serializer = BatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        refs = {}
+        results = []
+        try:
+            with transaction.atomic(using=router.db_for_write(Order)):  # the active tenant's database
+                for index, operation in enumerate(serializer.validated_data["operations"]):
+                    result = self.run_operation(request, index, operation, refs)
+                    results.append(result)
+                    if result["status"] >= 400:
+                        raise self.Failed()
+        except self.Failed:
+            return Response({"committed": False, "results": results}, status=http_status.HTTP_400_BAD_REQUEST)
+
+        return Response({"committed": True, "refs": refs, "results": results})
+
+    def run_operation(self, request, index, operation, refs):
+        result = {"index": index}
+        if "ref" in operation:
+            result["ref"] = operation["ref"]
+        try:
+            view, action_name = self.get_view(request, operation["resource"], operation["method"])
+            kwargs = {}
+            if "id" in operation:
+                kwargs[view.lookup_field] = self.resolve(operation["id"], refs)
+            view.kwargs = kwargs
+            view.request = self.sub_request(request, operation["method"], self.resolve(operation["body"], refs))
+            view.check_permissions(view.request)
+            response = getattr(view, action_name)(view.request, **kwargs)
+        except Http404:
+            result.update(status=http_status.HTTP_404_NOT_FOUND, errors={"detail": NotFound.default_detail})
+            return result
+        except APIException as exc:
+            result.update(status=exc.status_code, errors=exc.detail)
+            return result
+        except IntegrityError as exc:
+            result.update(status=http_status.HTTP_409_CONFLICT, errors={"detail": str(exc)})
+            return result
+
+        result["status"] = response.status_code
+        if response.data is not None:
+            result["data"] = response.data
+            if "ref" in operation:
+                refs[operation["ref"]] = response.data.get("id")
+        return result
+
+    def get_view(self, request, resource, method):
+        from dressapp.urls import router  # urls imports this module
+
+        for prefix, viewset, basename in router.registry:
+            if prefix == resource:
+                break
+        else:
+            raise APIValidationError({"resource": f"Unknown resource '{resource}'."})
+
+        action_name = BatchOperationSerializer.METHOD_ACTIONS[method]
+        if method.lower() not in viewset.http_method_names or not hasattr(viewset, action_name):
+            raise APIValidationError({"method": f"{method} is not allowed on '{resource}'."})
+
+        view = viewset(action=action_name, basename=basename, detail=action_name != "create")
+        view.args = ()
+        view.format_kwarg = None
+        view.headers = {}
+        return view, action_name
+
+    @staticmethod
+    def sub_request(request, method, body):
+        """Same user/auth as the batch request, with the operation's method and body."""
+        sub = copy.copy(request)
+        sub._request = copy.copy(request._request)
+        sub._request.method = method
+        sub.in_batch = True  # the batch as a whole is what an Idempotency-Key covers
+        sub._full_data = body
+        sub._data = body
+        sub._files = MultiValueDict()
+        return sub
+
+    def resolve(self, value, refs):
+        if isinstance(value, dict):
+            if set(value) == {"$ref"}:
+                if value["$ref"] not in refs:
+                    raise APIValidationError({"$ref": f"Unknown ref '{value['$ref']}'."})
+                return refs[value["$ref"]]
+            return {key: self.resolve(item, refs) for key, item in value.items()}
+        if isinstance(value, list):
+            return [self.resolve(item, refs) for item in value]
+        return value
+
+
+class CalendarView(APIView):
+    """
+    Planned work for in-progress orders: ``calendar/?from=2025-11-01&to=2025-11-30``.
+
+    Each day with something on it lists the orders due, the items due per
+    product and the fittings booked. Both lookups are range scans on the
+    partial ``order_due_in_progress_idx``/``order_fitting_in_progress_idx``.
+    """
+    permission_classes = [IsAuthenticated]
+    MAX_DAYS = 93
+    # SQLite only uses a partial index when the query repeats its WHERE; a bound parameter doesn't count
+    IN_PROGRESS = RawSQL("'in_progress'", ())
+
+    def get(self, request):
+        start, end = self.parse_range(request.query_params)
+        days = {}
+
+        def day(date):
+            return days.setdefault(date, {"date": date, "orders": set(), "fittings": 0, "products": {}})
+
+        for order_id, due_date, product_id, product_name, quantity in self.due_rows(start, end):
+            entry = day(due_date)
+            entry["orders"].add(order_id)
+            if product_id is not None:  # orders without items yet
+                product = entry["products"].setdefault(product_id, {"product": product_id, "name": product_name, "quantity": 0})
+                product["quantity"] += quantity
+        for fitting_date, count in self.fitting_rows(start, end):
+            day(fitting_date)["fittings"] = count
+
+        result = []
+        for date in sorted(days):
+            entry = days[date]
+            entry["orders"] = len(entry["orders"])
+            entry["products"] = sorted(entry["products"].values(), key=lambda p: (-p["quantity"], p["name"]))
+            result.append(entry)
+        return Response({"from": start, "to": end, "days": result})
+
+    def parse_range(self, params):
+        try:
+            start, end = parse_date(params.get("from", "")), parse_date(params.get("to", ""))
+        except ValueError:
+            start = end = None
+        if start is None or end is None:
+            raise APIValidationError({"detail": "Pass from= and to= as YYYY-MM-DD."})
+        if end < start or (end - start).days >= self.MAX_DAYS:
+            raise APIValidationError({"detail": f"to= must be on or after from=, at most {self.MAX_DAYS} days later."})
+        return start, end
+
+    @staticmethod
+    def due_rows(start, end):
+        """(order id, due date, product id, product name, quantity) per order and product; one range query."""
+        return (
+            Order.objects.filter(status=CalendarView.IN_PROGRESS, due_date__range=(start, end))
+            .values_list("id", "due_date", "order__product_id", "order__product__name")  # reverse FK is named "order"
+            .annotate(quantity=Sum("order__quantity"))
+            .order_by()
+        )
+
+    @staticmethod
+    def fitting_rows(start, end):
+        return (
+            Order.objects.filter(status=CalendarView.IN_PROGRESS, fitting_date__range=(start, end))
+            .values_list("fitting_date").annotate(count=Count("id")).order_by()
+        )
+
+
+def _authenticate_stream(request):
+    """(user, tenant slug) for the stream's token, or (None, None)."""
+    try:
+        authenticated = QueryParamJWTAuthentication().authenticate(Request(request))
+    except (AuthenticationFailed, TokenError):
+        return None, None
+    if not authenticated:
+        return None, None
+    return authenticated[0], authenticated[1].get("tenant")
+
+
+def _fetch_events(tenant, after, limit=200):
+    with tenancy.use_tenant(tenant):
+        return [event.as_message() for event in ChangeEvent.objects.filter(id__gt=after).order_by("id")[:limit]]
+
+
+def _stream_bounds(tenant):
+    """(oldest retained id, newest id); expired events are pruned by the housekeeping job."""
+    with tenancy.use_tenant(tenant):
+        bounds = ChangeEvent.objects.aggregate(first=Min("id"), last=Max("id"))
+    return bounds["first"], bounds["last"] or 0
+
+
+class EventStream:
+    """
+    Body of the events feed. Iterated synchronously under WSGI (the worker
+    thread polls and sleeps) and asynchronously under ASGI (a coroutine per
+    client); each server must be given the matching iterator, since Django
+    buffers the whole body when they don't match.
+    """
+
+    def __init__(self, tenant, last_id, reset_to=None):
+        self.tenant, self.last_id, self.reset_to = tenant, last_id, reset_to
+        self.quiet_since = None
+
+    def opening(self):
+        yield f"retry: {settings.SSE_RETRY_MS}\n\n"
+        if self.reset_to is not None:
+            yield f"id: {self.reset_to}\nevent: reset\ndata: {{}}\n\n"
+            self.last_id = self.reset_to
+
+    def messages(self, batch, now):
+        """The chunks for one poll: its changes, or a heartbeat once the stream has been quiet long enough."""
+        if self.quiet_since is None or batch:
+            self.quiet_since = now
+        for message in batch:
+            self.last_id = message["id"]
+            yield f"id: {self.last_id}\nevent: change\ndata: {json.dumps(message, separators=(',', ':'))}\n\n"
+        if now - self.quiet_since >= settings.SSE_HEARTBEAT_SECONDS:
+            yield ": ping\n\n"
+            self.quiet_since = now
+
+    def __iter__(self):
+        yield from self.opening()
+        deadline = time.monotonic() + settings.SSE_MAX_SECONDS
+        while time.monotonic() < deadline:
+            batch = _fetch_events(self.tenant, self.last_id)
+            yield from self.messages(batch, time.monotonic())
+            if not batch:
+                time.sleep(settings.SSE_POLL_SECONDS)
+
+    async def __aiter__(self):
+        for chunk in self.opening():
+            yield chunk
+        deadline = time.monotonic() + settings.SSE_MAX_SECONDS
+        while time.monotonic() < deadline:
+            batch = await sync_to_async(_fetch_events)(self.tenant, self.last_id)
+            for chunk in self.messages(batch, time.monotonic()):
+                yield chunk
+            if not batch:
+                await asyncio.sleep(settings.SSE_POLL_SECONDS)
+
+
+async def events(request):
+    """
+    Server-Sent Events feed of Order, OrderItem and Customer changes.
+
+    Works under WSGI (``runserver``, ``manage.py serve``, gunicorn), where each
+    open stream holds a worker thread, and under ASGI (``dressmake.asgi``),
+    where it holds only a coroutine. ``EventSource`` cannot send
+    headers, so the JWT may be passed as ``?token=``. Each message is
+    ``{"id", "model", "pk", "action", "data"}``; reconnecting clients send
+    ``Last-Event-ID`` and get what they missed. If that id has already been
+    pruned, a ``reset`` event tells the client to refetch everything.
+    Streams end after ``SSE_MAX_SECONDS`` and the browser reconnects.
+    """
+    user, tenant = await sync_to_async(_authenticate_stream)(request)
+    if user is None or not user.is_active:
+        return JsonResponse({"detail": "Authentication credentials were not provided."}, status=401)
+
+    # The stream outlives the request's context, so the tenant is passed along explicitly
+    first, newest = await sync_to_async(_stream_bounds)(tenant)
+    last_event = request.headers.get("Last-Event-ID") or request.GET.get("last_event_id")
+    last_id = int(last_event) if last_event and last_event.isdigit() else newest
+    pruned = last_event and first is not None and last_id < first - 1
+    stream = EventStream(tenant, last_id, reset_to=newest if pruned else None)
+
+    body = stream.__aiter__() if isinstance(request, ASGIRequest) else iter(stream)
+    response = StreamingHttpResponse(body, content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"  # don't let a proxy buffer the stream
+    response.skip_compression = True
+    return response
+
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+
+@require_safe
+def pwa(request, path=""):
+    """
+    Serve the PWA build collected by ``manage.py collect_pwa``.
+
+    Vite content-hashes everything under ``assets/`` so those never change and
+    are cached forever; everything else (index.html, sw.js, manifest) is
+    revalidated on each use. Unknown extension-less paths fall back to
+    index.html for client-side routing.
+    """
+    root = Path(settings.PWA_ROOT).resolve()
+    target = (root / path).resolve()
+    if root not in target.parents and target != root:
+        raise Http404()
+    if not target.is_file():
+        if Path(path).suffix:
+            raise Http404()
+        target = root / "index.html"
+        if not target.is_file():
+            raise Http404("PWA is not built; run manage.py collect_pwa")
 
+    relative = target.relative_to(root).as_posix()
+    cache_control = IMMUTABLE if relative.startswith("assets/") else "no-cache"
+    return serve_file(request, target, cache_control=cache_control)
 
 
 @api_view(['GET'])
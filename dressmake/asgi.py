@@ -3,6 +3,10 @@ ASGI config for dressmake project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serve through ASGI (e.g. ``uvicorn dressmake.asgi:application``) so the
+api/events/ Server-Sent Events stream holds a coroutine per client instead
+of a worker thread.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
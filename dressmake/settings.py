@@ -10,11 +10,15 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import sys
 from pathlib import Path
+from corsheaders.defaults import default_headers
 from decouple import config
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+TESTING = sys.argv[1:2] == ["test"]
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.2/howto/deployment/checklist/
@@ -34,6 +38,8 @@ ALLOWED_HOSTS = [
 
 # Development only (allow everything):
 CORS_ALLOW_ALL_ORIGINS = True
+CORS_ALLOW_HEADERS = (*default_headers, "idempotency-key")
+CORS_EXPOSE_HEADERS = ["Idempotent-Replayed", "Retry-After"]
 
 # Later in production, restrict like:
 
@@ -48,6 +54,11 @@ CORS_ALLOW_ALL_ORIGINS = True
 # SESSION_COOKIE_SAMESITE = "None"
 
 
+# API-only serving profile (e.g. on a Raspberry Pi): no admin, no browsable API.
+# Read at startup, so set it in the environment: API_ONLY=1 python manage.py serve
+API_ONLY = config("API_ONLY", default=False, cast=bool)
+
+
 # Application definition
 
 INSTALLED_APPS = [
@@ -65,11 +76,16 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "corsheaders.middleware.CorsMiddleware",
+    'dressapp.tenancy.TenantMiddleware',  # resets the active tenant around each request
     'django.middleware.security.SecurityMiddleware',
+    'dressapp.fileserving.GZipMiddleware',  # only when the client sends Accept-Encoding: gzip
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'dressapp.audit.AuditMiddleware',  # who made the changes, for the audit log
+    'dressapp.profiling.RequestProfilingMiddleware',  # staff-only, X-Profile: cpu|mem
+    'dressapp.slowlog.SlowQueryMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -94,19 +110,106 @@ TEMPLATES = [
 REST_FRAMEWORK = {
     "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
     "PAGE_SIZE": 10,  # default page size
+    "DEFAULT_RENDERER_CLASSES": [
+        "rest_framework.renderers.JSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+        "dressapp.renderers.ColumnarJSONRenderer",  # opt-in: ?format=columnar
+    ],
     "DEFAULT_FILTER_BACKENDS": [
         "django_filters.rest_framework.DjangoFilterBackend",
         "rest_framework.filters.SearchFilter",
         "rest_framework.filters.OrderingFilter",
     ],
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",  # JWT login
+        "dressapp.authentication.TenantJWTAuthentication",  # JWT login; activates the token's tenant
     ),
     "DEFAULT_PERMISSION_CLASSES": (
         "rest_framework.permissions.IsAuthenticated",  # require login everywhere
     ),
 }
 
+SIMPLE_JWT = {
+    "TOKEN_OBTAIN_SERIALIZER": "dressapp.serializers.TenantTokenObtainPairSerializer",  # adds the "tenant" claim
+}
+
+# One SQLite file per workshop (see dressapp/tenancy.py)
+DATABASE_ROUTERS = ["dressapp.tenancy.TenantRouter"]
+TENANT_DB_DIR = config("TENANT_DB_DIR", default=str(BASE_DIR / "tenants"))
+TENANT_CONNECTION_CACHE = config("TENANT_CONNECTION_CACHE", default=8, cast=int)  # open tenant connections per thread
+
+# Idempotency-Key on writes (see dressapp/idempotency.py)
+IDEMPOTENCY_TTL_HOURS = config("IDEMPOTENCY_TTL_HOURS", default=24, cast=int)
+
+# DELETEs cascading to more rows than this run as a chunked background job (see dressapp/deletion.py)
+CHUNKED_DELETE_THRESHOLD = config("CHUNKED_DELETE_THRESHOLD", default=2000, cast=int)
+CHUNKED_DELETE_BATCH_SIZE = config("CHUNKED_DELETE_BATCH_SIZE", default=500, cast=int)
+
+# Audit log written behind the request (see dressapp/audit.py); synchronous under manage.py test
+AUDIT_WRITE_BEHIND = config("AUDIT_WRITE_BEHIND", default=not TESTING, cast=bool)
+AUDIT_FLUSH_MS = config("AUDIT_FLUSH_MS", default=300, cast=int)
+AUDIT_BATCH_SIZE = config("AUDIT_BATCH_SIZE", default=500, cast=int)
+
+# Rendered customer/product representations kept per process (see dressapp/representations.py); 0 turns it off
+REPRESENTATION_CACHE_ENTRIES = config("REPRESENTATION_CACHE_ENTRIES", default=10000, cast=int)
+REPRESENTATION_CACHE_MB = config("REPRESENTATION_CACHE_MB", default=16, cast=int)
+
+# Upper bound on operations accepted by api/batch/ in one request
+BATCH_MAX_OPERATIONS = config("BATCH_MAX_OPERATIONS", default=200, cast=int)
+
+# On-demand request profiling (see dressapp/profiling.py)
+PROFILING_ENABLED = config("PROFILING_ENABLED", default=True, cast=bool)
+PROFILING_DIR = config("PROFILING_DIR", default=str(BASE_DIR / "profiles"))
+PROFILING_TRACEMALLOC_FRAMES = config("PROFILING_TRACEMALLOC_FRAMES", default=10, cast=int)
+
+# Slow-query log (see dressapp/slowlog.py)
+SLOW_QUERY_LOG_ENABLED = config("SLOW_QUERY_LOG_ENABLED", default=True, cast=bool)
+SLOW_QUERY_MS = config("SLOW_QUERY_MS", default=200, cast=float)
+SLOW_QUERY_REPEAT_THRESHOLD = config("SLOW_QUERY_REPEAT_THRESHOLD", default=20, cast=int)  # same query N times in one request
+SLOW_QUERY_LOG_FILE = config("SLOW_QUERY_LOG_FILE", default=str(BASE_DIR / "slow_queries.log"))
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "formatters": {
+        "message": {"format": "%(message)s"},  # records are already JSON
+    },
+    "handlers": {
+        "slow_queries": {
+            "class": "logging.handlers.RotatingFileHandler",
+            "filename": SLOW_QUERY_LOG_FILE,
+            "maxBytes": 5 * 1024 * 1024,
+            "backupCount": 5,
+            "delay": True,
+            "formatter": "message",
+        },
+    },
+    "loggers": {
+        "dressapp.slow_queries": {
+            "handlers": ["slow_queries"],
+            "level": "WARNING",
+            "propagate": False,
+        },
+    },
+}
+
+# api/events/ Server-Sent Events stream; under WSGI every open stream holds a worker thread,
+# under ASGI (uvicorn dressmake.asgi:application) only a coroutine
+SSE_POLL_SECONDS = config("SSE_POLL_SECONDS", default=1.0, cast=float)
+SSE_HEARTBEAT_SECONDS = config("SSE_HEARTBEAT_SECONDS", default=15, cast=float)
+SSE_MAX_SECONDS = config("SSE_MAX_SECONDS", default=300, cast=float)  # client reconnects with Last-Event-ID
+SSE_RETRY_MS = config("SSE_RETRY_MS", default=3000, cast=int)
+SSE_RETENTION_HOURS = config("SSE_RETENTION_HOURS", default=24, cast=int)
+
+# The worker's housekeeping job (expired change events and idempotency records) runs this often
+HOUSEKEEPING_MINUTES = config("HOUSEKEEPING_MINUTES", default=60, cast=float)
+
+if API_ONLY:
+    INSTALLED_APPS.remove('django.contrib.admin')
+    INSTALLED_APPS.remove('django.contrib.messages')
+    MIDDLEWARE.remove('django.contrib.messages.middleware.MessageMiddleware')
+    TEMPLATES[0]['OPTIONS']['context_processors'].remove('django.contrib.messages.context_processors.messages')
+    REST_FRAMEWORK["DEFAULT_RENDERER_CLASSES"].remove("rest_framework.renderers.BrowsableAPIRenderer")
+
 WSGI_APPLICATION = 'dressmake.wsgi.application'
 
 
@@ -157,6 +260,24 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# Built PWA served by Django (manage.py collect_pwa copies dressmaking-pwa/dist here)
+PWA_SOURCE_DIR = BASE_DIR / "dressmaking-pwa"
+PWA_ROOT = config("PWA_ROOT", default=str(BASE_DIR / "pwa_build"))
+
+# Order attachments (see dressapp/attachments.py); thumbnails need Pillow
+ATTACHMENTS_DIR = config("ATTACHMENTS_DIR", default=str(BASE_DIR / "attachments"))
+ATTACHMENT_MAX_MB = config("ATTACHMENT_MAX_MB", default=20, cast=int)
+THUMBNAIL_SIZE = config("THUMBNAIL_SIZE", default=320, cast=int)  # longest side, pixels
+THUMBNAIL_WORKERS = config("THUMBNAIL_WORKERS", default=1, cast=int)  # processes per job worker
+THUMBNAIL_TIMEOUT_SECONDS = config("THUMBNAIL_TIMEOUT_SECONDS", default=120, cast=float)
+
+# Online SQLite backups (manage.py backup / the "backup" job, see dressapp/backup.py)
+BACKUP_DIR = config("BACKUP_DIR", default=str(BASE_DIR / "backups"))
+BACKUP_KEEP = config("BACKUP_KEEP", default=7, cast=int)
+BACKUP_PAGES = config("BACKUP_PAGES", default=256, cast=int)  # pages copied per step (4 KiB each by default)
+BACKUP_SLEEP_SECONDS = config("BACKUP_SLEEP_SECONDS", default=0.05, cast=float)  # pause between steps
+BACKUP_MAX_RESTARTS = config("BACKUP_MAX_RESTARTS", default=3, cast=int)  # then fall back to VACUUM INTO
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -1,12 +1,25 @@
-from django.contrib import admin
-from django.urls import path, include
+from django.conf import settings
+from django.urls import path, include, re_path
 
-urlpatterns = [
-    path('admin/', admin.site.urls),
+from dressapp.views import pwa
 
+urlpatterns = [
     # API routes from dreesapp
     path('', include('dressapp.urls', namespace='dressapp')),
+]
+
+if not settings.API_ONLY:
+    from django.contrib import admin
+
+    urlpatterns += [
+        path('admin/', admin.site.urls),
+
+        # Optional: browsable API login/logout
+        path('api-auth/', include('rest_framework.urls')),
+    ]
+
+urlpatterns += [
 
-    # Optional: browsable API login/logout
-    path('api-auth/', include('rest_framework.urls')),
+    # Built PWA (manage.py collect_pwa); keep last so it only catches what's left
+    re_path(r'^(?!api/|admin/|api-auth/|static/)(?P<path>.*)$', pwa, name='pwa'),
 ]
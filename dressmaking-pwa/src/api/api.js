@@ -9,12 +9,30 @@ const api = axios.create({
   baseURL: `http://${BASEHOST}:${BASEPORT}/api/`,
 });
 
+// Idempotency-Key for writes: the server runs a keyed request once and replays
+// its response to repeats. Every api call (one user action) gets its own key,
+// kept on its config, so only resending that same config reuses it: the retry
+// after a token refresh, or after a 409 while the first attempt is still running.
+const WRITE_METHODS = ["post", "put", "patch"];
+const MAX_IN_PROGRESS_RETRIES = 5;
+
+const newKey = () => {
+  // crypto.randomUUID() needs a secure context; the app is served over plain http on the LAN
+  const bytes = crypto.getRandomValues(new Uint8Array(16));
+  return Array.from(bytes, (b) => b.toString(16).padStart(2, "0")).join("");
+};
+
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+
 // token interceptors remain the same
 api.interceptors.request.use((config) => {
   const token = localStorage.getItem("access");
   if (token) {
     config.headers.Authorization = `Bearer ${token}`;
   }
+  if (WRITE_METHODS.includes(config.method) && !config.headers["Idempotency-Key"]) {
+    config.headers["Idempotency-Key"] = newKey();
+  }
   return config;
 });
 
@@ -23,6 +41,19 @@ api.interceptors.response.use(
   async (error) => {
     const originalRequest = error.config;
 
+    // Same key still running on the server: wait as told and ask again for its response
+    const retryAfter = error.response?.headers["retry-after"];
+    if (
+      error.response?.status === 409 &&
+      retryAfter !== undefined &&
+      originalRequest?.headers["Idempotency-Key"] &&
+      (originalRequest._inProgressRetries ?? 0) < MAX_IN_PROGRESS_RETRIES
+    ) {
+      originalRequest._inProgressRetries = (originalRequest._inProgressRetries ?? 0) + 1;
+      await sleep((Number(retryAfter) || 1) * 1000);
+      return api(originalRequest);
+    }
+
     if (error.response?.status === 401 && !originalRequest._retry) {
       originalRequest._retry = true;
       try {
@@ -71,7 +71,9 @@ export default function Customers() {
     if (!window.confirm("آیا مطمئن هستید که می‌خواهید این مشتری را حذف کنید؟"))
       return;
     try {
-      await api.delete(`customers/${id}/`);
+      const res = await api.delete(`customers/${id}/`);
+      // 202: a large cascade is being deleted by a background job
+      if (res.status === 202) alert("حذف در پس‌زمینه در حال انجام است و چند لحظه طول می‌کشد.");
       fetchCustomers();
     } catch (err) {
       console.error("خطا در حذف مشتری", err);
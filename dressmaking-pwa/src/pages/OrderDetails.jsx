@@ -11,6 +11,7 @@ export default function OrderDetails() {
   const [price, setPrice] = useState(0);
   const [payed, setPayed] = useState(0);
   const [status, setStatus] = useState("");
+  const [uploadProgress, setUploadProgress] = useState(null);
 
   useEffect(() => {
     fetchOrder();
@@ -60,15 +61,25 @@ export default function OrderDetails() {
       }
     }
 
-    // Fetch customer-specific properties
-    const custPropsRes = await api.get(
-      `customer-properties/?customer=${orderData.placed_by}&property__product=${item.product}`
-    );
-    const customerProperties = (custPropsRes.data.results || []).map((p) => ({
-      id: p.id,
-      name: p.property_name || p.property?.name || p.name,
-      value: p.value ?? "",
-    }));
+    // Customer-specific properties: the snapshot taken when the item was ordered,
+    // or the current values for items created before snapshots existed
+    let customerProperties;
+    if (item.measurements) {
+      customerProperties = Object.entries(item.measurements).map(([propId, p]) => ({
+        id: propId,
+        name: p.name,
+        value: p.value ?? "",
+      }));
+    } else {
+      const custPropsRes = await api.get(
+        `customer-properties/?customer=${orderData.placed_by}&property__product=${item.product}`
+      );
+      customerProperties = (custPropsRes.data.results || []).map((p) => ({
+        id: p.id,
+        name: p.property_name || p.property?.name || p.name,
+        value: p.value ?? "",
+      }));
+    }
 
     // Map order-specific properties
     const orderPropertiesDefs = [];
@@ -111,6 +122,29 @@ const toJalaliDate = (isoDate) => {
     return `${jy}/${jm}/${jd} ${hh}:${mm}:${ss}`;
     };
 
+  // <img src> can't send the Authorization header, so image URLs carry the token
+  const withToken = (url) => `${url}?token=${encodeURIComponent(localStorage.getItem("access") || "")}`;
+
+  const handleUpload = async (e) => {
+    const file = e.target.files[0];
+    e.target.value = "";
+    if (!file) return;
+    const form = new FormData();
+    form.append("order", orderId);
+    form.append("file", file);
+    try {
+      setUploadProgress(0);
+      await api.post("attachments/", form, {
+        onUploadProgress: (p) => p.total && setUploadProgress(Math.round((p.loaded * 100) / p.total)),
+      });
+      fetchOrder();
+    } catch (err) {
+      alert(err.response?.data?.file?.[0] || err.response?.data?.detail || "خطا در بارگذاری عکس");
+    } finally {
+      setUploadProgress(null);
+    }
+  };
+
   const handleUpdateOrder = async () => {
     try {
       await api.put(`orders/${orderId}/`, {
@@ -178,6 +212,21 @@ const toJalaliDate = (isoDate) => {
               </div>
             ))}
 
+            <h3>عکس‌های پارچه و طرح</h3>
+            <div style={{ display: "flex", flexWrap: "wrap", gap: "8px" }}>
+              {(order.attachments || []).map((a) => (
+                <a key={a.id} href={withToken(`${api.defaults.baseURL}attachments/${a.id}/file/`)} target="_blank" rel="noreferrer">
+                  {a.thumbnail ? (
+                    <img src={withToken(a.thumbnail)} alt="" loading="lazy" style={{ width: 120, height: 120, objectFit: "cover" }} />
+                  ) : (
+                    <span>در حال آماده‌سازی…</span>
+                  )}
+                </a>
+              ))}
+            </div>
+            <input type="file" accept="image/*" onChange={handleUpload} disabled={uploadProgress !== null} />
+            {uploadProgress !== null && <span> {uploadProgress}%</span>}
+
             <h3>جزئیات مالی و وضعیت سفارش</h3>
             <div>
               <label>قیمت کل: </label>
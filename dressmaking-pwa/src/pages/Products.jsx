@@ -64,7 +64,9 @@ export default function Products() {
   const handleDelete = async (id) => {
     if (!window.confirm("آیا مطمئن هستید که می‌خواهید این محصول را حذف کنید؟")) return;
     try {
-      await api.delete(`products/${id}/`);
+      const res = await api.delete(`products/${id}/`);
+      // 202: a large cascade is being deleted by a background job
+      if (res.status === 202) alert("حذف در پس‌زمینه در حال انجام است و چند لحظه طول می‌کشد.");
       if (selectedProduct?.id === id) setSelectedProduct(null);
       fetchProducts();
     } catch (err) {